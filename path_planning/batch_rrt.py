@@ -0,0 +1,55 @@
+import argparse
+import json
+import sys
+
+from path_planning.batch import random_queries, run_batch, run_roadmap_batch, summarize
+from path_planning.config import RrtConfig
+from path_planning.planner import ALGORITHMS, DEFAULT_OBSTACLES
+from path_planning.sampling import SAMPLERS
+
+
+def parse_args(argv: list[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Run many random RRT planning queries on a process pool.')
+    parser.add_argument('--queries', type=int, default=100, help='number of random start/end queries')
+    parser.add_argument('--seed', type=int, default=0, help='seed for drawing the queries')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes, defaults to all cores')
+    parser.add_argument('--max-steps', type=int, default=RrtConfig.max_steps, help='max inserted nodes per query')
+    parser.add_argument('--algorithm', choices=ALGORITHMS, default=RrtConfig.algorithm, help='planning algorithm')
+    parser.add_argument('--goal-bias', type=float, default=RrtConfig.goal_bias,
+                        help='probability of sampling the end node (rrt and rrt_star)')
+    parser.add_argument('--sampler', choices=SAMPLERS, default=RrtConfig.sampler, help='sampling strategy')
+    parser.add_argument('--prm', action='store_true',
+                        help='answer the queries on a probabilistic roadmap instead of growing a tree per query')
+    parser.add_argument('--roadmap-samples', type=int, default=RrtConfig.roadmap_samples,
+                        help='number of roadmap vertices (prm)')
+    parser.add_argument('--roadmap-cache', type=str, default=None,
+                        help='directory caching roadmaps by map hash (prm)')
+    parser.add_argument('--output', type=str, default=None, help='write one JSON line per finished query here')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    cfg = RrtConfig(max_steps=args.max_steps, algorithm=args.algorithm, goal_bias=args.goal_bias,
+                    sampler=args.sampler, roadmap_samples=args.roadmap_samples)
+    queries = random_queries(args.queries, DEFAULT_OBSTACLES, cfg.grid_size, seed=args.seed)
+    output = open(args.output, 'w') if args.output else None
+    results = []
+    if args.prm:
+        batch = run_roadmap_batch(queries, cfg, cache_dir=args.roadmap_cache, max_workers=args.workers)
+    else:
+        batch = run_batch(queries, cfg, max_workers=args.workers)
+    for count, (query, result) in enumerate(batch, start=1):
+        results.append(result)
+        if output is not None:
+            output.write(json.dumps({'start': query.start, 'end': query.end, 'seed': query.seed,
+                                     'map_name': query.map_name, 'success': result.success,
+                                     'path_length': result.path_length if result.success else None,
+                                     'steps': result.steps, 'iterations': result.iterations,
+                                     'elapsed_time': result.elapsed_time,
+                                     'first_solution_time': result.first_solution_time}) + '\n')
+        print(f'\r[{count}/{len(queries)}] done', end='', file=sys.stderr)
+    print(file=sys.stderr)
+    if output is not None:
+        output.close()
+    print(json.dumps(summarize(results), indent=2))
@@ -0,0 +1,36 @@
+import argparse
+import dataclasses
+import json
+import sys
+
+from path_planning.benchmark import compare, environment, run_all
+
+
+def parse_args(argv: list[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmark the path planning hot paths, seeded and headless.')
+    parser.add_argument('--quick', action='store_true', help='smaller tree sizes and obstacle counts')
+    parser.add_argument('--output', type=str, default=None, help='write the results as JSON here')
+    parser.add_argument('--compare', type=str, default=None,
+                        help='JSON results of an earlier run, print the ratio current / earlier per case')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    results = []
+    for result in run_all(quick=args.quick):
+        results.append(dataclasses.asdict(result))
+        print(f'{result.key:<55} median {result.median * 1e6:12.2f} us  best {result.best * 1e6:12.2f} us',
+              file=sys.stderr)
+    report = {'environment': environment(), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        print(f'\nCompared to {baseline["environment"].get("commit")}:', file=sys.stderr)
+        for key, old, new, ratio in compare(baseline['results'], results):
+            print(f'{key:<55} {old * 1e6:12.2f} us -> {new * 1e6:12.2f} us  x{ratio:.2f}', file=sys.stderr)
+    if not args.output:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,145 @@
+import dataclasses
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from path_planning.config import RrtConfig
+from path_planning.obstacle import CompiledObstacles, Obstacle
+from path_planning.obstacle_map import ObstacleMap
+from path_planning.planner import (DEFAULT_OBSTACLES, PlanningResult, build_obstacle_map, make_planner,
+                                   sample_new_node)
+from path_planning.roadmap import Roadmap, load_or_build
+from path_planning.tree import Node, Pose
+
+from typing import Generator, Iterable
+
+DEFAULT_MAP = 'default'
+
+
+@dataclass(frozen=True)
+class PlanningQuery:
+    """A single planning problem of a batch, the obstacles are looked up by map_name in the maps of the batch."""
+    start: tuple[float, float]
+    end: tuple[float, float]
+    seed: int
+    map_name: str = DEFAULT_MAP
+
+
+class SharedObstacleMaps:
+    """Obstacle boxes of several maps placed in shared memory blocks. Workers attach to the blocks by name, so the
+    maps are transferred once per worker process instead of being pickled with every task. Use as context manager
+    to release the blocks afterwards."""
+
+    def __init__(self, obstacle_maps: dict[str, list[Obstacle]]) -> None:
+        self._blocks: list[shared_memory.SharedMemory] = []
+        self.handles: dict[str, tuple[str, int]] = {}  # map name -> (block name, number of obstacles)
+        for map_name, obstacles in obstacle_maps.items():
+            boxes = np.array([(obs.x, obs.y, obs.width, obs.height) for obs in obstacles], dtype=float).reshape(-1, 4)
+            block = shared_memory.SharedMemory(create=True, size=max(boxes.nbytes, 1))
+            np.ndarray(boxes.shape, dtype=float, buffer=block.buf)[:] = boxes
+            self._blocks.append(block)
+            self.handles[map_name] = (block.name, len(boxes))
+
+    def close(self) -> None:
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self) -> 'SharedObstacleMaps':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+# Per worker process state, filled once by _init_worker
+_worker_cfg: RrtConfig = None
+_worker_maps: dict[str, CompiledObstacles] = {}
+
+
+def _attach_obstacle_map(cfg: RrtConfig, block_name: str, n_obstacles: int) -> CompiledObstacles:
+    block = shared_memory.SharedMemory(name=block_name)
+    boxes = np.ndarray((n_obstacles, 4), dtype=float, buffer=block.buf)
+    obstacle_map = build_obstacle_map(cfg, [Obstacle(*box) for box in boxes.tolist()])
+    block.close()
+    return obstacle_map
+
+
+def _init_worker(cfg: RrtConfig, handles: dict[str, tuple[str, int]]) -> None:
+    global _worker_cfg, _worker_maps
+    _worker_cfg = cfg
+    _worker_maps = {map_name: _attach_obstacle_map(cfg, *handle) for map_name, handle in handles.items()}
+
+
+def _run_query(query: PlanningQuery, keep_trees: bool) -> tuple[PlanningQuery, PlanningResult]:
+    cfg = dataclasses.replace(_worker_cfg, start_node=Node(Pose(*query.start)), end_node=Node(Pose(*query.end)))
+    result = make_planner(cfg, _worker_maps[query.map_name], seed=query.seed).run()
+    if not keep_trees:
+        # Only ship the path and statistics back to the parent process
+        empty = np.empty((0, 2))
+        result = dataclasses.replace(result, positions=empty, parents=np.empty(0, dtype=np.int64), costs=empty[:, 0])
+    return query, result
+
+
+def run_batch(queries: Iterable[PlanningQuery], cfg: RrtConfig = None, obstacle_maps: dict[str, list[Obstacle]] = None,
+              max_workers: int = None, keep_trees: bool = False
+              ) -> Generator[tuple[PlanningQuery, PlanningResult], None, None]:
+    """Run all queries on a process pool and yield (query, result) pairs in order of completion. Without keep_trees
+    the tree arrays of the results are dropped, which keeps the transfer back to this process small."""
+    cfg = cfg if cfg is not None else RrtConfig()
+    obstacle_maps = obstacle_maps if obstacle_maps is not None else {DEFAULT_MAP: DEFAULT_OBSTACLES}
+    with SharedObstacleMaps(obstacle_maps) as shared_maps:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(cfg, shared_maps.handles)) as executor:
+            futures = [executor.submit(_run_query, query, keep_trees) for query in queries]
+            for future in as_completed(futures):
+                yield future.result()
+
+
+def run_roadmap_batch(queries: Iterable[PlanningQuery], cfg: RrtConfig = None,
+                      obstacle_maps: dict[str, list[Obstacle]] = None, cache_dir: str = None, max_workers: int = None,
+                      method: str = 'astar') -> Generator[tuple[PlanningQuery, PlanningResult], None, None]:
+    """Answer all queries with one PRM roadmap per map, loaded from cache_dir or built with collision checks spread
+    over max_workers processes. Queries only search the graph, so they run in this process and are yielded in order.
+    The query seeds are not used, the roadmaps are built with seed 0."""
+    cfg = cfg if cfg is not None else RrtConfig()
+    obstacle_maps = obstacle_maps if obstacle_maps is not None else {DEFAULT_MAP: DEFAULT_OBSTACLES}
+    roadmaps: dict[str, Roadmap] = {}
+    for query in queries:
+        if query.map_name not in roadmaps:
+            obstacle_map = build_obstacle_map(cfg, obstacle_maps[query.map_name])
+            roadmaps[query.map_name] = load_or_build(obstacle_map, cfg, cache_dir, max_workers=max_workers)
+        yield query, roadmaps[query.map_name].query(Pose(*query.start), Pose(*query.end), method)
+
+
+def random_queries(n_queries: int, obstacles: list[Obstacle], grid_size: int, seed: int = 0,
+                   map_name: str = DEFAULT_MAP) -> list[PlanningQuery]:
+    """Draw n_queries start and end pairs outside of all obstacles, each query gets its own planner seed."""
+    rng = random.Random(seed)
+    obstacle_map = ObstacleMap(obstacles)
+    queries = []
+    for _ in range(n_queries):
+        start = sample_new_node(obstacle_map, grid_size, rng).pose
+        end = sample_new_node(obstacle_map, grid_size, rng).pose
+        queries.append(PlanningQuery((start.x, start.y), (end.x, end.y), seed=rng.randrange(2 ** 32),
+                                     map_name=map_name))
+    return queries
+
+
+def summarize(results: Iterable[PlanningResult]) -> dict:
+    """Success rate and mean statistics over a number of planning results."""
+    results = list(results)
+    successful = [result for result in results if result.success]
+    return {
+        'queries': len(results),
+        'success_rate': len(successful) / len(results) if results else 0.0,
+        'mean_path_length': float(np.mean([result.path_length for result in successful])) if successful else None,
+        'mean_steps': float(np.mean([result.steps for result in results])) if results else None,
+        'mean_elapsed_time': float(np.mean([result.elapsed_time for result in results])) if results else None,
+        'mean_first_solution_time': float(np.mean([result.first_solution_time for result in successful]))
+        if successful else None,
+    }
@@ -0,0 +1,210 @@
+import dataclasses
+import platform
+import random
+import statistics
+import subprocess
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from path_planning.config import RrtConfig
+from path_planning.nearest import make_nearest_index
+from path_planning.obstacle import CompiledObstacles, Obstacle
+from path_planning.obstacle_map import ObstacleMap
+from path_planning.occupancy_map import OccupancyMap
+from path_planning.planner import plan, sample_new_node
+from path_planning.sampling import SAMPLERS, make_sampler
+from path_planning.tree import Node, Pose, Tree
+
+from typing import Callable, Generator
+
+TREE_SIZES = (1_000, 10_000, 100_000)
+OBSTACLE_COUNTS = (10, 100, 1_000)
+QUICK_TREE_SIZES = (1_000, 10_000)
+QUICK_OBSTACLE_COUNTS = (10, 100)
+
+
+@dataclass
+class BenchmarkResult:
+    """Timing of one benchmark case, all times are seconds per single operation."""
+    name: str
+    params: dict
+    median: float
+    best: float
+    repeats: int
+    number: int
+    extra: dict = field(default_factory=dict)
+
+    @property
+    def key(self) -> str:
+        """Identifies the same case across benchmark runs."""
+        return self.name + ''.join(f' {key}={value}' for key, value in sorted(self.params.items()))
+
+
+def time_call(func: Callable[[], object], repeats: int = 5, min_time: float = 0.05) -> tuple[float, float, int]:
+    """Time func like timeit: calls are batched so a batch runs for at least min_time, the batch is repeated and
+    (median, best) seconds per call plus the batch size are returned."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+    timings = [elapsed / number]
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return statistics.median(timings), min(timings), number
+
+
+def random_obstacles(n_obstacles: int, grid_size: float, seed: int = 0, max_fraction: float = 0.3) -> list[Obstacle]:
+    """Rectangles scattered over the grid, sized so that they cover roughly max_fraction of its area together."""
+    rng = random.Random(seed)
+    max_side = 2 * grid_size * np.sqrt(max_fraction / n_obstacles)
+    return [Obstacle(rng.uniform(0, grid_size), rng.uniform(0, grid_size),
+                     rng.uniform(0.1, max_side), rng.uniform(0.1, max_side)) for _ in range(n_obstacles)]
+
+
+def random_tree(n_nodes: int, grid_size: float, seed: int = 0) -> Tree:
+    """Tree with uniformly scattered nodes, each connected to a random earlier node."""
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(0, grid_size, size=(n_nodes, 2))
+    parents = (rng.random(n_nodes) * np.arange(n_nodes)).astype(np.int64)
+    tree = Tree(Pose(*points[0]), capacity=n_nodes)
+    for idx in range(1, n_nodes):
+        tree.add(Pose(*points[idx]), parent=int(parents[idx]))
+    return tree
+
+
+def _random_segments(n_segments: int, grid_size: float, length: float, rng: np.random.Generator) -> np.ndarray:
+    starts = rng.uniform(0, grid_size, size=(n_segments, 2))
+    angles = rng.uniform(0, 2 * np.pi, size=n_segments)
+    ends = starts + length * np.column_stack([np.cos(angles), np.sin(angles)])
+    return np.stack([starts, ends], axis=1)
+
+
+def bench_nearest(tree_sizes, grid_size: float = 100, cell_size: float = 4, seed: int = 0
+                  ) -> Generator[BenchmarkResult, None, None]:
+    queries = np.random.default_rng(seed).uniform(0, grid_size, size=(256, 2)).tolist()
+    for n_nodes in tree_sizes:
+        tree = random_tree(n_nodes, grid_size, seed)
+        for backend in ('brute', 'grid'):
+            index = make_nearest_index(backend, tree, cell_size)
+            query_iter = iter(range(1 << 62))
+            median, best, number = time_call(lambda: index.nearest(*queries[next(query_iter) % len(queries)]))
+            yield BenchmarkResult('nearest', {'backend': backend, 'nodes': n_nodes}, median, best, 5, number)
+            median, best, number = time_call(
+                lambda: index.within_radius(*queries[next(query_iter) % len(queries)], cell_size))
+            yield BenchmarkResult('within_radius', {'backend': backend, 'nodes': n_nodes}, median, best, 5, number)
+
+
+def bench_collision(obstacle_counts, grid_size: float = 100, segment_length: float = 4, batch_size: int = 64,
+                    seed: int = 0) -> Generator[BenchmarkResult, None, None]:
+    rng = np.random.default_rng(seed)
+    segments = _random_segments(256, grid_size, segment_length, rng)
+    batch = _random_segments(batch_size, grid_size, segment_length, rng)
+    for n_obstacles in obstacle_counts:
+        obstacles = random_obstacles(n_obstacles, grid_size, seed)
+        structures = (('compiled', CompiledObstacles(obstacles)), ('map', ObstacleMap(obstacles)),
+                      ('occupancy', OccupancyMap.from_obstacles(obstacles, grid_size, resolution=0.25)))
+        for structure, obstacle_set in structures:
+            query_iter = iter(range(1 << 62))
+            median, best, number = time_call(lambda: obstacle_set.blocks(segments[next(query_iter) % len(segments)]))
+            yield BenchmarkResult('blocks', {'structure': structure, 'obstacles': n_obstacles}, median, best, 5,
+                                  number)
+            median, best, number = time_call(lambda: obstacle_set.blocks_many(batch))
+            yield BenchmarkResult('blocks_many', {'structure': structure, 'obstacles': n_obstacles,
+                                                  'batch': batch_size}, median, best, 5, number)
+
+
+def bench_sampling(obstacle_counts, grid_size: float = 100, seed: int = 0) -> Generator[BenchmarkResult, None, None]:
+    for n_obstacles in obstacle_counts:
+        obstacles = random_obstacles(n_obstacles, grid_size, seed)
+        obstacle_map = ObstacleMap(obstacles)
+        for structure, obstacle_set in (('list', obstacles), ('map', obstacle_map)):
+            rng = random.Random(seed)
+            median, best, number = time_call(lambda: sample_new_node(obstacle_set, grid_size, rng))
+            yield BenchmarkResult('sample', {'structure': structure, 'obstacles': n_obstacles}, median, best, 5,
+                                  number)
+        for sampler_name in SAMPLERS:
+            cfg = dataclasses.replace(RrtConfig(), grid_size=grid_size, sampler=sampler_name)
+            sampler = make_sampler(cfg, obstacle_map, seed=seed)
+            # Informed sampling only differs from uniform sampling once a solution is known
+            sampler.update_solution(1.2 * cfg.start_node.distance_to(cfg.end_node))
+            median, best, number = time_call(sampler.sample)
+            yield BenchmarkResult('sample', {'structure': f'sampler_{sampler_name}', 'obstacles': n_obstacles},
+                                  median, best, 5, number)
+
+
+def bench_export(tree_sizes, grid_size: float = 100, seed: int = 0) -> Generator[BenchmarkResult, None, None]:
+    for n_nodes in tree_sizes:
+        tree = random_tree(n_nodes, grid_size, seed)
+        median, best, number = time_call(tree.export)
+        yield BenchmarkResult('export', {'nodes': n_nodes}, median, best, 5, number)
+        median, best, number = time_call(lambda: tree.positions[tree.edges])
+        yield BenchmarkResult('export_segments', {'nodes': n_nodes}, median, best, 5, number)
+
+
+def bench_planning(algorithms=('rrt', 'rrt_star', 'rrt_connect'), obstacle_counts=(0, 100), grid_size: int = 100,
+                   max_steps: int = 2000, seeds=range(5)) -> Generator[BenchmarkResult, None, None]:
+    """Full headless planning runs, one timing per run so the median is taken over seeds."""
+    for n_obstacles in obstacle_counts:
+        start, end = Pose(1, 1), Pose(grid_size - 1, grid_size - 1)
+        obstacles = random_obstacles(n_obstacles, grid_size, seed=0, max_fraction=0.2) if n_obstacles else []
+        # Keep the query solvable in principle by clearing start and end
+        obstacle_map = ObstacleMap([obs for obs in obstacles if not obs.contains(start) and not obs.contains(end)])
+        for algorithm in algorithms:
+            cfg = dataclasses.replace(RrtConfig(), grid_size=grid_size, max_steps=max_steps, algorithm=algorithm,
+                                      refine_steps=max_steps // 4, start_node=Node(start), end_node=Node(end))
+            results = [plan(cfg, obstacle_map, seed=seed) for seed in seeds]
+            timings = [result.elapsed_time for result in results]
+            successful = [result for result in results if result.success]
+            extra = {
+                'success_rate': len(successful) / len(results),
+                'mean_path_length': float(np.mean([r.path_length for r in successful])) if successful else None,
+                'mean_first_solution_time': float(np.mean([r.first_solution_time for r in successful]))
+                if successful else None,
+                'mean_nodes': float(np.mean([r.num_nodes for r in results])),
+            }
+            yield BenchmarkResult('plan', {'algorithm': algorithm, 'obstacles': n_obstacles},
+                                  statistics.median(timings), min(timings), len(timings), 1, extra)
+
+
+def run_all(quick: bool = False) -> Generator[BenchmarkResult, None, None]:
+    tree_sizes = QUICK_TREE_SIZES if quick else TREE_SIZES
+    obstacle_counts = QUICK_OBSTACLE_COUNTS if quick else OBSTACLE_COUNTS
+    yield from bench_nearest(tree_sizes)
+    yield from bench_collision(obstacle_counts)
+    yield from bench_sampling(obstacle_counts)
+    yield from bench_export(tree_sizes)
+    yield from bench_planning(seeds=range(2) if quick else range(5))
+
+
+def environment() -> dict:
+    """Describe where the benchmark ran, including the git commit if available."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'numpy': np.__version__,
+            'machine': platform.machine(), 'processor': platform.processor(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def compare(baseline: list[dict], current: list[dict]) -> list[tuple[str, float, float, float]]:
+    """Match benchmark results of two runs by case and return (case, baseline median, current median, ratio)."""
+    baseline_by_key = {BenchmarkResult(**result).key: result for result in baseline}
+    rows = []
+    for result in current:
+        key = BenchmarkResult(**result).key
+        if key in baseline_by_key:
+            old, new = baseline_by_key[key]['median'], result['median']
+            rows.append((key, old, new, new / old if old > 0 else float('inf')))
+    return rows
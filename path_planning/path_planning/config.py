@@ -12,3 +12,16 @@ class RrtConfig:
     max_steps: int = 1000
     clamp_dist: float = 4
     fast_plot: bool = False
+    nearest_index: str = 'grid'  # one of path_planning.nearest.NEAREST_INDICES
+    algorithm: str = 'rrt'  # one of path_planning.planner.ALGORITHMS
+    rewire_gamma: float = None  # RRT* neighbourhood scale, derived from the grid area if None
+    refine_steps: int = None  # RRT* nodes inserted after the first solution, None refines until max_steps
+    time_budget: float = None  # wall time limit of a planning run in seconds
+    goal_bias: float = 0.0  # probability of sampling the end node instead of a random pose
+    sampler: str = 'uniform'  # one of path_planning.sampling.SAMPLERS
+    map_resolution: float = None  # cell size of a rasterized OccupancyMap, None checks the obstacle rectangles exactly
+    clearance: float = 0.0  # minimum distance of the path to obstacles, needs map_resolution
+    path_shortcut: str = None  # one of path_planning.path_processing.SHORTCUT_METHODS applied to the final path
+    path_smoothing: int = 0  # corner cutting passes applied to the final path
+    roadmap_samples: int = 2000  # vertices of a PRM roadmap, see path_planning.roadmap
+    roadmap_radius: float = None  # PRM connection radius, derived from the grid area and roadmap_samples if None
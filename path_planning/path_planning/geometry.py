@@ -1,3 +1,6 @@
+import numpy as np
+
+
 def intersects(segment_1: list, segment_2: list) -> bool:
     """Assumes line segments are stored in the format [(x0,y0),(x1,y1)]"""
     dx0 = segment_1[1][0] - segment_1[0][0]
@@ -9,3 +12,42 @@ def intersects(segment_1: list, segment_2: list) -> bool:
     p2 = dy0 * (segment_1[1][0] - segment_2[0][0]) - dx0 * (segment_1[1][1] - segment_2[0][1])
     p3 = dy0 * (segment_1[1][0] - segment_2[1][0]) - dx0 * (segment_1[1][1] - segment_2[1][1])
     return (p0 * p1 <= 0) & (p2 * p3 <= 0)
+
+
+def intersects_pairwise(segments_1: np.ndarray, segments_2: np.ndarray) -> np.ndarray:
+    """Vectorized version of intersects for arrays of segments of shape (..., 2, 2), each holding [(x0,y0),(x1,y1)].
+    The leading dimensions are broadcast against each other and the boolean result has their broadcast shape."""
+    s0, s1 = np.asarray(segments_1, dtype=float), np.asarray(segments_2, dtype=float)
+    dx0 = s0[..., 1, 0] - s0[..., 0, 0]
+    dx1 = s1[..., 1, 0] - s1[..., 0, 0]
+    dy0 = s0[..., 1, 1] - s0[..., 0, 1]
+    dy1 = s1[..., 1, 1] - s1[..., 0, 1]
+    p0 = dy1 * (s1[..., 1, 0] - s0[..., 0, 0]) - dx1 * (s1[..., 1, 1] - s0[..., 0, 1])
+    p1 = dy1 * (s1[..., 1, 0] - s0[..., 1, 0]) - dx1 * (s1[..., 1, 1] - s0[..., 1, 1])
+    p2 = dy0 * (s0[..., 1, 0] - s1[..., 0, 0]) - dx0 * (s0[..., 1, 1] - s1[..., 0, 1])
+    p3 = dy0 * (s0[..., 1, 0] - s1[..., 1, 0]) - dx0 * (s0[..., 1, 1] - s1[..., 1, 1])
+    return (p0 * p1 <= 0) & (p2 * p3 <= 0)
+
+
+def intersects_many(query_segments: np.ndarray, obstacle_segments: np.ndarray) -> np.ndarray:
+    """Segments are arrays of shape (n, 2, 2). Returns a boolean array telling for every query segment whether it
+    intersects any of the obstacle segments."""
+    query_segments = np.asarray(query_segments, dtype=float).reshape(-1, 2, 2)
+    obstacle_segments = np.asarray(obstacle_segments, dtype=float).reshape(-1, 2, 2)
+    return intersects_pairwise(query_segments[:, None], obstacle_segments[None, :]).any(axis=1)
+
+
+def points_in_boxes_pairwise(points: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    """Elementwise test whether points of shape (..., 2) lie inside (or on the border of) axis aligned boxes of shape
+    (..., 4) stored as (x_min, y_min, x_max, y_max). Leading dimensions are broadcast against each other."""
+    points, boxes = np.asarray(points, dtype=float), np.asarray(boxes, dtype=float)
+    x, y = points[..., 0], points[..., 1]
+    return (x >= boxes[..., 0]) & (x <= boxes[..., 2]) & (y >= boxes[..., 1]) & (y <= boxes[..., 3])
+
+
+def points_in_boxes(points: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    """For points of shape (n, 2) and axis aligned boxes of shape (m, 4) stored as (x_min, y_min, x_max, y_max),
+    return a boolean array telling for every point whether it lies inside (or on the border of) any box."""
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+    return points_in_boxes_pairwise(points[:, None], boxes[None, :]).any(axis=1)
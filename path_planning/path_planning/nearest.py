@@ -0,0 +1,135 @@
+import math
+from abc import ABC, abstractmethod
+from collections import defaultdict
+
+import numpy as np
+
+from path_planning.tree import Tree
+
+
+class NearestNeighbourIndex(ABC):
+    """Spatial index over the vertices of a Tree answering nearest and radius queries. The index does not copy
+    positions, it only organizes vertex indices and has to be told about every vertex added to the tree."""
+
+    def __init__(self, tree: Tree) -> None:
+        self.tree = tree
+
+    @abstractmethod
+    def insert(self, index: int) -> None:
+        """Register the tree vertex with the given index."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def nearest(self, x: float, y: float) -> int:
+        """Return the index of the tree vertex closest to (x, y)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def within_radius(self, x: float, y: float, radius: float) -> np.ndarray:
+        """Return the indices of all tree vertices with a distance of at most radius to (x, y)."""
+        raise NotImplementedError
+
+
+class BruteForceIndex(NearestNeighbourIndex):
+    """Vectorized linear scan over all vertices, no bookkeeping needed."""
+
+    def insert(self, index: int) -> None:
+        pass
+
+    def nearest(self, x: float, y: float) -> int:
+        squared_distances = (self.tree.x - x) ** 2 + (self.tree.y - y) ** 2
+        return int(np.argmin(squared_distances))
+
+    def within_radius(self, x: float, y: float, radius: float) -> np.ndarray:
+        squared_distances = (self.tree.x - x) ** 2 + (self.tree.y - y) ** 2
+        return np.flatnonzero(squared_distances <= radius ** 2)
+
+
+class GridIndex(NearestNeighbourIndex):
+    """Uniform grid bucketing vertices into square cells. Nearest queries search rings of cells around the query
+    cell and stop as soon as no unvisited ring can contain a closer vertex."""
+
+    def __init__(self, tree: Tree, cell_size: float) -> None:
+        super().__init__(tree)
+        if cell_size <= 0:
+            raise ValueError(f'Grid cell size has to be positive, got {cell_size}.')
+        self.cell_size = cell_size
+        self._cells: dict[tuple[int, int], list[int]] = defaultdict(list)
+        self._min_cell = [math.inf, math.inf]
+        self._max_cell = [-math.inf, -math.inf]
+        for index in range(len(tree)):
+            self.insert(index)
+
+    def _cell(self, x: float, y: float) -> tuple[int, int]:
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def insert(self, index: int) -> None:
+        x, y = self.tree.positions[index]
+        cell = self._cell(x, y)
+        self._cells[cell].append(index)
+        self._min_cell = [min(self._min_cell[0], cell[0]), min(self._min_cell[1], cell[1])]
+        self._max_cell = [max(self._max_cell[0], cell[0]), max(self._max_cell[1], cell[1])]
+
+    def _ring(self, ci: int, cj: int, ring: int) -> list[int]:
+        if ring == 0:
+            return self._cells.get((ci, cj), [])
+        candidates = []
+        for i in range(ci - ring, ci + ring + 1):
+            candidates.extend(self._cells.get((i, cj - ring), []))
+            candidates.extend(self._cells.get((i, cj + ring), []))
+        for j in range(cj - ring + 1, cj + ring):
+            candidates.extend(self._cells.get((ci - ring, j), []))
+            candidates.extend(self._cells.get((ci + ring, j), []))
+        return candidates
+
+    def nearest(self, x: float, y: float) -> int:
+        if not self._cells:
+            raise ValueError('Nearest neighbour query on an empty index.')
+        ci, cj = self._cell(x, y)
+        # Beyond this ring all occupied cells have been visited
+        max_ring = max(ci - self._min_cell[0], self._max_cell[0] - ci,
+                       cj - self._min_cell[1], self._max_cell[1] - cj)
+        positions = self.tree.positions
+        best_index, best_squared_distance = -1, math.inf
+        ring = 0
+        while ring <= max_ring:
+            candidates = self._ring(ci, cj, ring)
+            if candidates:
+                candidates = np.array(candidates)
+                squared_distances = (positions[candidates, 0] - x) ** 2 + (positions[candidates, 1] - y) ** 2
+                arg = int(np.argmin(squared_distances))
+                if squared_distances[arg] < best_squared_distance:
+                    best_index, best_squared_distance = int(candidates[arg]), squared_distances[arg]
+            # Every vertex in ring + 1 or further away is at least ring * cell_size away
+            if best_index >= 0 and best_squared_distance <= (ring * self.cell_size) ** 2:
+                break
+            ring += 1
+        return best_index
+
+    def within_radius(self, x: float, y: float, radius: float) -> np.ndarray:
+        if not self._cells:
+            return np.empty(0, dtype=np.int64)
+        i_min, j_min = self._cell(x - radius, y - radius)
+        i_max, j_max = self._cell(x + radius, y + radius)
+        candidates = []
+        for i in range(max(i_min, self._min_cell[0]), min(i_max, self._max_cell[0]) + 1):
+            for j in range(max(j_min, self._min_cell[1]), min(j_max, self._max_cell[1]) + 1):
+                candidates.extend(self._cells.get((i, j), []))
+        if not candidates:
+            return np.empty(0, dtype=np.int64)
+        candidates = np.array(candidates)
+        positions = self.tree.positions
+        squared_distances = (positions[candidates, 0] - x) ** 2 + (positions[candidates, 1] - y) ** 2
+        return np.sort(candidates[squared_distances <= radius ** 2])
+
+
+NEAREST_INDICES = ('brute', 'grid')
+
+
+def make_nearest_index(name: str, tree: Tree, cell_size: float) -> NearestNeighbourIndex:
+    """Create the nearest neighbour backend with the given name for the given tree."""
+    if name == 'brute':
+        return BruteForceIndex(tree)
+    if name == 'grid':
+        return GridIndex(tree, cell_size)
+    raise ValueError(f'Unknown nearest neighbour index {name}, choose one of {NEAREST_INDICES}.')
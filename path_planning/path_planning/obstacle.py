@@ -1,3 +1,6 @@
+import numpy as np
+
+from path_planning.geometry import intersects_many, points_in_boxes
 from path_planning.tree import Pose
 
 
@@ -23,3 +26,39 @@ class Obstacle:
                 [(self.x + self.width, self.y), (self.x + self.width, self.y + self.height)],
                 [(self.x + self.width, self.y + self.height), (self.x, self.y + self.height)],
                 [(self.x, self.y + self.height), (self.x, self.y)]]
+
+    @property
+    def box(self) -> tuple:
+        """Axis aligned bounding box as (x_min, y_min, x_max, y_max)."""
+        return self.x, self.y, self.x + self.width, self.y + self.height
+
+
+class CompiledObstacles:
+    """A list of obstacles compiled once into contiguous arrays: all border segments with shape (4 * n, 2, 2) and all
+    boxes with shape (n, 4), so that collision checks run vectorized over all obstacles."""
+    __slots__ = ('obstacles', 'segments', 'boxes')
+
+    def __init__(self, obstacles: list[Obstacle]) -> None:
+        self.obstacles = list(obstacles)
+        self.segments = np.array([obs.segments for obs in self.obstacles], dtype=float).reshape(-1, 2, 2)
+        self.boxes = np.array([obs.box for obs in self.obstacles], dtype=float).reshape(-1, 4)
+
+    def __len__(self) -> int:
+        return len(self.obstacles)
+
+    def contains(self, pose: Pose) -> bool:
+        return bool(self.contains_many(np.array([pose.x, pose.y]))[0])
+
+    def contains_many(self, points: np.ndarray) -> np.ndarray:
+        """Boolean mask telling for every point of shape (n, 2) whether it lies inside any obstacle."""
+        return points_in_boxes(points, self.boxes)
+
+    def blocks_many(self, query_segments: np.ndarray) -> np.ndarray:
+        """Boolean mask telling for every segment of shape (n, 2, 2) whether it collides with any obstacle. A segment
+        which crosses no border is either completely inside or outside of every box, so testing its start is enough."""
+        query_segments = np.asarray(query_segments, dtype=float).reshape(-1, 2, 2)
+        return intersects_many(query_segments, self.segments) | self.contains_many(query_segments[:, 0])
+
+    def blocks(self, segment) -> bool:
+        """Scalar version of blocks_many for a single segment [(x0,y0),(x1,y1)]."""
+        return bool(self.blocks_many(segment)[0])
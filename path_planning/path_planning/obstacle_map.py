@@ -0,0 +1,117 @@
+import math
+
+import numpy as np
+
+from path_planning.geometry import intersects_pairwise, points_in_boxes_pairwise
+from path_planning.obstacle import CompiledObstacles, Obstacle
+from path_planning.tree import Pose
+
+
+class ObstacleMap(CompiledObstacles):
+    """Obstacles bucketed by their bounding boxes into a uniform grid. Queries only run exact tests against the
+    obstacles registered in the grid cells they touch, everything outside of the grid is free space."""
+    __slots__ = ('cell_size', '_origin', '_shape', '_cells', '_cell_table', '_padded_boxes', '_padded_borders')
+    # Upper bound for the number of (query, candidate) pairs tested at once by blocks_many
+    _MAX_PAIRS = 2 ** 18
+
+    def __init__(self, obstacles: list[Obstacle], cell_size: float = None) -> None:
+        super().__init__(obstacles)
+        n_obstacles = len(self.obstacles)
+        if n_obstacles == 0:
+            self._origin = np.zeros(2)
+            extent = np.ones(2)
+        else:
+            self._origin = self.boxes[:, :2].min(axis=0)
+            extent = self.boxes[:, 2:].max(axis=0) - self._origin
+        if cell_size is None:
+            # Roughly one obstacle per cell for evenly spread obstacles
+            cell_size = max(float(extent.max()), 1e-9) / max(1, math.ceil(math.sqrt(n_obstacles)))
+        if cell_size <= 0:
+            raise ValueError(f'Grid cell size has to be positive, got {cell_size}.')
+        self.cell_size = cell_size
+        self._shape = (int(extent[0] // cell_size) + 1, int(extent[1] // cell_size) + 1)
+
+        self._cells: list[list[int]] = [[] for _ in range(self._shape[0] * self._shape[1])]
+        for obs_idx, box in enumerate(self.boxes):
+            for cell in self._cells_in_range(*box):
+                self._cells[cell].append(obs_idx)
+        # Padded (n_cells + 1, max_per_cell) lookup table for vectorized queries, the padding index points to an
+        # all-NaN obstacle which never collides with anything and the extra last row is an always empty cell
+        max_per_cell = max([len(cell) for cell in self._cells] + [1])
+        self._cell_table = np.full((len(self._cells) + 1, max_per_cell), n_obstacles, dtype=np.int64)
+        for cell, obs_indices in enumerate(self._cells):
+            self._cell_table[cell, :len(obs_indices)] = obs_indices
+        self._padded_boxes = np.vstack([self.boxes, np.full((1, 4), np.nan)])
+        self._padded_borders = np.concatenate([self.segments.reshape(-1, 4, 2, 2), np.full((1, 4, 2, 2), np.nan)])
+
+    def _cells_in_range(self, x_min: float, y_min: float, x_max: float, y_max: float) -> list[int]:
+        """Flat indices of all grid cells overlapping the given box."""
+        i_min = max(int((x_min - self._origin[0]) // self.cell_size), 0)
+        j_min = max(int((y_min - self._origin[1]) // self.cell_size), 0)
+        i_max = min(int((x_max - self._origin[0]) // self.cell_size), self._shape[0] - 1)
+        j_max = min(int((y_max - self._origin[1]) // self.cell_size), self._shape[1] - 1)
+        return [i * self._shape[1] + j for i in range(i_min, i_max + 1) for j in range(j_min, j_max + 1)]
+
+    def candidates(self, x_min: float, y_min: float, x_max: float, y_max: float) -> np.ndarray:
+        """Indices of all obstacles sharing a grid cell with the given box, a superset of all obstacles it overlaps."""
+        obs_indices = set()
+        for cell in self._cells_in_range(x_min, y_min, x_max, y_max):
+            obs_indices.update(self._cells[cell])
+        return np.fromiter(obs_indices, dtype=np.int64, count=len(obs_indices))
+
+    def contains(self, pose: Pose) -> bool:
+        for obs_idx in self.candidates(pose.x, pose.y, pose.x, pose.y):
+            if self.obstacles[obs_idx].contains(pose):
+                return True
+        return False
+
+    def contains_many(self, points: np.ndarray) -> np.ndarray:
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        cell_ij = np.floor((points - self._origin) / self.cell_size).astype(np.int64)
+        in_grid = (cell_ij >= 0).all(axis=1) & (cell_ij[:, 0] < self._shape[0]) & (cell_ij[:, 1] < self._shape[1])
+        inside = np.zeros(len(points), dtype=bool)
+        cells = cell_ij[in_grid, 0] * self._shape[1] + cell_ij[in_grid, 1]
+        candidate_boxes = self._padded_boxes[self._cell_table[cells]]  # (n, max_per_cell, 4)
+        inside[in_grid] = points_in_boxes_pairwise(points[in_grid, None], candidate_boxes).any(axis=1)
+        return inside
+
+    def blocks_many(self, query_segments: np.ndarray) -> np.ndarray:
+        query_segments = np.asarray(query_segments, dtype=float).reshape(-1, 2, 2)
+        blocked = np.zeros(len(query_segments), dtype=bool)
+        if len(query_segments) == 0:
+            return blocked
+        shape = np.array(self._shape)
+        lower = np.floor((query_segments.min(axis=1) - self._origin) / self.cell_size).astype(np.int64)
+        upper = np.floor((query_segments.max(axis=1) - self._origin) / self.cell_size).astype(np.int64)
+        lower, upper = np.maximum(lower, 0), np.minimum(upper, shape - 1)
+        in_grid = np.flatnonzero((lower <= upper).all(axis=1))
+        if len(in_grid) == 0:
+            return blocked
+        # Enumerate the cells overlapped by each segment's bounding box as offsets from its lower cell, offsets
+        # outside of a box are redirected to the empty cell
+        span_i, span_j = (upper[in_grid] - lower[in_grid] + 1).max(axis=0)
+        offset_i, offset_j = np.divmod(np.arange(span_i * span_j), span_j)
+        n_candidates = span_i * span_j * self._cell_table.shape[1]
+        chunk_size = max(1, self._MAX_PAIRS // n_candidates)
+        for chunk_start in range(0, len(in_grid), chunk_size):
+            chunk = in_grid[chunk_start:chunk_start + chunk_size]
+            cell_i = lower[chunk, 0, None] + offset_i
+            cell_j = lower[chunk, 1, None] + offset_j
+            cells = np.where((cell_i <= upper[chunk, 0, None]) & (cell_j <= upper[chunk, 1, None]),
+                             cell_i * self._shape[1] + cell_j, len(self._cell_table) - 1)
+            candidates = self._cell_table[cells].reshape(len(chunk), -1)
+            segments = query_segments[chunk]
+            hits = intersects_pairwise(segments[:, None, None], self._padded_borders[candidates]).any(axis=(1, 2))
+            hits |= points_in_boxes_pairwise(segments[:, None, 0], self._padded_boxes[candidates]).any(axis=1)
+            blocked[chunk] = hits
+        return blocked
+
+    def blocks(self, segment) -> bool:
+        segment = np.asarray(segment, dtype=float).reshape(2, 2)
+        candidates = self.candidates(*segment.min(axis=0), *segment.max(axis=0))
+        if len(candidates) == 0:
+            return False
+        obstacle_borders = self.segments.reshape(-1, 4, 2, 2)[candidates].reshape(-1, 2, 2)
+        if intersects_pairwise(segment[None], obstacle_borders).any():
+            return True
+        return bool(points_in_boxes_pairwise(segment[0], self.boxes[candidates]).any())
@@ -0,0 +1,207 @@
+import math
+
+import numpy as np
+
+from path_planning.obstacle import CompiledObstacles, Obstacle
+from path_planning.tree import Pose
+
+
+def _lower_envelope_1d(f: np.ndarray) -> np.ndarray:
+    """Squared distance transform along the last axis, min over p of f[..., p] + (q - p)^2 for every q, by the lower
+    envelope of parabolas of Felzenszwalb & Huttenlocher. The loop runs over the columns while all rows are processed
+    in lockstep, so there are O(n) numpy calls for an (m, n) array. Infinite entries are no parabola base."""
+    n_rows, n = f.shape
+    bases = np.zeros((n_rows, n), dtype=np.int64)  # v in the paper
+    bounds = np.full((n_rows, n + 1), np.inf)  # z in the paper
+    bounds[:, 0] = -np.inf
+    top = np.full(n_rows, -1)  # index of the last parabola in the envelope, -1 for an empty envelope
+
+    for q in range(n):
+        active = np.flatnonzero(np.isfinite(f[:, q]))
+        if len(active) == 0:
+            continue
+        is_first = top[active] < 0
+        bases[active[is_first], 0] = q
+        top[active[is_first]] = 0
+        active = active[~is_first]
+        value = f[active, q] + q * q
+        while len(active):
+            v = bases[active, top[active]]
+            s = (value - (f[active, v] + v * v)) / (2 * (q - v))
+            popped = s <= bounds[active, top[active]]
+            done = active[~popped]
+            top[done] += 1
+            bases[done, top[done]] = q
+            bounds[done, top[done]] = s[~popped]
+            bounds[done, top[done] + 1] = np.inf
+            active, value = active[popped], value[popped]
+            top[active] -= 1
+
+    result = np.full((n_rows, n), np.inf)
+    filled = np.flatnonzero(top >= 0)
+    k = np.zeros(len(filled), dtype=np.int64)
+    for q in range(n):
+        while True:
+            advance = bounds[filled, k + 1] < q
+            if not advance.any():
+                break
+            k[advance] += 1
+        v = bases[filled, k]
+        result[filled, q] = (q - v) ** 2 + f[filled, v]
+    return result
+
+
+def distance_transform(occupied: np.ndarray) -> np.ndarray:
+    """Exact Euclidean distance of every cell center to the closest occupied cell center, in cells. Separable: a 1D
+    transform along the first axis followed by one along the second. Infinite everywhere if nothing is occupied."""
+    squared = np.where(occupied, 0.0, np.inf)
+    squared = _lower_envelope_1d(squared.T).T
+    squared = _lower_envelope_1d(squared)
+    return np.sqrt(squared)
+
+
+class OccupancyMap(CompiledObstacles):
+    """Rasterized map: a boolean occupancy grid with cells of size resolution plus its Euclidean distance field.
+    occupancy[i, j] covers [x0 + i * resolution, x0 + (i + 1) * resolution) x [y0 + j * ..., ...) with (x0, y0) the
+    origin, everything outside of the grid is free space.
+
+    A point collides if the distance of its cell to the closest occupied cell is at most clearance, which is an
+    array lookup. Single segments are checked by marching along them: from a point with distance d the next possible
+    collision is at least d - clearance - sqrt(2) * resolution away, so the march takes steps of that length, but at
+    least half a cell. Like any raster check this may cut the corner of a cell. Only obstacles built from rectangles
+    are kept in obstacles, e.g. for plotting."""
+    __slots__ = ('occupancy', 'distances', 'resolution', 'origin', 'clearance')
+    # Upper bound for the number of points looked up at once by blocks_many
+    _MAX_POINTS = 2 ** 18
+
+    def __init__(self, occupancy: np.ndarray, resolution: float = 1.0, origin: tuple[float, float] = (0.0, 0.0),
+                 clearance: float = 0.0, obstacles: list[Obstacle] = None) -> None:
+        super().__init__(obstacles if obstacles is not None else [])
+        if resolution <= 0:
+            raise ValueError(f'Map resolution has to be positive, got {resolution}.')
+        if clearance < 0:
+            raise ValueError(f'Clearance can not be negative, got {clearance}.')
+        self.occupancy = np.asarray(occupancy, dtype=bool)
+        if self.occupancy.ndim != 2:
+            raise ValueError(f'Occupancy grid has to be two dimensional, got shape {self.occupancy.shape}.')
+        self.resolution = resolution
+        self.origin = np.array(origin, dtype=float)
+        self.clearance = clearance
+        self.distances = distance_transform(self.occupancy) * resolution
+
+    @property
+    def reach(self) -> float:
+        """How far blocked space may extend beyond a rasterized rectangle: the cells it touches stick out by up to a
+        cell and distances are measured between cell centres, so another cell is added to the clearance."""
+        return self.clearance + 2 * self.resolution
+
+    @classmethod
+    def from_obstacles(cls, obstacles: list[Obstacle], grid_size: float, resolution: float = 0.5,
+                       clearance: float = 0.0) -> 'OccupancyMap':
+        """Rasterize rectangles onto a grid covering [0, grid_size]^2 plus a margin, so that obstacles just outside of
+        it still count for the clearance. Every cell touched by a rectangle is occupied."""
+        margin = clearance + 2 * resolution
+        origin = np.array([-margin, -margin])
+        n_cells = int(math.ceil((grid_size + 2 * margin) / resolution))
+        occupancy = np.zeros((n_cells, n_cells), dtype=bool)
+        for obs in obstacles:
+            lower = np.floor((np.array(obs.box[:2]) - origin) / resolution).astype(int)
+            upper = np.floor((np.array(obs.box[2:]) - origin) / resolution).astype(int)
+            lower, upper = np.maximum(lower, 0), np.minimum(upper, n_cells - 1)
+            if (lower <= upper).all():
+                occupancy[lower[0]:upper[0] + 1, lower[1]:upper[1] + 1] = True
+        return cls(occupancy, resolution, origin, clearance, obstacles)
+
+    @classmethod
+    def from_array(cls, grid: np.ndarray, resolution: float = 1.0, origin: tuple[float, float] = (0.0, 0.0),
+                   clearance: float = 0.0, threshold: float = 0.5, image_layout: bool = False) -> 'OccupancyMap':
+        """Occupancy from a grayscale or RGB(A) array, cells darker than threshold (in [0, 1] intensity) are occupied.
+        With image_layout the array is a picture, its first row at the top and indexed [row, column]."""
+        grid = np.asarray(grid)
+        if grid.dtype == bool:
+            occupancy = grid
+        else:
+            intensity = grid.astype(float)
+            if np.issubdtype(grid.dtype, np.integer):
+                intensity /= np.iinfo(grid.dtype).max
+            if intensity.ndim == 3:
+                intensity = intensity[..., :3].mean(axis=2)
+            occupancy = intensity < threshold
+        if image_layout:
+            occupancy = occupancy[::-1].T
+        return cls(occupancy, resolution, origin, clearance)
+
+    @classmethod
+    def load(cls, path: str, resolution: float = 1.0, origin: tuple[float, float] = (0.0, 0.0),
+             clearance: float = 0.0, threshold: float = 0.5) -> 'OccupancyMap':
+        """Load a map from a .npy file indexed [x, y] or from an image file (png, ...) where dark pixels are
+        occupied."""
+        if path.endswith('.npy'):
+            return cls.from_array(np.load(path), resolution, origin, clearance, threshold)
+        from matplotlib import image
+        return cls.from_array(image.imread(path), resolution, origin, clearance, threshold, image_layout=True)
+
+    def _cells(self, points: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        cell_ij = np.floor((points - self.origin) / self.resolution).astype(np.int64)
+        in_grid = (cell_ij >= 0).all(axis=-1) & (cell_ij[..., 0] < self.occupancy.shape[0]) \
+            & (cell_ij[..., 1] < self.occupancy.shape[1])
+        return cell_ij, in_grid
+
+    def distance_many(self, points: np.ndarray) -> np.ndarray:
+        """Distance of the cells of all points of shape (n, 2) to the closest occupied cell, infinite outside."""
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        cell_ij, in_grid = self._cells(points)
+        distances = np.full(len(points), np.inf)
+        distances[in_grid] = self.distances[cell_ij[in_grid, 0], cell_ij[in_grid, 1]]
+        return distances
+
+    def distance(self, x: float, y: float) -> float:
+        """Scalar version of distance_many."""
+        i = math.floor((x - self.origin[0]) / self.resolution)
+        j = math.floor((y - self.origin[1]) / self.resolution)
+        if 0 <= i < self.occupancy.shape[0] and 0 <= j < self.occupancy.shape[1]:
+            return float(self.distances[i, j])
+        return math.inf
+
+    def contains(self, pose: Pose) -> bool:
+        return self.distance(pose.x, pose.y) <= self.clearance
+
+    def contains_many(self, points: np.ndarray) -> np.ndarray:
+        return self.distance_many(points) <= self.clearance
+
+    def blocks_many(self, query_segments: np.ndarray) -> np.ndarray:
+        """Batches are not marched but sampled every half cell along the segments, which takes a single distance
+        lookup per chunk of segments instead of one per march step."""
+        query_segments = np.asarray(query_segments, dtype=float).reshape(-1, 2, 2)
+        blocked = np.zeros(len(query_segments), dtype=bool)
+        if len(query_segments) == 0:
+            return blocked
+        starts = query_segments[:, 0]
+        deltas = query_segments[:, 1] - starts
+        lengths = np.hypot(deltas[:, 0], deltas[:, 1])
+        n_samples = int(math.ceil(lengths.max() / (self.resolution / 2))) + 1
+        fractions = np.linspace(0, 1, n_samples)
+        chunk_size = max(1, self._MAX_POINTS // n_samples)
+        for chunk_start in range(0, len(query_segments), chunk_size):
+            chunk = slice(chunk_start, chunk_start + chunk_size)
+            points = starts[chunk, None] + fractions[:, None] * deltas[chunk, None]
+            distances = self.distance_many(points).reshape(-1, n_samples)
+            blocked[chunk] = (distances <= self.clearance).any(axis=1)
+        return blocked
+
+    def blocks(self, segment) -> bool:
+        """Scalar version of blocks_many, a plain Python march is cheaper than array calls for a single segment."""
+        (x0, y0), (x1, y1) = segment
+        if self.distance(x1, y1) <= self.clearance:
+            return True
+        length = math.hypot(x1 - x0, y1 - y0)
+        min_step = self.resolution / 2
+        margin = self.clearance + math.sqrt(2) * self.resolution
+        travelled = 0.0
+        while travelled < length:
+            fraction = travelled / length
+            distance = self.distance(x0 + fraction * (x1 - x0), y0 + fraction * (y1 - y0))
+            if distance <= self.clearance:
+                return True
+            travelled += max(distance - margin, min_step)
+        return False
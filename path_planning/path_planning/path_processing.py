@@ -0,0 +1,119 @@
+import numpy as np
+
+from path_planning.obstacle import CompiledObstacles
+
+SHORTCUT_METHODS = ('greedy', 'random')
+
+
+class CollisionCache:
+    """Memoizes segment collision checks against compiled obstacles. Post-processing asks for the same segments over
+    and over, e.g. shortcut candidates between waypoints that survived an earlier pass, and only segments not seen
+    before are passed on, in one vectorized blocks_many call per query batch. Segments are keyed by their end points
+    in both directions."""
+
+    def __init__(self, obstacles: CompiledObstacles) -> None:
+        self.obstacles = obstacles
+        self._cache: dict[tuple[float, float, float, float], bool] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(segment) -> tuple[float, float, float, float]:
+        (x0, y0), (x1, y1) = segment
+        return (x0, y0, x1, y1) if (x0, y0) <= (x1, y1) else (x1, y1, x0, y0)
+
+    def blocks_many(self, segments: np.ndarray) -> np.ndarray:
+        segments = np.asarray(segments, dtype=float).reshape(-1, 2, 2)
+        keys = [self._key(segment) for segment in segments.tolist()]
+        blocked = np.zeros(len(keys), dtype=bool)
+        unknown = []
+        for idx, key in enumerate(keys):
+            cached = self._cache.get(key)
+            if cached is None:
+                unknown.append(idx)
+            else:
+                blocked[idx] = cached
+        self.hits += len(keys) - len(unknown)
+        self.misses += len(unknown)
+        if unknown:
+            blocked[unknown] = self.obstacles.blocks_many(segments[unknown])
+            for idx in unknown:
+                self._cache[keys[idx]] = bool(blocked[idx])
+        return blocked
+
+    def blocks(self, segment) -> bool:
+        return bool(self.blocks_many(segment)[0])
+
+
+def path_length(path: np.ndarray) -> float:
+    """Sum of the segment lengths of a (n, 2) waypoint array."""
+    return float(np.hypot(*np.diff(path, axis=0).T).sum())
+
+
+def shortcut_greedy(path: np.ndarray, collisions: CollisionCache) -> np.ndarray:
+    """From each kept waypoint jump to the furthest later waypoint it can see, all candidates of a waypoint are checked
+    in one batch. Consecutive waypoints are assumed to be connected by free segments."""
+    kept = [0]
+    while kept[-1] < len(path) - 1:
+        current = kept[-1]
+        targets = np.arange(current + 1, len(path))
+        segments = np.stack([np.broadcast_to(path[current], (len(targets), 2)), path[targets]], axis=1)
+        free = np.flatnonzero(~collisions.blocks_many(segments))
+        kept.append(int(targets[free[-1]]) if len(free) else current + 1)
+    return path[kept]
+
+
+def shortcut_random(path: np.ndarray, collisions: CollisionCache, iterations: int = 100,
+                    rng: np.random.Generator = None) -> np.ndarray:
+    """Repeatedly connect two random non adjacent waypoints and drop the waypoints in between if that is free."""
+    rng = rng if rng is not None else np.random.default_rng()
+    path = np.asarray(path)
+    for _ in range(iterations):
+        if len(path) < 3:
+            break
+        first, second = sorted(rng.choice(len(path), size=2, replace=False))
+        if second - first < 2:
+            continue
+        if not collisions.blocks((path[first], path[second])):
+            path = np.concatenate([path[:first + 1], path[second:]])
+    return path
+
+
+def smooth(path: np.ndarray, collisions: CollisionCache, iterations: int = 3) -> np.ndarray:
+    """Chaikin corner cutting, which converges to the quadratic B-spline of the waypoints. Each pass replaces every
+    inner waypoint by two points at a quarter of its adjacent segments. The new points lie on the old segments, so
+    only the segments cutting the corners are collision checked, corners whose cut collides are kept as they are.
+    Start and end stay fixed."""
+    for _ in range(iterations):
+        if len(path) < 3:
+            break
+        starts, ends = path[:-1], path[1:]
+        near_start, near_end = 0.75 * starts + 0.25 * ends, 0.25 * starts + 0.75 * ends
+        # The cut of inner waypoint i goes from near_end of segment i - 1 to near_start of segment i
+        cuts = np.stack([near_end[:-1], near_start[1:]], axis=1)
+        keep_corner = collisions.blocks_many(cuts)
+        points = [path[:1]]
+        for corner, kept in enumerate(keep_corner, start=1):
+            points.append(near_end[corner - 1:corner])
+            if kept:
+                points.append(path[corner:corner + 1])
+            points.append(near_start[corner:corner + 1])
+        points.append(path[-1:])
+        path = np.concatenate(points)
+    return path
+
+
+def postprocess_path(path: np.ndarray, obstacles: CompiledObstacles, shortcut: str = 'greedy',
+                     random_iterations: int = 100, smoothing_iterations: int = 3, rng: np.random.Generator = None,
+                     collisions: CollisionCache = None) -> np.ndarray:
+    """Shorten a collision free path with the given shortcut method (or None) and then smooth it. A collision cache
+    can be passed in to share it between calls on the same obstacles."""
+    if shortcut is not None and shortcut not in SHORTCUT_METHODS:
+        raise ValueError(f'Unknown shortcut method {shortcut}, choose one of {SHORTCUT_METHODS}.')
+    collisions = collisions if collisions is not None else CollisionCache(obstacles)
+    path = np.asarray(path, dtype=float)
+    if shortcut == 'greedy':
+        path = shortcut_greedy(path, collisions)
+    elif shortcut == 'random':
+        path = shortcut_random(path, collisions, random_iterations, rng)
+    return smooth(path, collisions, smoothing_iterations)
@@ -0,0 +1,518 @@
+import dataclasses
+import math
+import random
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from path_planning.config import RrtConfig
+from path_planning.nearest import NearestNeighbourIndex, make_nearest_index
+from path_planning.obstacle import Obstacle, CompiledObstacles
+from path_planning.obstacle_map import ObstacleMap
+from path_planning.occupancy_map import OccupancyMap
+from path_planning.path_processing import path_length, postprocess_path
+from path_planning.profiling import NULL_PROFILER, Profiler
+from path_planning.sampling import Sampler, make_sampler
+from path_planning.tree import Node, Pose, Tree, TreeNode
+
+from typing import Optional, Union
+
+DEFAULT_OBSTACLES = [Obstacle(-10, 40, 60, 40),
+                     Obstacle(60, 10, 50, 20),
+                     Obstacle(-10, -10, 5, 20),
+                     Obstacle(65, 86, 5, 5),
+                     Obstacle(60, 50, 20, 30),
+                     Obstacle(80, 90, 10, 20)]
+
+ALGORITHMS = ('rrt', 'rrt_star', 'rrt_connect')
+
+
+@dataclass
+class PlanningResult:
+    """Outcome of a planning run. The path runs from the start to the node which reached the target and is empty if
+    the target was not reached. With cfg.path_shortcut or cfg.path_smoothing it is post-processed and path_length
+    is its length rather than the tree cost. Tree arrays are copies which stay valid after the planner is gone."""
+    success: bool
+    path: np.ndarray
+    path_length: float
+    positions: np.ndarray
+    parents: np.ndarray
+    costs: np.ndarray
+    steps: int
+    iterations: int
+    rejected_edges: int
+    elapsed_time: float
+    first_solution_steps: Optional[int] = None
+    first_solution_time: Optional[float] = None
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.positions)
+
+
+class PlannerObserver:
+    """Hooks called by RrtPlanner during a run. Subclasses override what they need, e.g. to visualize the tree."""
+
+    def on_step(self, planner: 'RrtPlanner', new_node: TreeNode) -> None:
+        pass
+
+    def on_finish(self, planner: 'RrtPlanner', result: PlanningResult) -> None:
+        pass
+
+    def on_obstacles_changed(self, planner: 'RrtPlanner', removed_nodes: int) -> None:
+        """Called after the obstacles of the planner changed, the tree may have lost vertices and been reindexed."""
+        pass
+
+
+class RrtPlanner:
+    """Headless RRT planning engine. All randomness comes from the sampler selected by cfg.sampler, which draws from
+    a private numpy Generator seeded with seed, so runs are reproducible and independent of other random state.
+
+    With cfg.algorithm == 'rrt_star' new nodes pick the cheapest collision free parent within a shrinking radius
+    around them and rewire their neighbours through themselves where that lowers their cost-to-come. Planning then
+    continues after the first solution for cfg.refine_steps inserted nodes (or until max_steps / time_budget).
+
+    With cfg.goal_bias > 0 the target itself is used as sample with that probability. The sampler is told the cost of
+    the best solution after every step, so informed sampling narrows down while RRT* refines.
+
+    A Profiler, if given, records the time per phase (sample, nearest, collision, insert, rewire) and counts sample
+    rejections and rejected edges. Without one the instrumentation is a handful of no-op calls per step.
+
+    Obstacles can change between steps or runs with update_obstacles. Only tree edges near added obstacles are
+    re-checked, the subtrees behind blocked edges are removed and the rest of the tree is kept, so a following run()
+    continues from there instead of starting over."""
+    algorithms = ('rrt', 'rrt_star')
+
+    def __init__(self, cfg: RrtConfig, obstacles: Union[list[Obstacle], CompiledObstacles] = None, seed: int = None,
+                 observers: list[PlannerObserver] = None, profiler: Profiler = None) -> None:
+        if cfg.algorithm not in self.algorithms:
+            raise ValueError(f'{type(self).__name__} does not support algorithm {cfg.algorithm}, '
+                             f'choose one of {self.algorithms}.')
+        self.cfg = cfg
+        if obstacles is None:
+            obstacles = DEFAULT_OBSTACLES
+        self.obstacle_map: CompiledObstacles = build_obstacle_map(cfg, obstacles)
+        self.observers: list[PlannerObserver] = list(observers) if observers is not None else []
+        self.profiler: Profiler = profiler if profiler is not None else NULL_PROFILER
+        self.sampler: Sampler = make_sampler(cfg, self.obstacle_map, seed=seed, profiler=self.profiler)
+        self.tree = Tree(cfg.start_node.pose, capacity=cfg.max_steps + 1)
+        self.nearest_index: NearestNeighbourIndex = make_nearest_index(cfg.nearest_index, self.tree, cfg.clamp_dist)
+        self.steps: int = 0
+        self.iterations: int = 0
+        self.rejected_edges: int = 0
+        self.goal_indices: list[int] = []
+        self.first_solution_steps: Optional[int] = None
+        self.first_solution_time: Optional[float] = None
+        self._start_time: float = time.perf_counter()
+        self._run_start_steps: int = 0
+        self._stop_requested: bool = False
+        # Scale of the RRT* neighbourhood, by default the bound from Karaman & Frazzoli for the obstacle free grid area
+        self.rewire_gamma: float = cfg.rewire_gamma if cfg.rewire_gamma is not None \
+            else 2 * math.sqrt(1.5) * math.sqrt(cfg.grid_size ** 2 / math.pi)
+
+    @property
+    def goal_index(self) -> Optional[int]:
+        """Index of the cheapest node which reached the target, None if there is none yet."""
+        if not self.goal_indices:
+            return None
+        return min(self.goal_indices, key=lambda idx: self.tree.costs[idx])
+
+    def stop(self) -> None:
+        """Ask a run, e.g. in another thread, to return after the current iteration."""
+        self._stop_requested = True
+
+    @property
+    def running(self) -> bool:
+        if self._stop_requested or self.steps - self._run_start_steps >= self.cfg.max_steps:
+            return False
+        if self.cfg.time_budget is not None and time.perf_counter() - self._start_time > self.cfg.time_budget:
+            return False
+        if self.first_solution_steps is None:
+            return True
+        if self.cfg.algorithm != 'rrt_star':
+            return False
+        return self.cfg.refine_steps is None or self.steps - self.first_solution_steps < self.cfg.refine_steps
+
+    def step(self) -> Optional[TreeNode]:
+        """Run one sample, connect and insert iteration. Return the inserted node or None if the edge was blocked."""
+        self.iterations += 1
+        profiler = self.profiler
+        start = profiler.start()
+        sampled_node = self.sampler.sample()
+        profiler.stop('sample', start)
+        nearest_node = find_closest_node(sampled_node, self.tree, self.obstacle_map, self.nearest_index, profiler)
+        if nearest_node is None:
+            self.rejected_edges += 1
+            profiler.count('rejected_edges')
+            return None
+        if self.cfg.algorithm == 'rrt_star':
+            new_node = self._insert_and_rewire(nearest_node, sampled_node)
+        else:
+            new_node = insert_new_node(nearest_node, sampled_node, self.cfg.clamp_dist, self.nearest_index, profiler)
+        self.steps += 1
+        if new_node.distance_to(self.cfg.end_node) < self.cfg.eps:
+            self._reached_goal(new_node.index)
+        if self.goal_indices:
+            self.sampler.update_solution(float(self.tree.costs[self.goal_index]))
+        for observer in self.observers:
+            observer.on_step(self, new_node)
+        return new_node
+
+    def _reached_goal(self, index: int) -> None:
+        self.goal_indices.append(index)
+        if self.first_solution_steps is None:
+            self.first_solution_steps = self.steps
+            self.first_solution_time = time.perf_counter() - self._start_time
+
+    def _insert_and_rewire(self, nearest_node: TreeNode, sampled_node: Node) -> TreeNode:
+        """RRT* insertion: choose the cheapest parent among the neighbours of the new pose, then rewire neighbours
+        which become cheaper when reached through the new node. All neighbour edges are collision checked at once."""
+        tree, profiler = self.tree, self.profiler
+        new_pose = steer(nearest_node.pose, sampled_node.pose, self.cfg.clamp_dist)
+        n_nodes = len(tree)
+        radius = min(self.rewire_gamma * math.sqrt(math.log(n_nodes + 1) / (n_nodes + 1)), self.cfg.clamp_dist)
+        start = profiler.start()
+        near = self.nearest_index.within_radius(new_pose.x, new_pose.y, radius)
+        profiler.stop('nearest', start)
+        near = near[near != nearest_node.index]
+        near = np.append(near, nearest_node.index)
+        near_positions = tree.positions[near]
+        distances = np.hypot(near_positions[:, 0] - new_pose.x, near_positions[:, 1] - new_pose.y)
+        edges = np.stack([np.broadcast_to([new_pose.x, new_pose.y], near_positions.shape), near_positions], axis=1)
+        start = profiler.start()
+        free = ~self.obstacle_map.blocks_many(edges)
+        profiler.stop('collision', start)
+        free[-1] = True  # the edge to the nearest node lies on the already checked edge to the sample
+
+        start = profiler.start()
+        parent_costs = np.where(free, tree.costs[near] + distances, np.inf)
+        best = int(np.argmin(parent_costs))
+        new_idx = tree.add(new_pose, parent=int(near[best]))
+        self.nearest_index.insert(new_idx)
+
+        new_cost = tree.costs[new_idx]
+        for candidate in np.flatnonzero(free & (new_cost + distances < tree.costs[near])):
+            # Earlier rewires may already have lowered the cost of this neighbour, so compare against the current one
+            if candidate != best and new_cost + distances[candidate] < tree.costs[near[candidate]]:
+                tree.set_parent(int(near[candidate]), new_idx)
+                profiler.count('rewires')
+        profiler.stop('rewire', start)
+        return tree.node(new_idx)
+
+    def warm_start(self, tree: Tree) -> None:
+        """Continue planning from a given tree, e.g. Tree.from_arrays of a stored plan. Its root has to be the start
+        and its vertices are taken as collision free. Vertices within cfg.eps of the target count as goals. Call it
+        before running."""
+        start = self.cfg.start_node.pose
+        if not np.allclose(tree.positions[0], (start.x, start.y)):
+            raise ValueError('The root of a warm start tree has to be the start node.')
+        self.tree = tree
+        self.nearest_index = make_nearest_index(self.cfg.nearest_index, tree, self.cfg.clamp_dist)
+        end = self.cfg.end_node.pose
+        self.goal_indices = np.flatnonzero(np.hypot(tree.x - end.x, tree.y - end.y) < self.cfg.eps).tolist()
+        if self.goal_indices:
+            # The tree already solves the query, so RRT* refines it and RRT returns right away
+            self.first_solution_steps, self.first_solution_time = self.steps, 0.0
+            self.sampler.update_solution(float(self.tree.costs[self.goal_index]))
+
+    def update_obstacles(self, added: list[Obstacle] = (), removed: list[Obstacle] = ()) -> int:
+        """Add and remove obstacles, removed ones are identified by identity. Tree edges whose bounding box overlaps an
+        added obstacle (grown by the reach of a raster map) are collision checked against the new map and the subtrees
+        behind blocked edges are removed, goals in them are dropped. Removing obstacles invalidates nothing. The map is
+        rebuilt from the obstacle rectangles, a rasterized map with its resolution and clearance. Not thread safe, call
+        it between steps. Return the number of removed tree vertices."""
+        start = self.profiler.start()
+        removed_ids = {id(obs) for obs in removed}
+        obstacles = self.obstacle_map.obstacles
+        if len(removed_ids) != len([obs for obs in obstacles if id(obs) in removed_ids]):
+            raise ValueError('Only obstacles of the planner can be removed.')
+        obstacles = [obs for obs in obstacles if id(obs) not in removed_ids] + list(added)
+        if isinstance(self.obstacle_map, OccupancyMap):
+            self.obstacle_map = OccupancyMap.from_obstacles(obstacles, self.cfg.grid_size, self.obstacle_map.resolution,
+                                                            clearance=self.obstacle_map.clearance)
+        else:
+            self.obstacle_map = ObstacleMap(obstacles)
+        self.sampler.set_obstacles(self.obstacle_map)
+        removed_nodes = self._invalidate(np.array([obs.box for obs in added], dtype=float).reshape(-1, 4))
+        self.profiler.count('invalidated_nodes', removed_nodes)
+        self.profiler.stop('invalidate', start)
+        for observer in self.observers:
+            observer.on_obstacles_changed(self, removed_nodes)
+        return removed_nodes
+
+    def add_obstacle(self, obstacle: Obstacle) -> int:
+        return self.update_obstacles(added=[obstacle])
+
+    def remove_obstacle(self, obstacle: Obstacle) -> int:
+        return self.update_obstacles(removed=[obstacle])
+
+    def move_obstacle(self, obstacle: Obstacle, x: float, y: float) -> Obstacle:
+        """Replace the obstacle by a copy at (x, y) and return the copy, which identifies it from now on."""
+        moved = Obstacle(x, y, obstacle.width, obstacle.height)
+        self.update_obstacles(added=[moved], removed=[obstacle])
+        return moved
+
+    def _prune(self, tree: Tree, boxes: np.ndarray) -> Optional[np.ndarray]:
+        """Remove the subtrees behind tree edges blocked by the current map among those overlapping the boxes.
+        Return the old to new index map of the tree or None if nothing was removed."""
+        edges = tree.edges
+        if len(boxes) == 0 or len(edges) == 0:
+            return None
+        segments = tree.positions[edges]
+        # Exact maps block the rectangles themselves, rasterized ones somewhat more
+        margin = getattr(self.obstacle_map, 'reach', 0.0)
+        lower, upper = segments.min(axis=1), segments.max(axis=1)
+        overlaps = ((lower[:, None] <= boxes[None, :, 2:] + margin) & (upper[:, None] >= boxes[None, :, :2] - margin))
+        candidates = np.flatnonzero(overlaps.all(axis=2).any(axis=1))
+        blocked = candidates[self.obstacle_map.blocks_many(segments[candidates])]
+        if len(blocked) == 0:
+            return None
+        return tree.remove_subtrees(edges[blocked, 1])
+
+    def _invalidate(self, boxes: np.ndarray) -> int:
+        n_nodes = len(self.tree)
+        new_index = self._prune(self.tree, boxes)
+        if new_index is None:
+            return 0
+        self.nearest_index = make_nearest_index(self.cfg.nearest_index, self.tree, self.cfg.clamp_dist)
+        self.goal_indices = [int(new_index[idx]) for idx in self.goal_indices if new_index[idx] >= 0]
+        if not self.goal_indices:
+            # Keep planning until a new solution is found
+            self.first_solution_steps = self.first_solution_time = None
+            self.sampler.update_solution(math.inf)
+        return n_nodes - len(self.tree)
+
+    def run(self) -> PlanningResult:
+        """Plan until the target is reached (RRT* keeps refining for a while), cfg.max_steps nodes have been inserted
+        in this run or the time budget is used up. Repeated runs continue with the current tree."""
+        start_time = self._start_time = time.perf_counter()
+        self._run_start_steps = self.steps
+        while self.running:
+            self.step()
+        result = self.result(elapsed_time=time.perf_counter() - start_time)
+        if result.success and (self.cfg.path_shortcut is not None or self.cfg.path_smoothing > 0):
+            start = self.profiler.start()
+            path = postprocess_path(result.path, self.obstacle_map, self.cfg.path_shortcut,
+                                    smoothing_iterations=self.cfg.path_smoothing, rng=self.sampler.rng)
+            result = dataclasses.replace(result, path=path, path_length=path_length(path))
+            self.profiler.stop('postprocess', start)
+        for observer in self.observers:
+            observer.on_finish(self, result)
+        return result
+
+    def result(self, elapsed_time: float = 0.0) -> PlanningResult:
+        """Snapshot of the current planning state."""
+        if self.goal_index is not None:
+            path = self.tree.extract_path(self.goal_index)
+            path_length = float(self.tree.costs[self.goal_index])
+        else:
+            path, path_length = np.empty((0, 2)), float('inf')
+        return PlanningResult(success=self.goal_index is not None, path=path, path_length=path_length,
+                              positions=self.tree.positions.copy(), parents=self.tree.parents.copy(),
+                              costs=self.tree.costs.copy(), steps=self.steps, iterations=self.iterations,
+                              rejected_edges=self.rejected_edges, elapsed_time=elapsed_time,
+                              first_solution_steps=self.first_solution_steps,
+                              first_solution_time=self.first_solution_time)
+
+
+class RrtConnectPlanner(RrtPlanner):
+    """Bidirectional RRT-Connect. One tree grows from the start and one from the end, each iteration extends one
+    tree by a single step towards a random sample and then greedily extends the other tree towards the new node
+    until it is reached or blocked, afterwards the trees swap roles. The planner stops as soon as they meet.
+
+    self.tree is the start tree. The result contains both trees, the nodes of the end tree are appended after the
+    start tree nodes and their costs are measured from the end."""
+    algorithms = ('rrt_connect',)
+
+    def __init__(self, cfg: RrtConfig, obstacles: Union[list[Obstacle], CompiledObstacles] = None, seed: int = None,
+                 observers: list[PlannerObserver] = None, profiler: Profiler = None) -> None:
+        super().__init__(cfg, obstacles, seed=seed, observers=observers, profiler=profiler)
+        # Both trees grow towards random samples, a goal bias would only pull the start tree
+        self.sampler = make_sampler(cfg, self.obstacle_map, seed=seed, goal_bias=0.0, profiler=self.profiler)
+        self.end_tree = Tree(cfg.end_node.pose, capacity=cfg.max_steps + 1)
+        self.end_nearest_index = make_nearest_index(cfg.nearest_index, self.end_tree, cfg.clamp_dist)
+        self.connection: Optional[tuple[int, int]] = None  # (start tree index, end tree index) where the trees meet
+        self._grow_start_tree = True
+
+    def _extend(self, tree: Tree, nearest_index: NearestNeighbourIndex, target: Pose) -> Optional[int]:
+        """Insert a node one clamp_dist step from the nearest node towards target, None if that edge is blocked."""
+        profiler = self.profiler
+        start = profiler.start()
+        nearest_idx = nearest_index.nearest(target.x, target.y)
+        profiler.stop('nearest', start)
+        nearest_x, nearest_y = tree.positions[nearest_idx]
+        new_pose = steer(Pose(nearest_x, nearest_y), target, self.cfg.clamp_dist)
+        start = profiler.start()
+        blocked = self.obstacle_map.blocks([(nearest_x, nearest_y), (new_pose.x, new_pose.y)])
+        profiler.stop('collision', start)
+        if blocked:
+            self.rejected_edges += 1
+            profiler.count('rejected_edges')
+            return None
+        start = profiler.start()
+        new_idx = tree.add(new_pose, parent=nearest_idx)
+        nearest_index.insert(new_idx)
+        profiler.stop('insert', start)
+        self.steps += 1
+        for observer in self.observers:
+            observer.on_step(self, tree.node(new_idx))
+        return new_idx
+
+    def step(self) -> Optional[TreeNode]:
+        """Extend the active tree towards a random sample and try to connect the other tree to the new node. Return
+        the node inserted into the active tree or None if that extension was blocked."""
+        self.iterations += 1
+        trees = [(self.tree, self.nearest_index), (self.end_tree, self.end_nearest_index)]
+        if not self._grow_start_tree:
+            trees.reverse()
+        (tree, nearest_index), (other_tree, other_nearest_index) = trees
+        self._grow_start_tree = not self._grow_start_tree
+
+        start = self.profiler.start()
+        sampled_node = self.sampler.sample()
+        self.profiler.stop('sample', start)
+        new_idx = self._extend(tree, nearest_index, sampled_node.pose)
+        if new_idx is None:
+            return None
+        new_node = tree.node(new_idx)
+        target = new_node.pose
+        while self.steps - self._run_start_steps < self.cfg.max_steps:
+            other_idx = self._extend(other_tree, other_nearest_index, target)
+            if other_idx is None:
+                break
+            if other_tree.node(other_idx).distance_to(new_node) < 1e-9:
+                self.connection = (new_idx, other_idx) if tree is self.tree else (other_idx, new_idx)
+                self._reached_goal(self.connection[0])
+                break
+        return new_node
+
+    def warm_start(self, tree: Tree) -> None:
+        raise ValueError('RRT-Connect grows two trees and can not be warm started from a single one.')
+
+    def _invalidate(self, boxes: np.ndarray) -> int:
+        n_nodes = len(self.end_tree)
+        removed_nodes = super()._invalidate(boxes)
+        new_index = self._prune(self.end_tree, boxes)
+        if new_index is not None:
+            self.end_nearest_index = make_nearest_index(self.cfg.nearest_index, self.end_tree, self.cfg.clamp_dist)
+            removed_nodes += n_nodes - len(self.end_tree)
+        if self.connection is not None:
+            start_idx, end_idx = self.connection
+            end_idx = end_idx if new_index is None else int(new_index[end_idx])
+            if self.goal_indices and end_idx >= 0:
+                self.connection = (self.goal_indices[0], end_idx)
+            else:
+                self.connection = None
+                self.goal_indices = []
+                self.first_solution_steps = self.first_solution_time = None
+        return removed_nodes
+
+    def result(self, elapsed_time: float = 0.0) -> PlanningResult:
+        offset = len(self.tree)
+        if self.connection is not None:
+            start_idx, end_idx = self.connection
+            start_path = self.tree.extract_path(start_idx)
+            # The connecting end tree node coincides with the last start tree node
+            end_path = self.end_tree.extract_path(end_idx)[::-1][1:]
+            path = np.concatenate([start_path, end_path])
+            path_length = float(self.tree.costs[start_idx] + self.end_tree.costs[end_idx])
+        else:
+            path, path_length = np.empty((0, 2)), float('inf')
+        end_parents = np.where(self.end_tree.parents >= 0, self.end_tree.parents + offset, -1)
+        return PlanningResult(success=self.connection is not None, path=path, path_length=path_length,
+                              positions=np.concatenate([self.tree.positions, self.end_tree.positions]),
+                              parents=np.concatenate([self.tree.parents, end_parents]),
+                              costs=np.concatenate([self.tree.costs, self.end_tree.costs]),
+                              steps=self.steps, iterations=self.iterations,
+                              rejected_edges=self.rejected_edges, elapsed_time=elapsed_time,
+                              first_solution_steps=self.first_solution_steps,
+                              first_solution_time=self.first_solution_time)
+
+
+def build_obstacle_map(cfg: RrtConfig, obstacles: Union[list[Obstacle], CompiledObstacles]) -> CompiledObstacles:
+    """Compile an obstacle list into the collision structure selected by cfg: an OccupancyMap if cfg.map_resolution
+    is set, else an ObstacleMap. Already compiled obstacles are used as they are."""
+    if isinstance(obstacles, CompiledObstacles):
+        return obstacles
+    if cfg.map_resolution is not None:
+        return OccupancyMap.from_obstacles(obstacles, cfg.grid_size, cfg.map_resolution, clearance=cfg.clearance)
+    if cfg.clearance > 0:
+        raise ValueError('A clearance needs a rasterized map, set cfg.map_resolution.')
+    return ObstacleMap(obstacles)
+
+
+def make_planner(cfg: RrtConfig, obstacles: Union[list[Obstacle], CompiledObstacles] = None, seed: int = None,
+                 observers: list[PlannerObserver] = None, profiler: Profiler = None) -> RrtPlanner:
+    """Create the planner implementing cfg.algorithm."""
+    if cfg.algorithm not in ALGORITHMS:
+        raise ValueError(f'Unknown planning algorithm {cfg.algorithm}, choose one of {ALGORITHMS}.')
+    planner_class = RrtConnectPlanner if cfg.algorithm == 'rrt_connect' else RrtPlanner
+    return planner_class(cfg, obstacles, seed=seed, observers=observers, profiler=profiler)
+
+
+def plan(cfg: RrtConfig, obstacles: list[Obstacle] = None, seed: int = None,
+         observers: list[PlannerObserver] = None, profiler: Profiler = None) -> PlanningResult:
+    """Run a single headless planning query with the algorithm selected in cfg."""
+    return make_planner(cfg, obstacles, seed=seed, observers=observers, profiler=profiler).run()
+
+
+def sample_new_node(obstacles: Union[list[Obstacle], CompiledObstacles], grid_size: int,
+                    rng: random.Random = None, profiler: Profiler = NULL_PROFILER) -> Node:
+    """Rejection sample a node outside of all obstacles. Uses the global random module if no rng is given."""
+    rng = random if rng is None else rng
+    while True:
+        new_node = Node(Pose(x=rng.uniform(0, grid_size), y=rng.uniform(0, grid_size)))
+        if isinstance(obstacles, CompiledObstacles):
+            if not obstacles.contains(new_node.pose):
+                return new_node
+        elif not any([obs.contains(new_node.pose) for obs in obstacles]):
+            return new_node
+        profiler.count('sample_rejections')
+
+
+def find_closest_node(new_node: Node, rr_tree: Tree, obstacles: Union[list[Obstacle], CompiledObstacles],
+                      nearest_index: NearestNeighbourIndex = None,
+                      profiler: Profiler = NULL_PROFILER) -> Optional[TreeNode]:
+    """For a new node, find the nearest node in the tree. Return this nearest node if there is an obstacle-free
+    connection between the new and nearest node, else return None. Without a nearest_index all tree nodes are
+    scanned, plain obstacle lists are compiled on every call."""
+    if not isinstance(obstacles, CompiledObstacles):
+        obstacles = CompiledObstacles(obstacles)
+    start = profiler.start()
+    if nearest_index is not None:
+        closest_idx = nearest_index.nearest(new_node.pose.x, new_node.pose.y)
+    else:
+        squared_distances = (rr_tree.x - new_node.pose.x) ** 2 + (rr_tree.y - new_node.pose.y) ** 2
+        closest_idx = int(np.argmin(squared_distances))
+    closest_node = rr_tree.node(closest_idx)
+    profiler.stop('nearest', start)
+    seg_to_closest = [(new_node.pose.x, new_node.pose.y), (closest_node.pose.x, closest_node.pose.y)]
+    start = profiler.start()
+    blocked = obstacles.blocks(seg_to_closest)
+    profiler.stop('collision', start)
+    if blocked:
+        return None
+    else:
+        return closest_node
+
+
+def insert_new_node(nearest_node: TreeNode, new_node: Node, clamp_distance: float,
+                    nearest_index: NearestNeighbourIndex = None, profiler: Profiler = NULL_PROFILER) -> TreeNode:
+    """If a nearest node has been found, insert the new node into the tree appropriately and also return the Node.
+    The nearest_index, if given, is kept up to date with the inserted node."""
+    start = profiler.start()
+    new_pose = steer(nearest_node.pose, new_node.pose, clamp_distance)
+    new_idx = nearest_node.tree.add(new_pose, parent=nearest_node.index)
+    if nearest_index is not None:
+        nearest_index.insert(new_idx)
+    profiler.stop('insert', start)
+    return nearest_node.tree.node(new_idx)
+
+
+def steer(from_pose: Pose, to_pose: Pose, clamp_distance: float) -> Pose:
+    """Return to_pose, or the pose at clamp_distance from from_pose in its direction if it is further away."""
+    if from_pose.distance_to(to_pose) <= clamp_distance:
+        return to_pose
+    dist_vec = Pose.normalize(Pose.subtract(from_pose, to_pose))
+    return Pose.add(from_pose, Pose(dist_vec.x * clamp_distance, dist_vec.y * clamp_distance))
@@ -0,0 +1,133 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+# Histogram buckets are powers of two of nanoseconds, each split into this many log spaced sub buckets
+BUCKETS_PER_OCTAVE = 4
+
+
+class PhaseStats:
+    """Running statistics of the durations of one phase. Durations are not stored, they are counted into log spaced
+    buckets, so the memory use is constant however long the planner runs."""
+    __slots__ = ('count', 'total', 'min', 'max', 'buckets')
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.buckets: dict[int, int] = defaultdict(int)
+
+    def add(self, duration: float) -> None:
+        self.count += 1
+        self.total += duration
+        if duration < self.min:
+            self.min = duration
+        if duration > self.max:
+            self.max = duration
+        nanoseconds = duration * 1e9
+        self.buckets[int(math.log2(nanoseconds) * BUCKETS_PER_OCTAVE) if nanoseconds > 1 else 0] += 1
+
+    @staticmethod
+    def bucket_bounds(bucket: int) -> tuple[float, float]:
+        """Lower and upper duration in seconds of a histogram bucket."""
+        return 2 ** (bucket / BUCKETS_PER_OCTAVE) * 1e-9, 2 ** ((bucket + 1) / BUCKETS_PER_OCTAVE) * 1e-9
+
+    def quantile(self, q: float) -> float:
+        """Approximate quantile, the upper bound of the bucket containing it."""
+        if self.count == 0:
+            return math.nan
+        rank = q * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.bucket_bounds(bucket)[1], self.max)
+        return self.max
+
+
+class Profiler:
+    """Per phase timings and counters of a planning loop.
+
+    A phase is bracketed by start = profiler.start() and profiler.stop(phase, start), counters are bumped with
+    profiler.count(counter). A disabled profiler returns from all of these right away, so instrumented code costs a
+    few no-op calls per step. With trace=True the last max_trace_events phases are also kept as individual events
+    for export in the Chrome trace format (chrome://tracing, Perfetto)."""
+
+    def __init__(self, enabled: bool = True, trace: bool = False, max_trace_events: int = 1_000_000) -> None:
+        self.enabled = enabled
+        self.trace = trace
+        self.phases: dict[str, PhaseStats] = defaultdict(PhaseStats)
+        self.counters: dict[str, int] = defaultdict(int)
+        self._events: deque = deque(maxlen=max_trace_events)  # (phase, start, duration, thread id)
+        self._origin = time.perf_counter()
+
+    def start(self) -> float:
+        return time.perf_counter() if self.enabled else 0.0
+
+    def stop(self, phase: str, start: float) -> None:
+        if not self.enabled:
+            return
+        duration = time.perf_counter() - start
+        self.phases[phase].add(duration)
+        if self.trace:
+            self._events.append((phase, start, duration, threading.get_ident()))
+
+    def count(self, counter: str, increment: int = 1) -> None:
+        if self.enabled:
+            self.counters[counter] += increment
+
+    def reset(self) -> None:
+        self.phases.clear()
+        self.counters.clear()
+        self._events.clear()
+        self._origin = time.perf_counter()
+
+    def summary(self) -> dict:
+        """Per phase call count, total, mean, min, max, approximate median and 99th percentile in seconds, plus all
+        counters."""
+        phases = {}
+        for phase, stats in self.phases.items():
+            phases[phase] = {'count': stats.count, 'total': stats.total, 'mean': stats.total / stats.count,
+                             'min': stats.min, 'max': stats.max, 'p50': stats.quantile(0.5),
+                             'p99': stats.quantile(0.99)}
+        return {'phases': phases, 'counters': dict(self.counters)}
+
+    def histogram(self, phase: str) -> list[tuple[float, float, int]]:
+        """(lower bound, upper bound, count) of the non empty duration buckets of a phase, durations in seconds."""
+        stats = self.phases.get(phase)
+        if stats is None:
+            return []
+        return [(*PhaseStats.bucket_bounds(bucket), stats.buckets[bucket]) for bucket in sorted(stats.buckets)]
+
+    def format_summary(self) -> str:
+        """Human readable table of the summary, phases sorted by total time."""
+        summary = self.summary()
+        lines = [f'{"phase":<16}{"count":>10}{"total [s]":>12}{"mean [us]":>12}{"p50 [us]":>12}{"p99 [us]":>12}']
+        for phase, stats in sorted(summary['phases'].items(), key=lambda item: -item[1]['total']):
+            lines.append(f'{phase:<16}{stats["count"]:>10}{stats["total"]:>12.3f}{stats["mean"] * 1e6:>12.1f}'
+                         f'{stats["p50"] * 1e6:>12.1f}{stats["p99"] * 1e6:>12.1f}')
+        lines.extend(f'{counter:<16}{value:>10}' for counter, value in sorted(summary['counters'].items()))
+        return '\n'.join(lines)
+
+    def chrome_trace(self) -> dict:
+        """Recorded events in the Chrome trace event format, counters are added as one final counter event."""
+        pid = os.getpid()
+        events = [{'name': phase, 'ph': 'X', 'ts': (start - self._origin) * 1e6, 'dur': duration * 1e6,
+                   'pid': pid, 'tid': tid} for phase, start, duration, tid in self._events]
+        if self.counters:
+            end = max((start + duration for _, start, duration, _ in self._events), default=self._origin)
+            events.append({'name': 'counters', 'ph': 'C', 'ts': (end - self._origin) * 1e6, 'pid': pid,
+                           'args': dict(self.counters)})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, path: str) -> None:
+        with open(path, 'w') as trace_file:
+            json.dump(self.chrome_trace(), trace_file)
+
+
+# Shared disabled profiler used when no profiler is passed, never enable it
+NULL_PROFILER = Profiler(enabled=False)
@@ -0,0 +1,270 @@
+import hashlib
+import heapq
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from path_planning.config import RrtConfig
+from path_planning.obstacle import CompiledObstacles
+from path_planning.occupancy_map import OccupancyMap
+from path_planning.path_processing import path_length
+from path_planning.planner import PlanningResult
+from path_planning.profiling import NULL_PROFILER, Profiler
+from path_planning.sampling import HaltonSampler
+from path_planning.tree import Pose
+
+SEARCH_METHODS = ('astar', 'dijkstra')
+# Segments collision checked per blocks_many call, and per task when the checks run on a process pool
+_EDGE_CHUNK = 8192
+# Vertices tried when a query point has no free connection within the roadmap radius
+_FALLBACK_CONNECTIONS = 16
+
+
+def map_hash(obstacle_map: CompiledObstacles) -> str:
+    """Digest of everything collision checks depend on: the obstacle boxes and, for rasterized maps, the grid with
+    its resolution, origin and clearance."""
+    digest = hashlib.sha256(type(obstacle_map).__name__.encode())
+    digest.update(np.ascontiguousarray(obstacle_map.boxes, dtype='<f8').tobytes())
+    if isinstance(obstacle_map, OccupancyMap):
+        digest.update(np.array(obstacle_map.occupancy.shape, dtype='<i8').tobytes())
+        digest.update(np.packbits(obstacle_map.occupancy).tobytes())
+        digest.update(np.array([obstacle_map.resolution, *obstacle_map.origin, obstacle_map.clearance],
+                               dtype='<f8').tobytes())
+    return digest.hexdigest()
+
+
+def default_radius(grid_size: float, n_samples: int) -> float:
+    """Connection radius of PRM* (Karaman & Frazzoli) for the obstacle free grid area, the same bound RRT* rewires
+    with."""
+    gamma = 2 * math.sqrt(1.5) * math.sqrt(grid_size ** 2 / math.pi)
+    return gamma * math.sqrt(math.log(n_samples) / n_samples)
+
+
+def candidate_edges(positions: np.ndarray, radius: float, chunk_size: int = 1024) -> np.ndarray:
+    """All vertex pairs (i, j) with i < j at a distance of at most radius, as (m, 2) array. Vertices are swept in
+    order of their x coordinate and each chunk is only compared against the vertices within radius in x."""
+    order = np.argsort(positions[:, 0], kind='stable')
+    sorted_positions = positions[order]
+    xs = sorted_positions[:, 0]
+    pairs = []
+    for chunk_start in range(0, len(positions), chunk_size):
+        chunk = sorted_positions[chunk_start:chunk_start + chunk_size]
+        # Partners come later in the sweep, so each pair is found once
+        stop = int(np.searchsorted(xs, chunk[-1, 0] + radius, side='right'))
+        others = sorted_positions[chunk_start:stop]
+        deltas = chunk[:, None] - others[None]
+        close = (deltas ** 2).sum(axis=2) <= radius ** 2
+        rows, cols = np.nonzero(close)
+        later = cols > rows
+        pairs.append(np.column_stack([rows[later], cols[later]]) + chunk_start)
+    pairs = np.concatenate(pairs) if pairs else np.empty((0, 2), dtype=np.int64)
+    return np.sort(order[pairs], axis=1).reshape(-1, 2)
+
+
+# Per worker process state, filled once by _init_worker
+_worker_obstacle_map: CompiledObstacles = None
+
+
+def _init_worker(obstacle_map: CompiledObstacles) -> None:
+    global _worker_obstacle_map
+    _worker_obstacle_map = obstacle_map
+
+
+def _blocks_chunk(segments: np.ndarray) -> np.ndarray:
+    return _worker_obstacle_map.blocks_many(segments)
+
+
+def check_edges(obstacle_map: CompiledObstacles, segments: np.ndarray, max_workers: int = 1) -> np.ndarray:
+    """Vectorized blocks_many over chunks of segments, with max_workers > 1 the chunks are spread over a process
+    pool which receives the map once per worker."""
+    chunks = [segments[start:start + _EDGE_CHUNK] for start in range(0, len(segments), _EDGE_CHUNK)]
+    if not chunks:
+        return np.zeros(0, dtype=bool)
+    if max_workers == 1 or len(chunks) == 1:
+        return np.concatenate([obstacle_map.blocks_many(chunk) for chunk in chunks])
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(obstacle_map,)) as executor:
+        return np.concatenate(list(executor.map(_blocks_chunk, chunks)))
+
+
+class Roadmap:
+    """Probabilistic roadmap (PRM*): collision free vertices connected by free edges to all vertices within radius.
+    The graph is built once per obstacle map and answers any number of queries, each query connects start and goal
+    to nearby vertices and searches the graph with A* or Dijkstra. Adjacency is kept in compressed sparse row form,
+    the neighbours of vertex v are neighbours[offsets[v]:offsets[v + 1]]."""
+
+    def __init__(self, obstacle_map: CompiledObstacles, positions: np.ndarray, edges: np.ndarray,
+                 radius: float) -> None:
+        self.obstacle_map = obstacle_map
+        self.positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        self.edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        self.radius = radius
+        lengths = np.hypot(*(self.positions[self.edges[:, 1]] - self.positions[self.edges[:, 0]]).T)
+        sources = np.concatenate([self.edges[:, 0], self.edges[:, 1]])
+        order = np.argsort(sources, kind='stable')
+        self.neighbours = np.concatenate([self.edges[:, 1], self.edges[:, 0]])[order]
+        self.neighbour_lengths = np.concatenate([lengths, lengths])[order]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(sources, minlength=len(self.positions)))])
+        # Python lists of (neighbour, length) pairs per vertex, the search loop is faster on them than on array slices
+        self._adjacency: list[list[tuple[int, float]]] = None
+
+    @classmethod
+    def build(cls, obstacle_map: CompiledObstacles, grid_size: float, n_samples: int = 2000, radius: float = None,
+              seed: int = None, max_workers: int = 1, profiler: Profiler = NULL_PROFILER) -> 'Roadmap':
+        """Sample n_samples free vertices from a Halton sequence, which covers the grid more evenly than random
+        samples, and keep all free edges between vertices within radius (default_radius if None)."""
+        if n_samples < 2:
+            raise ValueError(f'A roadmap needs at least two samples, got {n_samples}.')
+        radius = radius if radius is not None else default_radius(grid_size, n_samples)
+        start = profiler.start()
+        positions = HaltonSampler(obstacle_map, grid_size, seed=seed).sample_many(n_samples)
+        profiler.stop('sample', start)
+        start = profiler.start()
+        edges = candidate_edges(positions, radius)
+        profiler.stop('nearest', start)
+        start = profiler.start()
+        blocked = check_edges(obstacle_map, positions[edges], max_workers)
+        profiler.count('rejected_edges', int(blocked.sum()))
+        profiler.stop('collision', start)
+        return cls(obstacle_map, positions, edges[~blocked], radius)
+
+    def save(self, path: str) -> None:
+        """Write the graph to an .npz file, tagged with the hash of its map."""
+        np.savez(path, positions=self.positions, edges=self.edges, radius=self.radius,
+                 map_hash=np.array(map_hash(self.obstacle_map)))
+
+    @classmethod
+    def load(cls, path: str, obstacle_map: CompiledObstacles) -> 'Roadmap':
+        """Load a graph written by save, it has to be built on the same map."""
+        with np.load(path, allow_pickle=False) as archive:
+            if str(archive['map_hash']) != map_hash(obstacle_map):
+                raise ValueError(f'Roadmap {path} was built for a different obstacle map.')
+            return cls(obstacle_map, archive['positions'], archive['edges'], float(archive['radius']))
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def _adjacency_lists(self) -> list[list[tuple[int, float]]]:
+        if self._adjacency is None:
+            pairs = list(zip(self.neighbours.tolist(), self.neighbour_lengths.tolist()))
+            offsets = self.offsets.tolist()
+            self._adjacency = [pairs[offsets[v]:offsets[v + 1]] for v in range(len(self))]
+        return self._adjacency
+
+    def connect(self, pose: Pose) -> tuple[np.ndarray, np.ndarray, int]:
+        """Free connections of a query pose to the graph as (vertex indices, edge lengths, number of blocked edges).
+        Vertices within radius are tried first, if none of them is reachable the closest vertices further away."""
+        distances = np.hypot(self.positions[:, 0] - pose.x, self.positions[:, 1] - pose.y)
+        candidates = np.flatnonzero(distances <= self.radius)
+        n_blocked = 0
+        for attempt in range(2):
+            segments = np.stack([np.broadcast_to((pose.x, pose.y), (len(candidates), 2)),
+                                 self.positions[candidates]], axis=1)
+            blocked = self.obstacle_map.blocks_many(segments)
+            n_blocked += int(blocked.sum())
+            if not blocked.all() or attempt == 1:
+                break
+            order = np.argsort(distances)
+            candidates = order[~np.isin(order, candidates)][:_FALLBACK_CONNECTIONS]
+        candidates = candidates[~blocked]
+        return candidates, distances[candidates], n_blocked
+
+    def query(self, start: Pose, goal: Pose, method: str = 'astar',
+              profiler: Profiler = NULL_PROFILER) -> PlanningResult:
+        """Shortest path through the roadmap from start to goal. A straight free segment is taken right away. The
+        result carries no tree, iterations counts the expanded graph vertices and a found path is also the first
+        solution."""
+        if method not in SEARCH_METHODS:
+            raise ValueError(f'Unknown search method {method}, choose one of {SEARCH_METHODS}.')
+        start_time = time.perf_counter()
+        n_vertices = len(self)
+        no_tree = dict(positions=np.empty((0, 2)), parents=np.empty(0, dtype=np.int64), costs=np.empty(0), steps=0)
+        phase_start = profiler.start()
+        if not self.obstacle_map.blocks([(start.x, start.y), (goal.x, goal.y)]):
+            profiler.stop('connect', phase_start)
+            path = np.array([[start.x, start.y], [goal.x, goal.y]])
+            elapsed_time = time.perf_counter() - start_time
+            return PlanningResult(success=True, path=path, path_length=path_length(path), iterations=0,
+                                  rejected_edges=0, elapsed_time=elapsed_time, first_solution_steps=0,
+                                  first_solution_time=elapsed_time, **no_tree)
+        start_links, start_lengths, start_blocked = self.connect(start)
+        goal_links, goal_lengths, goal_blocked = self.connect(goal)
+        profiler.stop('connect', phase_start)
+
+        phase_start = profiler.start()
+        # Vertex n_vertices is the start and n_vertices + 1 the goal
+        source, target = n_vertices, n_vertices + 1
+        start_links = list(zip(start_links.tolist(), start_lengths.tolist()))
+        to_goal = dict(zip(goal_links.tolist(), goal_lengths.tolist()))
+        adjacency = self._adjacency_lists()
+        if method == 'astar':
+            heuristic = np.append(np.hypot(self.positions[:, 0] - goal.x, self.positions[:, 1] - goal.y),
+                                  [0.0, 0.0]).tolist()
+        else:
+            heuristic = [0.0] * (n_vertices + 2)
+        costs = {source: 0.0}
+        parents = {source: -1}
+        closed = set()
+        queue = [(0.0, 0.0, source)]
+        while queue:
+            _, cost, vertex = heapq.heappop(queue)
+            if vertex == target:
+                break
+            if vertex in closed:
+                continue
+            closed.add(vertex)
+            links = start_links if vertex == source else adjacency[vertex]
+            if vertex in to_goal:
+                links = links + [(target, to_goal[vertex])]
+            for neighbour, length in links:
+                new_cost = cost + length
+                if new_cost < costs.get(neighbour, math.inf):
+                    costs[neighbour] = new_cost
+                    parents[neighbour] = vertex
+                    heapq.heappush(queue, (new_cost + heuristic[neighbour], new_cost, neighbour))
+        profiler.stop('search', phase_start)
+
+        if target not in parents:
+            path = np.empty((0, 2))
+        else:
+            indices = [parents[target]]
+            while indices[-1] != source:
+                indices.append(parents[indices[-1]])
+            path = np.concatenate([[[start.x, start.y]], self.positions[indices[-2::-1]], [[goal.x, goal.y]]])
+        success = len(path) > 0
+        elapsed_time = time.perf_counter() - start_time
+        return PlanningResult(success=success, path=path, path_length=costs.get(target, math.inf),
+                              iterations=len(closed), rejected_edges=start_blocked + goal_blocked,
+                              elapsed_time=elapsed_time, first_solution_steps=0 if success else None,
+                              first_solution_time=elapsed_time if success else None, **no_tree)
+
+
+def roadmap_key(obstacle_map: CompiledObstacles, grid_size: float, n_samples: int, radius: float = None,
+                seed: int = None) -> str:
+    """Cache key of a roadmap: the map hash combined with all build parameters."""
+    params = f'{grid_size}:{n_samples}:{radius}:{seed}'.encode()
+    return hashlib.sha256(map_hash(obstacle_map).encode() + params).hexdigest()[:32]
+
+
+def load_or_build(obstacle_map: CompiledObstacles, cfg: RrtConfig, cache_dir: str = None, seed: int = 0,
+                  max_workers: int = 1, profiler: Profiler = NULL_PROFILER) -> Roadmap:
+    """Roadmap for the map with cfg.roadmap_samples and cfg.roadmap_radius, loaded from cache_dir if it was built
+    before and built and stored there otherwise. Files are written under a temporary name and renamed, so processes
+    sharing a cache directory never read a partial file."""
+    if cache_dir is None:
+        return Roadmap.build(obstacle_map, cfg.grid_size, cfg.roadmap_samples, cfg.roadmap_radius, seed=seed,
+                             max_workers=max_workers, profiler=profiler)
+    key = roadmap_key(obstacle_map, cfg.grid_size, cfg.roadmap_samples, cfg.roadmap_radius, seed)
+    path = os.path.join(cache_dir, f'roadmap-{key}.npz')
+    if os.path.exists(path):
+        return Roadmap.load(path, obstacle_map)
+    roadmap = Roadmap.build(obstacle_map, cfg.grid_size, cfg.roadmap_samples, cfg.roadmap_radius, seed=seed,
+                            max_workers=max_workers, profiler=profiler)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+    roadmap.save(tmp_path)
+    os.replace(tmp_path, path)
+    return roadmap
@@ -0,0 +1,170 @@
+import math
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from path_planning.config import RrtConfig
+from path_planning.obstacle import CompiledObstacles
+from path_planning.profiling import NULL_PROFILER, Profiler
+from path_planning.tree import Node, Pose
+
+
+class Sampler(ABC):
+    """Source of collision free samples for the planners. Candidates are drawn in blocks of batch_size from a seeded
+    numpy Generator, obstacle hits are rejected with one vectorized contains_many call per block and the survivors
+    are handed out one by one from a buffer which is refilled when it runs empty.
+
+    With goal_bias > 0 each handed out sample is replaced by the goal with that probability."""
+
+    def __init__(self, obstacles: CompiledObstacles, grid_size: float, seed: int = None, batch_size: int = 256,
+                 goal: Pose = None, goal_bias: float = 0.0, profiler: Profiler = NULL_PROFILER) -> None:
+        if batch_size <= 0:
+            raise ValueError(f'Sampling batch size has to be positive, got {batch_size}.')
+        if goal_bias > 0 and goal is None:
+            raise ValueError('A goal bias needs a goal.')
+        self.obstacles = obstacles
+        self.grid_size = grid_size
+        self.rng = np.random.default_rng(seed)
+        self.batch_size = batch_size
+        self.goal = goal
+        self.goal_bias = goal_bias
+        self.profiler = profiler
+        self._buffer: list[list[float]] = []
+
+    @abstractmethod
+    def _draw(self, n_samples: int) -> np.ndarray:
+        """Draw (n_samples, 2) candidate positions, obstacles are not considered yet."""
+        raise NotImplementedError
+
+    def refill(self) -> None:
+        """Replace the buffer with a new block of collision free samples."""
+        candidates = self._draw(self.batch_size)
+        free = ~self.obstacles.contains_many(candidates)
+        samples = candidates[free]
+        self.profiler.count('sample_rejections', len(candidates) - len(samples))
+        if self.goal_bias > 0:
+            samples[self.rng.random(len(samples)) < self.goal_bias] = (self.goal.x, self.goal.y)
+        # Reversed so that samples are handed out in drawing order by popping from the end
+        self._buffer = samples[::-1].tolist()
+
+    def sample(self) -> Node:
+        while not self._buffer:
+            self.refill()
+        x, y = self._buffer.pop()
+        return Node(Pose(x, y))
+
+    def sample_many(self, n_samples: int) -> np.ndarray:
+        """Return n_samples collision free samples as (n_samples, 2) array, e.g. the vertices of a roadmap."""
+        blocks = [np.array(self._buffer[::-1]).reshape(-1, 2)]
+        n_drawn = len(blocks[0])
+        self._buffer = []
+        while n_drawn < n_samples:
+            self.refill()
+            blocks.append(np.array(self._buffer[::-1]).reshape(-1, 2))
+            n_drawn += len(blocks[-1])
+        samples = np.concatenate(blocks)
+        # Keep the rest for later calls in drawing order
+        self._buffer = samples[n_samples:][::-1].tolist()
+        return samples[:n_samples]
+
+    def set_obstacles(self, obstacles: CompiledObstacles) -> None:
+        """Sample around a changed obstacle set from now on, buffered samples are dropped."""
+        self.obstacles = obstacles
+        self._buffer = []
+
+    def update_solution(self, cost: float) -> None:
+        """Called by the planner with the cost of the best solution whenever there is one and with infinity when the
+        solution was lost, informed samplers adapt their sampling region to it."""
+        pass
+
+
+class UniformSampler(Sampler):
+    """Uniform samples over the square [0, grid_size]^2."""
+
+    def _draw(self, n_samples: int) -> np.ndarray:
+        return self.rng.uniform(0, self.grid_size, size=(n_samples, 2))
+
+
+def radical_inverse(indices: np.ndarray, base: int) -> np.ndarray:
+    """Van der Corput radical inverse of non negative integers in the given base, all values lie in [0, 1)."""
+    indices = np.array(indices, dtype=np.int64)
+    result = np.zeros(len(indices))
+    factor = 1.0 / base
+    while indices.any():
+        result += factor * (indices % base)
+        indices //= base
+        factor /= base
+    return result
+
+
+class HaltonSampler(Sampler):
+    """Low discrepancy samples of the 2D Halton sequence with bases 2 and 3. The sequence is shifted by a random
+    offset modulo 1 (Cranley-Patterson rotation), so different seeds give different but equally even point sets."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._next_index = 1
+        self._shift = self.rng.random(2)
+
+    def _draw(self, n_samples: int) -> np.ndarray:
+        indices = np.arange(self._next_index, self._next_index + n_samples)
+        self._next_index += n_samples
+        unit = np.column_stack([radical_inverse(indices, 2), radical_inverse(indices, 3)])
+        return ((unit + self._shift) % 1.0) * self.grid_size
+
+
+class InformedSampler(Sampler):
+    """Informed sampling (Gammell et al.): once a solution of cost c exists, only poses whose distance from the start
+    plus distance to the goal is below c can improve it. These form an ellipse with the start and goal as foci,
+    samples are drawn uniformly from the part of it inside the grid. Before the first solution, or while the ellipse
+    is larger than the grid, samples are uniform over the grid."""
+
+    def __init__(self, obstacles: CompiledObstacles, grid_size: float, start: Pose, goal: Pose, seed: int = None,
+                 batch_size: int = 256, goal_bias: float = 0.0, profiler: Profiler = NULL_PROFILER) -> None:
+        super().__init__(obstacles, grid_size, seed=seed, batch_size=batch_size, goal=goal, goal_bias=goal_bias,
+                         profiler=profiler)
+        self.start = start
+        self.center = np.array([(start.x + goal.x) / 2, (start.y + goal.y) / 2])
+        self.min_cost = start.distance_to(goal)
+        angle = math.atan2(goal.y - start.y, goal.x - start.x)
+        self._rotation = np.array([[math.cos(angle), -math.sin(angle)], [math.sin(angle), math.cos(angle)]])
+        self.best_cost = math.inf
+
+    def update_solution(self, cost: float) -> None:
+        if cost != self.best_cost:
+            self.best_cost = cost
+            # Buffered samples were drawn for the old ellipse
+            self._buffer = []
+
+    def _draw(self, n_samples: int) -> np.ndarray:
+        major = self.best_cost / 2
+        minor = math.sqrt(max(self.best_cost ** 2 - self.min_cost ** 2, 0.0)) / 2
+        if math.pi * major * minor >= self.grid_size ** 2:
+            return self.rng.uniform(0, self.grid_size, size=(n_samples, 2))
+        samples = np.empty((0, 2))
+        while len(samples) < n_samples:
+            radius = np.sqrt(self.rng.random(n_samples))
+            angle = self.rng.uniform(0, 2 * np.pi, n_samples)
+            unit_disc = np.column_stack([radius * np.cos(angle) * major, radius * np.sin(angle) * minor])
+            ellipse = unit_disc @ self._rotation.T + self.center
+            in_grid = ((ellipse >= 0) & (ellipse <= self.grid_size)).all(axis=1)
+            samples = np.concatenate([samples, ellipse[in_grid]])
+        return samples[:n_samples]
+
+
+SAMPLERS = ('uniform', 'halton', 'informed')
+
+
+def make_sampler(cfg: RrtConfig, obstacles: CompiledObstacles, seed: int = None, goal_bias: float = None,
+                 profiler: Profiler = NULL_PROFILER) -> Sampler:
+    """Create the sampler selected by cfg.sampler, goal_bias overrides cfg.goal_bias if given."""
+    goal_bias = cfg.goal_bias if goal_bias is None else goal_bias
+    goal = cfg.end_node.pose
+    if cfg.sampler == 'uniform':
+        return UniformSampler(obstacles, cfg.grid_size, seed=seed, goal=goal, goal_bias=goal_bias, profiler=profiler)
+    if cfg.sampler == 'halton':
+        return HaltonSampler(obstacles, cfg.grid_size, seed=seed, goal=goal, goal_bias=goal_bias, profiler=profiler)
+    if cfg.sampler == 'informed':
+        return InformedSampler(obstacles, cfg.grid_size, cfg.start_node.pose, goal, seed=seed, goal_bias=goal_bias,
+                               profiler=profiler)
+    raise ValueError(f'Unknown sampler {cfg.sampler}, choose one of {SAMPLERS}.')
@@ -0,0 +1,72 @@
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from path_planning.planner import PlannerObserver, PlanningResult, RrtPlanner
+from path_planning.tree import TreeNode
+
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class TreeSnapshot:
+    """Immutable copy of the planner state at one point in time, safe to read from any thread. The end tree is only
+    set for RRT-Connect."""
+    version: int
+    positions: np.ndarray
+    edges: np.ndarray
+    steps: int
+    path: Optional[np.ndarray] = None
+    finished: bool = False
+    end_positions: Optional[np.ndarray] = None
+    end_edges: Optional[np.ndarray] = None
+
+
+class SnapshotChannel:
+    """Latest-value channel between one planning thread and one rendering thread. Publishing builds a new snapshot
+    from private copies of the arrays and swaps a single reference, which is atomic, so neither side ever takes a
+    lock or sees a half written snapshot. Readers simply skip snapshots they were too slow for."""
+
+    def __init__(self) -> None:
+        self._latest: Optional[TreeSnapshot] = None
+        self._version = 0
+
+    def publish(self, positions: np.ndarray, edges: np.ndarray, steps: int, path: np.ndarray = None,
+                finished: bool = False, end_positions: np.ndarray = None, end_edges: np.ndarray = None) -> None:
+        self._version += 1
+        self._latest = TreeSnapshot(self._version, positions.copy(), edges.copy(), steps,
+                                    path=None if path is None else path.copy(), finished=finished,
+                                    end_positions=None if end_positions is None else end_positions.copy(),
+                                    end_edges=None if end_edges is None else end_edges.copy())
+
+    def latest(self) -> Optional[TreeSnapshot]:
+        return self._latest
+
+
+class SnapshotPublisher(PlannerObserver):
+    """Publish the planner tree, and the end tree of RRT-Connect, to a SnapshotChannel at most max_rate times per
+    second, copying the tree more often than it can be displayed would only slow down planning. The final state is
+    always published."""
+
+    def __init__(self, channel: SnapshotChannel, max_rate: float = 60.0) -> None:
+        self.channel = channel
+        self.min_interval = 1.0 / max_rate if max_rate else 0.0
+        self._last_publish = -np.inf
+
+    def on_step(self, planner: RrtPlanner, new_node: TreeNode) -> None:
+        now = time.perf_counter()
+        if now - self._last_publish >= self.min_interval:
+            self._last_publish = now
+            self._publish(planner)
+            planner.profiler.stop('publish', now)
+
+    def on_finish(self, planner: RrtPlanner, result: PlanningResult) -> None:
+        self._publish(planner, path=result.path if result.success else None, finished=True)
+
+    def _publish(self, planner: RrtPlanner, path: np.ndarray = None, finished: bool = False) -> None:
+        positions, edges = planner.tree.export()
+        end_tree = getattr(planner, 'end_tree', None)
+        end_positions, end_edges = end_tree.export() if end_tree is not None else (None, None)
+        self.channel.publish(positions, edges, planner.steps, path=path, finished=finished,
+                             end_positions=end_positions, end_edges=end_edges)
@@ -0,0 +1,298 @@
+import dataclasses
+import json
+import math
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from path_planning.config import RrtConfig
+from path_planning.obstacle import CompiledObstacles, Obstacle
+from path_planning.obstacle_map import ObstacleMap
+from path_planning.occupancy_map import OccupancyMap
+from path_planning.planner import PlannerObserver, PlanningResult, RrtPlanner
+from path_planning.tree import Node, Pose, Tree, TreeNode
+
+FORMAT_VERSION = 1
+
+# Raw little endian array files of a PlanStore: name -> (dtype, row shape)
+_VERTEX_ARRAYS = {'positions': ('<f8', (2,)), 'parents': ('<i8', ()), 'costs': ('<f8', ())}
+_RESULT_STATS = ('success', 'path_length', 'steps', 'iterations', 'rejected_edges', 'elapsed_time',
+                 'first_solution_steps', 'first_solution_time')
+
+
+def config_to_dict(cfg: RrtConfig) -> dict:
+    """JSON compatible dict of a config, the start and end nodes are stored as [x, y]."""
+    data = dataclasses.asdict(dataclasses.replace(cfg, start_node=None, end_node=None))
+    data['start_node'] = [cfg.start_node.pose.x, cfg.start_node.pose.y]
+    data['end_node'] = [cfg.end_node.pose.x, cfg.end_node.pose.y]
+    return data
+
+
+def config_from_dict(data: dict) -> RrtConfig:
+    """Inverse of config_to_dict. Unknown keys, e.g. of fields removed since the data was written, are ignored."""
+    fields = {field.name for field in dataclasses.fields(RrtConfig)}
+    data = {key: value for key, value in data.items() if key in fields}
+    for key in ('start_node', 'end_node'):
+        if key in data:
+            data[key] = Node(Pose(*data[key]))
+    return RrtConfig(**data)
+
+
+def _obstacles_to_array(obstacle_map: CompiledObstacles) -> np.ndarray:
+    return np.array([(obs.x, obs.y, obs.width, obs.height) for obs in obstacle_map.obstacles],
+                    dtype='<f8').reshape(-1, 4)
+
+
+def _map_meta(obstacle_map: CompiledObstacles) -> dict:
+    if not isinstance(obstacle_map, OccupancyMap):
+        return {'kind': 'obstacles', 'n_obstacles': len(obstacle_map.obstacles)}
+    return {'kind': 'occupancy', 'n_obstacles': len(obstacle_map.obstacles),
+            'shape': list(obstacle_map.occupancy.shape), 'resolution': obstacle_map.resolution,
+            'origin': obstacle_map.origin.tolist(), 'clearance': obstacle_map.clearance}
+
+
+def _map_from_arrays(meta: dict, obstacles: np.ndarray, occupancy: Optional[np.ndarray]) -> CompiledObstacles:
+    """Rebuild a map. An occupancy map gets its distance field recomputed, only the occupancy grid is stored."""
+    obstacles = [Obstacle(*box) for box in np.asarray(obstacles).tolist()]
+    if meta['kind'] == 'occupancy':
+        return OccupancyMap(occupancy, meta['resolution'], tuple(meta['origin']), meta['clearance'], obstacles)
+    return ObstacleMap(obstacles)
+
+
+def _result_stats(result: PlanningResult) -> dict:
+    stats = {key: getattr(result, key) for key in _RESULT_STATS}
+    # JSON has no infinity
+    stats['path_length'] = stats['path_length'] if math.isfinite(stats['path_length']) else None
+    stats['success'] = bool(stats['success'])
+    return stats
+
+
+def _result_from_arrays(stats: Optional[dict], path: np.ndarray, positions: np.ndarray, parents: np.ndarray,
+                        costs: np.ndarray) -> PlanningResult:
+    """PlanningResult around the given arrays without copying them. A run without stored result stats is reported as
+    unsuccessful with zero counters."""
+    stats = dict(stats) if stats is not None else {'success': False, 'steps': 0, 'iterations': 0,
+                                                   'rejected_edges': 0, 'elapsed_time': 0.0}
+    if stats.get('path_length') is None:
+        stats['path_length'] = math.inf
+    return PlanningResult(path=path, positions=positions, parents=parents, costs=costs, **stats)
+
+
+@dataclass
+class StoredPlan:
+    """A planning run loaded from disk. The arrays of result may be read only memory maps of the stored files, they
+    are copied into a Tree by tree(). complete is False for a run which was still in progress when it was read."""
+    cfg: RrtConfig
+    obstacle_map: CompiledObstacles
+    result: PlanningResult
+    complete: bool
+
+    def tree(self, capacity: int = None) -> Tree:
+        """Tree of the stored vertices, e.g. to warm start a planner with RrtPlanner.warm_start."""
+        return Tree.from_arrays(self.result.positions, self.result.parents, self.result.costs, capacity=capacity)
+
+
+class PlanStore:
+    """On-disk plan in a directory: meta.json with the format version, the config, the map parameters and the result
+    statistics, plus one raw little endian file per array (positions.f8 with shape (n, 2), parents.i8, costs.f8,
+    path.f8, obstacles.f8 as (x, y, width, height) rows and occupancy.u1 for rasterized maps). Raw files can be mapped
+    with np.memmap, so loading a tree reads nothing up front and never unpickles anything.
+
+    Vertices are appended while a run is in progress. meta.json is replaced atomically after the array files are
+    written and its vertex count is authoritative, so a reader, or a run that crashed mid-append, always sees a
+    consistent prefix of the tree."""
+
+    def __init__(self, directory: str, meta: dict) -> None:
+        """Use PlanStore.create or PlanStore.open."""
+        self.directory = directory
+        self.meta = meta
+
+    @classmethod
+    def create(cls, directory: str, cfg: RrtConfig, obstacle_map: CompiledObstacles) -> 'PlanStore':
+        """Start a new store in directory, which is created if needed. Existing store files in it are overwritten."""
+        os.makedirs(directory, exist_ok=True)
+        store = cls(directory, {'version': FORMAT_VERSION, 'config': config_to_dict(cfg), 'size': 0,
+                                'path_size': 0, 'result': None, 'map': None})
+        for name in _VERTEX_ARRAYS:
+            open(store._file(name), 'wb').close()
+        open(store._file('path'), 'wb').close()
+        store.set_obstacle_map(obstacle_map)
+        return store
+
+    @classmethod
+    def open(cls, directory: str) -> 'PlanStore':
+        with open(os.path.join(directory, 'meta.json')) as meta_file:
+            meta = json.load(meta_file)
+        if meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f'Unsupported plan store version {meta.get("version")}, expected {FORMAT_VERSION}.')
+        return cls(directory, meta)
+
+    def __len__(self) -> int:
+        return self.meta['size']
+
+    def _file(self, name: str) -> str:
+        suffix = {'parents': 'i8', 'occupancy': 'u1'}.get(name, 'f8')
+        return os.path.join(self.directory, f'{name}.{suffix}')
+
+    def _write_meta(self) -> None:
+        path = os.path.join(self.directory, 'meta.json')
+        with open(path + '.tmp', 'w') as meta_file:
+            json.dump(self.meta, meta_file)
+        os.replace(path + '.tmp', path)
+
+    def _map(self, name: str, dtype: str, shape: tuple, mode: str = 'r') -> np.ndarray:
+        if shape[0] == 0:
+            # Empty files can not be memory mapped
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(self._file(name), dtype=dtype, mode=mode, shape=shape)
+
+    def vertex_array(self, name: str, mode: str = 'r') -> np.ndarray:
+        """Memory map of the stored positions, parents or costs, writable in place with mode 'r+'."""
+        dtype, row_shape = _VERTEX_ARRAYS[name]
+        return self._map(name, dtype, (len(self), *row_shape), mode)
+
+    def append_vertices(self, positions: np.ndarray, parents: np.ndarray, costs: np.ndarray) -> None:
+        """Append vertices with the given arrays, as exported by Tree or PlanningResult."""
+        arrays = {'positions': positions, 'parents': parents, 'costs': costs}
+        n_new = len(positions)
+        if any(len(array) != n_new for array in arrays.values()):
+            raise ValueError('Vertex arrays have to have the same length.')
+        for name, (dtype, row_shape) in _VERTEX_ARRAYS.items():
+            with open(self._file(name), 'r+b') as array_file:
+                # Drop bytes of an interrupted append beyond the recorded size
+                array_file.truncate(len(self) * np.dtype(dtype).itemsize * int(np.prod(row_shape)))
+                array_file.seek(0, os.SEEK_END)
+                array_file.write(np.ascontiguousarray(arrays[name], dtype=dtype).tobytes())
+        self.meta['size'] += n_new
+        self._write_meta()
+
+    def write_vertices(self, start: int, positions: np.ndarray = None, parents: np.ndarray = None,
+                       costs: np.ndarray = None) -> None:
+        """Overwrite stored vertices from index start on in place, e.g. parents and costs changed by RRT* rewiring.
+        Arrays which are None are left as they are."""
+        for name, values in (('positions', positions), ('parents', parents), ('costs', costs)):
+            if values is None or len(values) == 0:
+                continue
+            if start < 0 or start + len(values) > len(self):
+                raise ValueError(f'Can not write vertices {start} to {start + len(values)} of {len(self)}.')
+            stored = self.vertex_array(name, mode='r+')
+            stored[start:start + len(values)] = values
+            stored.flush()
+
+    def truncate(self, size: int) -> None:
+        """Keep only the first size vertices."""
+        if not 0 <= size <= len(self):
+            raise ValueError(f'Can not truncate {len(self)} vertices to {size}.')
+        for name, (dtype, row_shape) in _VERTEX_ARRAYS.items():
+            os.truncate(self._file(name), size * np.dtype(dtype).itemsize * int(np.prod(row_shape)))
+        self.meta['size'] = size
+        self._write_meta()
+
+    def write_tree(self, positions: np.ndarray, parents: np.ndarray, costs: np.ndarray) -> None:
+        """Make the stored vertices equal to the given ones, overwriting the common prefix in place."""
+        n_common = min(len(self), len(positions))
+        self.truncate(n_common)
+        self.write_vertices(0, positions[:n_common], parents[:n_common], costs[:n_common])
+        self.append_vertices(positions[n_common:], parents[n_common:], costs[n_common:])
+
+    def set_obstacle_map(self, obstacle_map: CompiledObstacles) -> None:
+        """Replace the stored map, e.g. after the obstacles of the planner changed."""
+        _obstacles_to_array(obstacle_map).tofile(self._file('obstacles'))
+        if isinstance(obstacle_map, OccupancyMap):
+            obstacle_map.occupancy.astype('u1').tofile(self._file('occupancy'))
+        self.meta['map'] = _map_meta(obstacle_map)
+        self._write_meta()
+
+    def set_result(self, result: PlanningResult) -> None:
+        """Store the final tree, path and statistics of a run, which marks it as complete."""
+        self.write_tree(result.positions, result.parents, result.costs)
+        np.ascontiguousarray(result.path, dtype='<f8').tofile(self._file('path'))
+        self.meta['path_size'] = len(result.path)
+        self.meta['result'] = _result_stats(result)
+        self._write_meta()
+
+    @property
+    def complete(self) -> bool:
+        return self.meta['result'] is not None
+
+    def load(self, mmap: bool = True) -> StoredPlan:
+        """Load the plan, its arrays as read only memory maps or, with mmap False, as copies in memory."""
+        arrays = {name: self.vertex_array(name) for name in _VERTEX_ARRAYS}
+        arrays['path'] = self._map('path', '<f8', (self.meta['path_size'], 2))
+        map_meta = self.meta['map']
+        obstacles = self._map('obstacles', '<f8', (map_meta['n_obstacles'], 4))
+        occupancy = None
+        if map_meta['kind'] == 'occupancy':
+            occupancy = self._map('occupancy', 'u1', tuple(map_meta['shape'])).astype(bool)
+        if not mmap:
+            arrays = {name: np.array(array) for name, array in arrays.items()}
+        return StoredPlan(cfg=config_from_dict(self.meta['config']),
+                          obstacle_map=_map_from_arrays(map_meta, obstacles, occupancy),
+                          result=_result_from_arrays(self.meta['result'], **arrays), complete=self.complete)
+
+
+def save_npz(path: str, cfg: RrtConfig, obstacle_map: CompiledObstacles, result: PlanningResult,
+             compressed: bool = True) -> None:
+    """Archive a finished run in a single .npz file, the struct-of-arrays counterpart of a PlanStore. Metadata is a
+    JSON string array, so loading needs no pickle."""
+    meta = {'version': FORMAT_VERSION, 'config': config_to_dict(cfg), 'result': _result_stats(result),
+            'map': _map_meta(obstacle_map)}
+    arrays = {'meta': np.array(json.dumps(meta)), 'positions': result.positions, 'parents': result.parents,
+              'costs': result.costs, 'path': result.path, 'obstacles': _obstacles_to_array(obstacle_map)}
+    if isinstance(obstacle_map, OccupancyMap):
+        arrays['occupancy'] = obstacle_map.occupancy
+    (np.savez_compressed if compressed else np.savez)(path, **arrays)
+
+
+def load_npz(path: str) -> StoredPlan:
+    with np.load(path, allow_pickle=False) as archive:
+        meta = json.loads(str(archive['meta']))
+        if meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f'Unsupported plan archive version {meta.get("version")}, expected {FORMAT_VERSION}.')
+        arrays = {name: archive[name] for name in ('path', 'positions', 'parents', 'costs')}
+        occupancy = archive['occupancy'] if 'occupancy' in archive.files else None
+        obstacle_map = _map_from_arrays(meta['map'], archive['obstacles'], occupancy)
+    return StoredPlan(cfg=config_from_dict(meta['config']), obstacle_map=obstacle_map,
+                      result=_result_from_arrays(meta['result'], **arrays), complete=True)
+
+
+class PlanRecorder(PlannerObserver):
+    """Streams a run into a PlanStore: every every_n_steps inserted nodes the new vertices of planner.tree are
+    appended, for RRT* the parents and costs of the stored ones are rewritten in place as rewiring changes them.
+    Obstacle changes replace the stored map and, if they removed vertices, the stored tree is rewritten. On finish
+    the result is stored, for RRT-Connect this adds the end tree, which is not recorded during the run."""
+
+    def __init__(self, store: PlanStore, every_n_steps: int = 100) -> None:
+        if every_n_steps <= 0:
+            raise ValueError(f'Recording interval has to be positive, got {every_n_steps}.')
+        self.store = store
+        self.every_n_steps = every_n_steps
+        self._steps_since_flush = 0
+
+    def flush(self, planner: RrtPlanner) -> None:
+        tree = planner.tree
+        if len(self.store) > len(tree):
+            # The stored result of an earlier RRT-Connect run includes the end tree
+            self.store.truncate(len(tree))
+        n_stored = len(self.store)
+        if planner.cfg.algorithm == 'rrt_star':
+            self.store.write_vertices(0, parents=tree.parents[:n_stored], costs=tree.costs[:n_stored])
+        self.store.append_vertices(tree.positions[n_stored:], tree.parents[n_stored:], tree.costs[n_stored:])
+        self._steps_since_flush = 0
+
+    def on_step(self, planner: RrtPlanner, new_node: TreeNode) -> None:
+        self._steps_since_flush += 1
+        if self._steps_since_flush >= self.every_n_steps:
+            self.flush(planner)
+
+    def on_obstacles_changed(self, planner: RrtPlanner, removed_nodes: int) -> None:
+        self.store.set_obstacle_map(planner.obstacle_map)
+        if removed_nodes > 0:
+            self.store.truncate(0)
+            self.flush(planner)
+
+    def on_finish(self, planner: RrtPlanner, result: PlanningResult) -> None:
+        self.store.set_result(result)
+        self._steps_since_flush = 0
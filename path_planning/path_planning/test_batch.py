@@ -0,0 +1,47 @@
+import dataclasses
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from path_planning import batch
+from path_planning.batch import SharedObstacleMaps, random_queries, run_batch
+from path_planning.config import RrtConfig
+from path_planning.planner import DEFAULT_OBSTACLES, build_obstacle_map, make_planner
+from path_planning.tree import Node, Pose
+
+
+def test_run_batch_matches_serial_runs(monkeypatch):
+    created = []
+
+    class RecordingSharedObstacleMaps(SharedObstacleMaps):
+        def __init__(self, obstacle_maps):
+            super().__init__(obstacle_maps)
+            created.append(self)
+
+    monkeypatch.setattr(batch, 'SharedObstacleMaps', RecordingSharedObstacleMaps)
+    cfg = RrtConfig(max_steps=300)
+    obstacle_maps = {'default': DEFAULT_OBSTACLES, 'fewer': DEFAULT_OBSTACLES[1:]}
+    queries = random_queries(3, DEFAULT_OBSTACLES, cfg.grid_size, seed=0) \
+        + random_queries(3, DEFAULT_OBSTACLES, cfg.grid_size, seed=1, map_name='fewer')
+    results = dict(run_batch(queries, cfg, obstacle_maps, max_workers=2, keep_trees=True))
+    assert set(results) == set(queries)
+
+    for query in queries:
+        query_cfg = dataclasses.replace(cfg, start_node=Node(Pose(*query.start)), end_node=Node(Pose(*query.end)))
+        obstacle_map = build_obstacle_map(query_cfg, obstacle_maps[query.map_name])
+        expected = make_planner(query_cfg, obstacle_map, seed=query.seed).run()
+        result = results[query]
+        assert result.success == expected.success and result.steps == expected.steps
+        assert np.array_equal(result.positions, expected.positions)
+        assert np.array_equal(result.path, expected.path)
+
+    # The blocks of the maps are unlinked once the batch is done
+    assert len(created) == 1 and set(created[0].handles) == set(obstacle_maps)
+    for block_name, _ in created[0].handles.values():
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=block_name)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
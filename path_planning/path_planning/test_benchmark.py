@@ -0,0 +1,42 @@
+import dataclasses
+import json
+
+from path_planning.benchmark import BenchmarkResult, bench_export, bench_nearest, compare
+
+
+def test_bench_nearest():
+    results = list(bench_nearest([50]))
+    assert [result.key for result in results] == ['nearest backend=brute nodes=50',
+                                                  'within_radius backend=brute nodes=50',
+                                                  'nearest backend=grid nodes=50',
+                                                  'within_radius backend=grid nodes=50']
+    for result in results:
+        assert 0 < result.best <= result.median and result.number >= 1
+
+
+def test_bench_export():
+    results = list(bench_export([10, 50]))
+    assert [result.key for result in results] == ['export nodes=10', 'export_segments nodes=10',
+                                                  'export nodes=50', 'export_segments nodes=50']
+    for result in results:
+        assert 0 < result.best <= result.median and result.number >= 1
+
+
+def test_compare_round_trip():
+    results = [dataclasses.asdict(result) for result in bench_export([10])]
+    baseline = json.loads(json.dumps({'results': results}))['results']
+    rows = compare(baseline, results)
+    assert [row[0] for row in rows] == ['export nodes=10', 'export_segments nodes=10']
+    for _, old, new, ratio in rows:
+        assert old == new and ratio == 1
+
+    # Cases without a counterpart in the baseline are skipped
+    current = [dataclasses.asdict(BenchmarkResult('export', {'nodes': 20}, 2e-6, 1e-6, 5, 100)),
+               dict(results[0], median=2 * results[0]['median'])]
+    assert [(row[0], row[3]) for row in compare(baseline, current)] == [('export nodes=10', 2)]
+
+
+if __name__ == '__main__':
+    test_bench_nearest()
+    test_bench_export()
+    test_compare_round_trip()
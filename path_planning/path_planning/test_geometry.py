@@ -0,0 +1,29 @@
+import random
+
+import numpy as np
+
+from path_planning.geometry import intersects, intersects_many
+from path_planning.obstacle import CompiledObstacles, Obstacle
+
+
+def test_intersects_many_matches_intersects():
+    random.seed(0)
+    obstacle_segments = [[(random.uniform(0, 10), random.uniform(0, 10)),
+                          (random.uniform(0, 10), random.uniform(0, 10))] for _ in range(20)]
+    query_segments = [[(random.uniform(0, 10), random.uniform(0, 10)),
+                       (random.uniform(0, 10), random.uniform(0, 10))] for _ in range(50)]
+    expected = [any(intersects(obs, query) for obs in obstacle_segments) for query in query_segments]
+    assert intersects_many(np.array(query_segments), np.array(obstacle_segments)).tolist() == expected
+
+
+def test_compiled_obstacles_block_inner_segments():
+    obstacles = CompiledObstacles([Obstacle(0, 0, 10, 10), Obstacle(20, 0, 5, 5)])
+    assert obstacles.blocks([(2, 2), (8, 8)])  # fully inside, crosses no border
+    assert obstacles.blocks([(-5, 5), (5, 5)])
+    assert not obstacles.blocks([(12, 2), (18, 8)])
+    assert obstacles.contains_many(np.array([[1, 1], [15, 1], [21, 1]])).tolist() == [True, False, True]
+
+
+if __name__ == '__main__':
+    test_intersects_many_matches_intersects()
+    test_compiled_obstacles_block_inner_segments()
@@ -0,0 +1,24 @@
+import random
+
+import numpy as np
+
+from path_planning.nearest import BruteForceIndex, GridIndex
+from path_planning.tree import Pose, Tree
+
+
+def test_grid_index_matches_brute_force():
+    random.seed(0)
+    tree = Tree(Pose(50, 50))
+    grid_index = GridIndex(tree, cell_size=4)
+    for _ in range(2000):
+        idx = tree.add(Pose(random.uniform(0, 100), random.uniform(0, 100)), parent=0)
+        grid_index.insert(idx)
+    brute_index = BruteForceIndex(tree)
+    for _ in range(200):
+        x, y = random.uniform(-20, 120), random.uniform(-20, 120)
+        assert grid_index.nearest(x, y) == brute_index.nearest(x, y)
+        assert np.array_equal(grid_index.within_radius(x, y, 7.5), brute_index.within_radius(x, y, 7.5))
+
+
+if __name__ == '__main__':
+    test_grid_index_matches_brute_force()
@@ -0,0 +1,26 @@
+import random
+
+import numpy as np
+
+from path_planning.obstacle import CompiledObstacles, Obstacle
+from path_planning.obstacle_map import ObstacleMap
+from path_planning.tree import Pose
+
+
+def test_obstacle_map_matches_compiled_obstacles():
+    random.seed(0)
+    obstacles = [Obstacle(random.uniform(0, 100), random.uniform(0, 100),
+                          random.uniform(0.5, 5), random.uniform(0.5, 5)) for _ in range(300)]
+    compiled, obstacle_map = CompiledObstacles(obstacles), ObstacleMap(obstacles)
+    points = np.random.default_rng(0).uniform(-10, 110, size=(1000, 2))
+    assert np.array_equal(obstacle_map.contains_many(points), compiled.contains_many(points))
+    assert [obstacle_map.contains(Pose(*p)) for p in points[:100]] == compiled.contains_many(points[:100]).tolist()
+    starts = np.random.default_rng(1).uniform(-10, 110, size=(500, 2))
+    segments = np.stack([starts, starts + np.random.default_rng(2).uniform(-6, 6, size=(500, 2))], axis=1)
+    expected = compiled.blocks_many(segments)
+    assert np.array_equal(obstacle_map.blocks_many(segments), expected)
+    assert [obstacle_map.blocks(seg) for seg in segments[:100]] == expected[:100].tolist()
+
+
+if __name__ == '__main__':
+    test_obstacle_map_matches_compiled_obstacles()
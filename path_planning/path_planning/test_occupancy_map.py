@@ -0,0 +1,57 @@
+import numpy as np
+from matplotlib import image
+
+from path_planning.config import RrtConfig
+from path_planning.obstacle_map import ObstacleMap
+from path_planning.occupancy_map import OccupancyMap, distance_transform
+from path_planning.planner import DEFAULT_OBSTACLES, plan
+
+
+def test_distance_transform_is_exact():
+    occupied = np.random.default_rng(0).random((30, 41)) < 0.05
+    occupied[0, 0] = True
+    occupied_cells = np.argwhere(occupied)
+    cells = np.indices(occupied.shape).reshape(2, -1).T
+    expected = np.sqrt(((cells[:, None] - occupied_cells[None]) ** 2).sum(axis=2).min(axis=1))
+    assert np.allclose(distance_transform(occupied), expected.reshape(occupied.shape))
+    assert np.isinf(distance_transform(np.zeros((3, 4), dtype=bool))).all()
+
+
+def test_occupancy_map_is_conservative():
+    occupancy_map = OccupancyMap.from_obstacles(DEFAULT_OBSTACLES, 100, 0.5)
+    obstacle_map = ObstacleMap(DEFAULT_OBSTACLES)
+    rng = np.random.default_rng(1)
+    points = rng.uniform(0, 100, size=(5000, 2))
+    assert not (obstacle_map.contains_many(points) & ~occupancy_map.contains_many(points)).any()
+    # The raster only covers the planning area, so the segments have to stay inside of it
+    segments = np.stack([points, np.clip(points + rng.uniform(-6, 6, size=(5000, 2)), 0, 100)], axis=1)
+    raster_blocked, exact_blocked = occupancy_map.blocks_many(segments), obstacle_map.blocks_many(segments)
+    assert not (exact_blocked & ~raster_blocked).any()
+    assert (raster_blocked != exact_blocked).mean() < 0.02
+
+
+def test_load_and_plan_with_clearance(tmp_path):
+    grid = np.ones((40, 20))
+    grid[10:20, 5:8] = 0  # a dark block in picture rows 10-19, columns 5-7
+    image.imsave(tmp_path / 'map.png', grid, cmap='gray', vmin=0, vmax=1)
+    loaded = OccupancyMap.load(str(tmp_path / 'map.png'))
+    assert loaded.occupancy.shape == (20, 40) and loaded.occupancy.sum() == 30
+    assert loaded.occupancy[5:8, 20:30].all()
+    np.save(tmp_path / 'map.npy', loaded.occupancy)
+    assert np.array_equal(OccupancyMap.load(str(tmp_path / 'map.npy')).occupancy, loaded.occupancy)
+
+    cfg = RrtConfig(max_steps=3000, map_resolution=0.5, clearance=1.5)
+    result = plan(cfg, seed=0)
+    assert result.success
+    waypoints = np.linspace(result.path[:-1], result.path[1:], 20).reshape(-1, 2)
+    exact = OccupancyMap.from_obstacles(DEFAULT_OBSTACLES, cfg.grid_size, 0.1)
+    assert exact.distance_many(waypoints).min() > 1.0
+
+
+if __name__ == '__main__':
+    import pathlib
+    import tempfile
+    test_distance_transform_is_exact()
+    test_occupancy_map_is_conservative()
+    with tempfile.TemporaryDirectory() as directory:
+        test_load_and_plan_with_clearance(pathlib.Path(directory))
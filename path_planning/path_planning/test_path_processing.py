@@ -0,0 +1,34 @@
+import numpy as np
+
+from path_planning.config import RrtConfig
+from path_planning.obstacle_map import ObstacleMap
+from path_planning.path_processing import CollisionCache, path_length, postprocess_path
+from path_planning.planner import DEFAULT_OBSTACLES, plan
+
+
+def test_postprocessed_paths_are_shorter_and_free():
+    obstacle_map = ObstacleMap(DEFAULT_OBSTACLES)
+    path = plan(RrtConfig(max_steps=3000), seed=3).path
+    for shortcut in ('greedy', 'random', None):
+        collisions = CollisionCache(obstacle_map)
+        processed = postprocess_path(path, obstacle_map, shortcut, rng=np.random.default_rng(0),
+                                     collisions=collisions)
+        assert np.array_equal(processed[0], path[0]) and np.array_equal(processed[-1], path[-1])
+        assert path_length(processed) < path_length(path)
+        assert not obstacle_map.blocks_many(np.stack([processed[:-1], processed[1:]], axis=1)).any()
+    # Repeating the post-processing only hits the cache
+    misses = collisions.misses
+    postprocess_path(path, obstacle_map, None, collisions=collisions)
+    assert collisions.misses == misses
+
+
+def test_planner_postprocessing():
+    cfg = RrtConfig(max_steps=3000, path_shortcut='greedy', path_smoothing=3)
+    result = plan(cfg, seed=3)
+    assert result.success and np.isclose(result.path_length, path_length(result.path))
+    assert result.path_length < plan(RrtConfig(max_steps=3000), seed=3).path_length
+
+
+if __name__ == '__main__':
+    test_postprocessed_paths_are_shorter_and_free()
+    test_planner_postprocessing()
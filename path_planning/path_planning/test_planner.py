@@ -0,0 +1,106 @@
+import numpy as np
+
+from path_planning.config import RrtConfig
+from path_planning.obstacle_map import ObstacleMap
+from path_planning.obstacle import Obstacle
+from path_planning.planner import DEFAULT_OBSTACLES, PlannerObserver, make_planner, plan
+from path_planning.profiling import Profiler
+
+
+class CountingObserver(PlannerObserver):
+    def __init__(self):
+        self.steps = 0
+        self.finished = False
+
+    def on_step(self, planner, new_node):
+        self.steps += 1
+
+    def on_finish(self, planner, result):
+        self.finished = True
+
+
+def test_headless_planning_is_reproducible():
+    cfg = RrtConfig(max_steps=2000)
+    observer = CountingObserver()
+    result = plan(cfg, seed=3, observers=[observer])
+    assert result.success
+    assert observer.finished and observer.steps == result.steps == result.num_nodes - 1
+    assert np.allclose(result.path[0], [cfg.start_node.pose.x, cfg.start_node.pose.y])
+    assert np.linalg.norm(result.path[-1] - [cfg.end_node.pose.x, cfg.end_node.pose.y]) < cfg.eps
+    assert np.isclose(result.path_length, np.linalg.norm(np.diff(result.path, axis=0), axis=1).sum())
+    assert np.array_equal(plan(cfg, seed=3).positions, result.positions)
+
+
+def test_rrt_star_keeps_costs_consistent_and_refines():
+    result = plan(RrtConfig(algorithm='rrt_star', max_steps=3000, refine_steps=1500), seed=3)
+    assert result.success and result.steps == result.first_solution_steps + 1500
+    # Recompute every cost-to-come from the parent links
+    costs = np.zeros(len(result.positions))
+    for idx in np.argsort(result.costs)[1:]:
+        parent = result.parents[idx]
+        costs[idx] = costs[parent] + np.linalg.norm(result.positions[idx] - result.positions[parent])
+    assert np.allclose(costs, result.costs)
+    assert result.path_length < plan(RrtConfig(max_steps=3000), seed=3).path_length
+
+
+def test_rrt_connect_joins_start_and_end():
+    cfg = RrtConfig(algorithm='rrt_connect', max_steps=3000)
+    result = plan(cfg, seed=5)
+    assert result.success
+    assert np.allclose(result.path[0], [cfg.start_node.pose.x, cfg.start_node.pose.y])
+    assert np.allclose(result.path[-1], [cfg.end_node.pose.x, cfg.end_node.pose.y])
+    assert np.isclose(result.path_length, np.linalg.norm(np.diff(result.path, axis=0), axis=1).sum())
+    assert not ObstacleMap(DEFAULT_OBSTACLES).blocks_many(np.stack([result.path[:-1], result.path[1:]], axis=1)).any()
+
+
+def test_profiler_records_phases_without_changing_the_run():
+    cfg = RrtConfig(max_steps=2000)
+    profiler = Profiler(trace=True)
+    result = plan(cfg, seed=3, profiler=profiler)
+    assert np.array_equal(plan(cfg, seed=3).positions, result.positions)
+    summary = profiler.summary()
+    assert summary['phases']['insert']['count'] == result.steps
+    assert summary['phases']['sample']['count'] == summary['phases']['nearest']['count'] == result.iterations
+    assert summary['counters']['rejected_edges'] == result.rejected_edges
+    assert sum(count for _, _, count in profiler.histogram('nearest')) == result.iterations
+    events = profiler.chrome_trace()['traceEvents']
+    assert sum(event['name'] == 'collision' for event in events) == result.iterations
+
+
+def test_replanning_after_obstacle_changes_keeps_the_valid_tree():
+    for algorithm in ('rrt_star', 'rrt_connect'):
+        planner = make_planner(RrtConfig(algorithm=algorithm, max_steps=3000, refine_steps=500), seed=3)
+        result = planner.run()
+        x, y = result.path[len(result.path) // 2]
+        obstacle = Obstacle(x - 3, y - 3, 6, 6)
+        removed = planner.add_obstacle(obstacle)
+        assert 0 < removed < result.num_nodes - 2 and planner.goal_index is None
+        obstacle_map = ObstacleMap(DEFAULT_OBSTACLES + [obstacle])
+        edges = planner.tree.positions[planner.tree.edges]
+        assert not obstacle_map.blocks_many(edges).any()
+        assert planner.nearest_index.nearest(x, y) < len(planner.tree)
+        replanned = planner.run()
+        assert replanned.success
+        assert not obstacle_map.blocks_many(np.stack([replanned.path[:-1], replanned.path[1:]], axis=1)).any()
+        assert planner.remove_obstacle(planner.move_obstacle(obstacle, 0, 0)) == 0
+
+
+def test_adding_an_obstacle_to_a_raster_map_prunes_all_blocked_edges():
+    cfg = RrtConfig(max_steps=1500, map_resolution=1.0)
+    for seed in (1, 2, 3):
+        planner = make_planner(cfg, seed=seed)
+        planner.run()
+        x, y = planner.tree.positions[len(planner.tree) // 2]
+        # Off the cell grid, so the rasterized rectangle sticks out beyond the exact one
+        planner.add_obstacle(Obstacle(x + 0.3, y + 0.3, 3, 3))
+        edges = planner.tree.positions[planner.tree.edges]
+        assert not planner.obstacle_map.blocks_many(edges).any(), seed
+
+
+if __name__ == '__main__':
+    test_headless_planning_is_reproducible()
+    test_rrt_star_keeps_costs_consistent_and_refines()
+    test_rrt_connect_joins_start_and_end()
+    test_profiler_records_phases_without_changing_the_run()
+    test_replanning_after_obstacle_changes_keeps_the_valid_tree()
+    test_adding_an_obstacle_to_a_raster_map_prunes_all_blocked_edges()
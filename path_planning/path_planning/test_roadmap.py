@@ -0,0 +1,46 @@
+import numpy as np
+
+from path_planning.config import RrtConfig
+from path_planning.obstacle_map import ObstacleMap
+from path_planning.planner import DEFAULT_OBSTACLES
+from path_planning.roadmap import candidate_edges, check_edges, load_or_build
+from path_planning.tree import Pose
+
+
+def test_candidate_edges_match_brute_force():
+    positions = np.random.default_rng(0).uniform(0, 100, size=(300, 2))
+    edges = candidate_edges(positions, 10.0, chunk_size=64)
+    distances = np.hypot(*(positions[:, None] - positions[None]).transpose(2, 0, 1))
+    expected = np.argwhere(np.triu(distances <= 10.0, k=1))
+    assert sorted(map(tuple, edges.tolist())) == sorted(map(tuple, expected.tolist()))
+
+
+def test_roadmap_queries_and_cache(tmp_path):
+    obstacle_map = ObstacleMap(DEFAULT_OBSTACLES)
+    cfg = RrtConfig(roadmap_samples=800)
+    roadmap = load_or_build(obstacle_map, cfg, cache_dir=str(tmp_path))
+    segments = roadmap.positions[roadmap.edges]
+    assert not obstacle_map.blocks_many(segments).any()
+    assert np.array_equal(check_edges(obstacle_map, segments, max_workers=2), check_edges(obstacle_map, segments))
+
+    start, goal = Pose(10, 10), Pose(90, 65)
+    result = roadmap.query(start, goal)
+    assert result.success and np.allclose(result.path[[0, -1]], [[10, 10], [90, 65]])
+    assert not obstacle_map.blocks_many(np.stack([result.path[:-1], result.path[1:]], axis=1)).any()
+    dijkstra = roadmap.query(start, goal, method='dijkstra')
+    assert np.isclose(dijkstra.path_length, result.path_length) and dijkstra.iterations >= result.iterations
+
+    cached = load_or_build(obstacle_map, cfg, cache_dir=str(tmp_path))
+    assert len(list(tmp_path.iterdir())) == 1 and np.array_equal(cached.edges, roadmap.edges)
+    # Another map gets its own cache entry
+    fewer_obstacles = ObstacleMap(DEFAULT_OBSTACLES[1:])
+    load_or_build(fewer_obstacles, cfg, cache_dir=str(tmp_path))
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+if __name__ == '__main__':
+    import pathlib
+    import tempfile
+    test_candidate_edges_match_brute_force()
+    with tempfile.TemporaryDirectory() as directory:
+        test_roadmap_queries_and_cache(pathlib.Path(directory))
@@ -0,0 +1,44 @@
+import numpy as np
+
+from path_planning.config import RrtConfig
+from path_planning.obstacle_map import ObstacleMap
+from path_planning.planner import DEFAULT_OBSTACLES, plan
+from path_planning.sampling import SAMPLERS, make_sampler, radical_inverse
+
+
+def test_samplers_avoid_obstacles_and_are_reproducible():
+    obstacle_map = ObstacleMap(DEFAULT_OBSTACLES)
+    for sampler_name in SAMPLERS:
+        cfg = RrtConfig(sampler=sampler_name)
+        samples = [make_sampler(cfg, obstacle_map, seed=1).sample() for _ in range(2)]
+        assert samples[0].pose.x == samples[1].pose.x and samples[0].pose.y == samples[1].pose.y
+        sampler = make_sampler(cfg, obstacle_map, seed=1)
+        points = np.array([[node.pose.x, node.pose.y] for node in (sampler.sample() for _ in range(2000))])
+        assert not obstacle_map.contains_many(points).any()
+        assert ((points >= 0) & (points <= cfg.grid_size)).all()
+
+
+def test_informed_sampler_stays_in_ellipse():
+    cfg = RrtConfig(sampler='informed')
+    start, end = cfg.start_node.pose, cfg.end_node.pose
+    sampler = make_sampler(cfg, ObstacleMap(DEFAULT_OBSTACLES), seed=2)
+    best_cost = 1.1 * start.distance_to(end)
+    sampler.update_solution(best_cost)
+    points = np.array([[node.pose.x, node.pose.y] for node in (sampler.sample() for _ in range(1000))])
+    cost_via = np.hypot(*(points - [start.x, start.y]).T) + np.hypot(*(points - [end.x, end.y]).T)
+    assert (cost_via <= best_cost + 1e-9).all()
+
+
+def test_halton_and_goal_bias():
+    assert np.allclose(radical_inverse(np.arange(1, 5), 2), [0.5, 0.25, 0.75, 0.125])
+    cfg = RrtConfig(goal_bias=0.5)
+    sampler = make_sampler(cfg, ObstacleMap(DEFAULT_OBSTACLES), seed=0)
+    hits = sum(sampler.sample().distance_to(cfg.end_node) == 0 for _ in range(2000))
+    assert 900 < hits < 1100
+    assert plan(RrtConfig(max_steps=3000, sampler='halton'), seed=0).success
+
+
+if __name__ == '__main__':
+    test_samplers_avoid_obstacles_and_are_reproducible()
+    test_informed_sampler_stays_in_ellipse()
+    test_halton_and_goal_bias()
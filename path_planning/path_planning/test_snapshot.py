@@ -0,0 +1,67 @@
+import threading
+import time
+
+import numpy as np
+
+from path_planning.config import RrtConfig
+from path_planning.planner import RrtConnectPlanner, RrtPlanner
+from path_planning.snapshot import SnapshotChannel, SnapshotPublisher
+
+
+def test_channel_hands_over_private_copies():
+    channel = SnapshotChannel()
+    assert channel.latest() is None
+    positions, edges = np.zeros((2, 2)), np.array([[0, 1]])
+    channel.publish(positions, edges, steps=1)
+    first = channel.latest()
+    positions[:] = 5
+    assert first.version == 1 and first.steps == 1 and not first.finished
+    assert np.array_equal(first.positions, np.zeros((2, 2))) and np.array_equal(first.edges, [[0, 1]])
+    # A reader which was too slow only sees the latest snapshot
+    channel.publish(positions, edges, steps=2)
+    channel.publish(positions, edges, steps=3, path=positions, finished=True)
+    latest = channel.latest()
+    assert latest.version == 3 and latest.steps == 3 and latest.finished and np.array_equal(latest.path, positions)
+    assert first.steps == 1 and np.array_equal(first.positions, np.zeros((2, 2)))
+
+
+def test_stop_from_another_thread():
+    cfg = RrtConfig(algorithm='rrt_star', max_steps=100000)
+    planner = RrtPlanner(cfg, seed=0)
+    channel = SnapshotChannel()
+    planner.observers.append(SnapshotPublisher(channel, max_rate=1000))
+    thread = threading.Thread(target=planner.run)
+    thread.start()
+
+    deadline = time.perf_counter() + 30
+    while (channel.latest() is None or channel.latest().steps < 50) and time.perf_counter() < deadline:
+        snapshot = channel.latest()
+        if snapshot is not None:
+            assert snapshot.edges.size == 0 or snapshot.edges.max() < len(snapshot.positions)
+        time.sleep(0.001)
+    planner.stop()
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+
+    final = channel.latest()
+    assert final.finished and final.steps == planner.steps and 50 <= planner.steps < cfg.max_steps
+    assert len(final.positions) == len(planner.tree)
+    assert final.end_positions is None and final.end_edges is None
+
+
+def test_rrt_connect_publishes_both_trees():
+    planner = RrtConnectPlanner(RrtConfig(algorithm='rrt_connect', max_steps=500), seed=0)
+    channel = SnapshotChannel()
+    planner.observers.append(SnapshotPublisher(channel, max_rate=0))
+    planner.run()
+    final = channel.latest()
+    assert final.finished and final.steps == planner.steps == len(planner.tree) + len(planner.end_tree) - 2
+    assert np.array_equal(final.positions, planner.tree.positions)
+    assert np.array_equal(final.end_positions, planner.end_tree.positions)
+    assert np.array_equal(final.end_edges, planner.end_tree.export()[1])
+
+
+if __name__ == '__main__':
+    test_channel_hands_over_private_copies()
+    test_stop_from_another_thread()
+    test_rrt_connect_publishes_both_trees()
@@ -0,0 +1,56 @@
+import numpy as np
+
+from path_planning.config import RrtConfig
+from path_planning.obstacle import Obstacle
+from path_planning.planner import make_planner
+from path_planning.storage import PlanRecorder, PlanStore, config_to_dict, load_npz, save_npz
+
+
+def test_recorded_plan_roundtrip(tmp_path):
+    cfg = RrtConfig(max_steps=600, algorithm='rrt_star', refine_steps=200, map_resolution=1.0)
+    store = PlanStore.create(str(tmp_path / 'plan'), cfg, make_planner(cfg).obstacle_map)
+    planner = make_planner(cfg, seed=1, observers=[PlanRecorder(store, every_n_steps=50)])
+    planner.step()
+    planner.update_obstacles(added=[Obstacle(20, 20, 10, 10)])
+    result = planner.run()
+
+    stored = PlanStore.open(str(tmp_path / 'plan')).load()
+    assert stored.complete and isinstance(stored.result.positions, np.memmap)
+    assert config_to_dict(stored.cfg) == config_to_dict(cfg)
+    assert len(stored.obstacle_map.obstacles) == len(planner.obstacle_map.obstacles)
+    assert np.array_equal(stored.obstacle_map.occupancy, planner.obstacle_map.occupancy)
+    for name in ('path', 'positions', 'parents', 'costs'):
+        assert np.array_equal(getattr(stored.result, name), getattr(result, name))
+    assert stored.result.path_length == result.path_length and stored.result.steps == result.steps
+
+    save_npz(str(tmp_path / 'plan.npz'), cfg, planner.obstacle_map, result)
+    archived = load_npz(str(tmp_path / 'plan.npz'))
+    assert config_to_dict(archived.cfg) == config_to_dict(cfg)
+    assert np.array_equal(archived.result.parents, result.parents)
+
+    # A warm started planner keeps the tree and its solution
+    warm = make_planner(cfg, stored.obstacle_map, seed=2)
+    warm.warm_start(stored.tree())
+    assert warm.goal_index is not None
+    assert warm.run().path_length <= result.path_length
+
+
+def test_truncated_appends_stay_consistent(tmp_path):
+    cfg = RrtConfig()
+    store = PlanStore.create(str(tmp_path), cfg, make_planner(cfg).obstacle_map)
+    store.append_vertices(np.zeros((3, 2)), np.array([-1, 0, 1]), np.arange(3.0))
+    store.truncate(2)
+    store.append_vertices(np.ones((1, 2)), np.array([0]), np.array([5.0]))
+    store.write_vertices(1, parents=np.array([0, 1]))
+    reopened = PlanStore.open(str(tmp_path))
+    assert len(reopened) == 3 and not reopened.complete
+    assert reopened.vertex_array('parents').tolist() == [-1, 0, 1]
+    assert reopened.vertex_array('costs').tolist() == [0.0, 1.0, 5.0]
+
+
+if __name__ == '__main__':
+    import pathlib
+    import tempfile
+    with tempfile.TemporaryDirectory() as directory:
+        test_recorded_plan_roundtrip(pathlib.Path(directory) / 'roundtrip')
+        test_truncated_appends_stay_consistent(pathlib.Path(directory) / 'appends')
@@ -1,4 +1,6 @@
-from path_planning.tree import Node, Pose
+import numpy as np
+
+from path_planning.tree import Node, Pose, Tree
 
 
 def test_traversal():
@@ -10,5 +12,44 @@ def test_traversal():
         print(node)
 
 
+def test_array_tree():
+    tree = Tree(Pose(1, 1), capacity=2)
+    a = tree.add(Pose(4, 5), parent=0)
+    b = tree.add(Pose(4, 8), parent=a)
+    c = tree.add(Pose(0, 1), parent=0)
+    assert len(tree) == 4 and tree.capacity >= 4
+    assert np.allclose(tree.costs, [0, 5, 8, 1])
+    assert tree.node(b).parent == tree.node(a)
+    assert tree.root.parent is None
+    assert [node.index for node in tree.root.children] == [a, c]
+    assert [node.index for node in tree.node(a).traverse()] == [a, b]
+    assert tree.root.num_elements() == 4
+    assert np.allclose(tree.node(a).to_array(), [[4, 5], [4, 8]])
+    assert tree.root.adjacency_nodes().tolist() == [[0, 1], [1, 2], [0, 3]]
+    assert tree.path_to_root(b).tolist() == [b, a, 0]
+    tree.set_parent(b, c)
+    positions, edges = tree.export()
+    assert np.shares_memory(positions, tree.positions) and edges.tolist() == [[0, 1], [3, 2], [0, 3]]
+    assert np.allclose(tree.costs, [0, 5, 1 + np.hypot(4, 7), 1])
+    d = tree.add(Pose(4, 9), parent=a)
+    assert tree.remove_subtrees([c]).tolist() == [0, a, -1, -1, 2] and d == 4
+    assert len(tree) == 3 and tree.edges.tolist() == [[0, 1], [1, 2]] and np.allclose(tree.costs, [0, 5, 9])
+    assert tree.children_of(0).tolist() == [1] and tree.children_of(1).tolist() == [2]
+    assert tree.add(Pose(1, 2), parent=0) == 3 and tree.children_of(0).tolist() == [1, 3]
+
+
+def test_legacy_adjacency():
+    root = Node(Pose(1, 1))
+    for pose in (Pose(2, 2), Pose(3, 3)):
+        child = Node(pose, parent=root)
+        root.children.append(child)
+    grandchild = Node(Pose(4, 4), parent=root.children[0])
+    root.children[0].children.append(grandchild)
+    assert root.adjacency_nodes().tolist() == [[0, 1], [1, 2], [0, 3]]
+    assert root.to_array().tolist() == [[1, 1], [2, 2], [4, 4], [3, 3]]
+
+
 if __name__ == '__main__':
-    test_traversal()
\ No newline at end of file
+    test_traversal()
+    test_array_tree()
+    test_legacy_adjacency()
\ No newline at end of file
@@ -0,0 +1,97 @@
+import matplotlib
+matplotlib.use('Agg')
+
+import numpy as np
+
+from path_planning.config import RrtConfig
+from path_planning.tree import Pose, Tree
+from path_planning.visualization import TreeRenderer, init_plot
+
+CHUNK_SIZE = 8
+
+
+def assert_frozen_chunks_match(renderer: TreeRenderer, tree: Tree, tree_idx: int = 0):
+    positions, edges = tree.export()
+    for chunk_idx, (edge_artist, node_artist) in enumerate(renderer._trees[tree_idx].frozen):
+        start, stop = chunk_idx * CHUNK_SIZE, (chunk_idx + 1) * CHUNK_SIZE
+        chunk_edges = edges[max(start - 1, 0):stop - 1]
+        expected = np.stack([positions[chunk_edges[:, 0]], positions[chunk_edges[:, 1]]], axis=1)
+        assert np.array_equal(np.array(edge_artist.get_segments()).reshape(-1, 2, 2), expected)
+        assert np.array_equal(node_artist.get_offsets(), positions[start:stop])
+
+
+def counting_renderer(**kwargs) -> tuple[TreeRenderer, list[int]]:
+    """Renderer whose chunk fills are recorded by their first node."""
+    cfg = RrtConfig()
+    renderer = TreeRenderer(init_plot(cfg), cfg, chunk_size=CHUNK_SIZE, **kwargs)
+    fills = []
+    fill_chunk = renderer._fill_chunk
+
+    def recording_fill_chunk(chunk, positions, edges, start, stop, segments=None):
+        fills.append(start)
+        return fill_chunk(chunk, positions, edges, start, stop, segments)
+
+    renderer._fill_chunk = recording_fill_chunk
+    return renderer, fills
+
+
+def test_renderer_freezes_chunks_and_refills_only_changed_ones():
+    tree = Tree(Pose(0, 0), capacity=64)
+    for idx in range(1, 21):
+        tree.add(Pose(idx, idx % 3), parent=idx - 1)
+    renderer, fills = counting_renderer()
+    assert renderer.update(tree)
+    assert len(renderer._trees[0].frozen) == 2 and renderer._trees[0].start == 16
+    assert_frozen_chunks_match(renderer, tree)
+
+    # Re-parenting a vertex of the second chunk refills that chunk only, the open chunk is always refilled
+    fills.clear()
+    tree.set_parent(10, 0)
+    renderer.update(tree, rebuild=True, force=True)
+    assert fills == [8, 16]
+    assert_frozen_chunks_match(renderer, tree)
+
+    fills.clear()
+    renderer.update(tree, rebuild=True, force=True)
+    assert fills == [16]
+
+    # Removing vertices of the open chunk leaves the frozen ones alone
+    fills.clear()
+    tree.remove_subtrees([20])
+    renderer.update(tree, rebuild=True, force=True)
+    assert fills == [16] and len(renderer._trees[0].frozen) == 2
+
+    # Losing frozen vertices starts over
+    tree.remove_subtrees([12])
+    renderer.update(tree, rebuild=True, force=True)
+    assert len(tree) == 12 and len(renderer._trees[0].frozen) == 1 and renderer._trees[0].start == 8
+    assert_frozen_chunks_match(renderer, tree)
+
+
+def test_renderer_draws_the_end_tree_in_its_own_chunks():
+    tree, end_tree = Tree(Pose(0, 0), capacity=16), Tree(Pose(50, 50), capacity=16)
+    for idx in range(1, 10):
+        tree.add(Pose(idx, 0), parent=idx - 1)
+    for idx in range(1, 12):
+        end_tree.add(Pose(50 - idx, 50), parent=idx - 1)
+    renderer, _ = counting_renderer()
+    renderer.update(tree, end_tree=end_tree)
+    assert [len(chunks.frozen) for chunks in renderer._trees] == [1, 1]
+    assert_frozen_chunks_match(renderer, tree)
+    assert_frozen_chunks_match(renderer, end_tree, tree_idx=1)
+    assert np.array_equal(renderer._trees[1].nodes.get_offsets(), end_tree.positions[8:])
+
+
+def test_renderer_throttles_frames():
+    tree = Tree(Pose(0, 0), capacity=4)
+    renderer, _ = counting_renderer(max_fps=1)
+    assert renderer.update(tree)
+    tree.add(Pose(1, 1), parent=0)
+    assert not renderer.update(tree)
+    assert renderer.update(tree, force=True)
+
+
+if __name__ == '__main__':
+    test_renderer_freezes_chunks_and_refills_only_changed_ones()
+    test_renderer_draws_the_end_tree_in_its_own_chunks()
+    test_renderer_throttles_frames()
@@ -3,7 +3,7 @@ from dataclasses import dataclass
 
 import numpy as np
 
-from typing import Generator
+from typing import Generator, Optional
 
 
 @dataclass
@@ -51,22 +51,306 @@ class Node:
         return sum(1 for _ in self.traverse())
 
     def to_array(self) -> np.ndarray:
-        n_nodes = self.num_elements()
-        array = np.empty((n_nodes, 2))
-        for idx, node in enumerate(self.traverse()):
-            array[idx][0] = node.pose.x
-            array[idx][1] = node.pose.y
-        return array
+        return np.array([(node.pose.x, node.pose.y) for node in self.traverse()], dtype=float).reshape(-1, 2)
 
     def adjacency_nodes(self) -> np.ndarray:
-        adjacency_list = []  # [idx1, idx2] for adjacent nodes with indices idx1 and idx2
-        for idx1, node1 in enumerate(self.traverse()):
-            for idx2, node2 in enumerate(self.traverse()):
-                if node1 is node2.parent:
-                    adjacency_list.append([idx1, idx2])
+        """[idx1, idx2] for every parent with traversal index idx1 and its child with traversal index idx2."""
+        traversal_index = {}
+        adjacency_list = []
+        for idx, node in enumerate(self.traverse()):
+            traversal_index[id(node)] = idx
+            if node is not self and node.parent is not None and id(node.parent) in traversal_index:
+                adjacency_list.append([traversal_index[id(node.parent)], idx])
         return np.array(adjacency_list)
 
     def __str__(self) -> str:
         kids_str = ', '.join([f'Node({kid.pose})' for kid in self.children])
         parent_str = 'None' if self.parent is None else f'Node({self.parent.pose})'
         return f'Node({self.pose}), children: [{kids_str}], parent: {parent_str})'
+
+
+class Tree:
+    """Array backed tree storage. Every vertex is a row in preallocated numpy arrays holding its position, the index
+    of its parent (-1 for the root) and its cost-to-come from the root. Children are kept as intrusive doubly linked
+    lists (first child, next and previous sibling, -1 terminated) so subtrees can be walked and vertices re-parented
+    without scanning the whole tree. The edge list is maintained alongside, row i - 1 holds (parent, i) for vertex i,
+    so exporting the graph never has to walk the tree. Arrays grow by doubling their capacity."""
+    __slots__ = ('_positions', '_parents', '_costs', '_edges', '_first_child', '_next_sibling', '_prev_sibling',
+                 '_size')
+    _ARRAYS = ('_positions', '_parents', '_costs', '_edges', '_first_child', '_next_sibling', '_prev_sibling')
+
+    def __init__(self, root_pose: Pose, capacity: int = 1024) -> None:
+        capacity = max(capacity, 1)
+        self._positions = np.empty((capacity, 2))
+        self._parents = np.empty(capacity, dtype=np.int64)
+        self._costs = np.empty(capacity)
+        self._edges = np.empty((capacity, 2), dtype=np.int64)
+        self._first_child = np.empty(capacity, dtype=np.int64)
+        self._next_sibling = np.empty(capacity, dtype=np.int64)
+        self._prev_sibling = np.empty(capacity, dtype=np.int64)
+        self._size = 0
+        self._append(root_pose.x, root_pose.y, -1, 0.0)
+
+    @classmethod
+    def from_arrays(cls, positions: np.ndarray, parents: np.ndarray, costs: np.ndarray,
+                    capacity: int = None) -> 'Tree':
+        """Tree holding copies of exported arrays, e.g. loaded from disk. Vertex 0 has to be the root."""
+        n = len(positions)
+        if n == 0 or parents[0] != -1:
+            raise ValueError('Tree arrays have to start with the root vertex.')
+        tree = cls(Pose(*positions[0]), capacity=max(n, capacity or 0))
+        tree._positions[:n] = positions
+        tree._parents[:n] = parents
+        tree._costs[:n] = costs
+        tree._size = n
+        tree._rebuild_links()
+        return tree
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        return len(self._parents)
+
+    @property
+    def positions(self) -> np.ndarray:
+        """View on the (n, 2) array of vertex positions."""
+        return self._positions[:self._size]
+
+    @property
+    def x(self) -> np.ndarray:
+        return self._positions[:self._size, 0]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self._positions[:self._size, 1]
+
+    @property
+    def parents(self) -> np.ndarray:
+        """View on the parent indices, the root has parent -1."""
+        return self._parents[:self._size]
+
+    @property
+    def costs(self) -> np.ndarray:
+        """View on the cost-to-come (path length from the root) of every vertex."""
+        return self._costs[:self._size]
+
+    @property
+    def edges(self) -> np.ndarray:
+        """View on the (n - 1, 2) array of (parent index, child index) pairs."""
+        return self._edges[:max(self._size - 1, 0)]
+
+    def export(self) -> tuple[np.ndarray, np.ndarray]:
+        """Return (positions, edges) as views without copying, they are only valid until the next insertion."""
+        return self.positions, self.edges
+
+    @property
+    def root(self) -> 'TreeNode':
+        return TreeNode(self, 0)
+
+    def node(self, index: int) -> 'TreeNode':
+        if not 0 <= index < self._size:
+            raise IndexError(f'Tree has no node with index {index}.')
+        return TreeNode(self, index)
+
+    def add(self, pose: Pose, parent: int) -> int:
+        """Insert a new vertex connected to the vertex with index parent and return the index of the new vertex."""
+        parent_x, parent_y = self._positions[parent]
+        cost = self._costs[parent] + math.sqrt((pose.x - parent_x) ** 2 + (pose.y - parent_y) ** 2)
+        return self._append(pose.x, pose.y, parent, cost)
+
+    def set_parent(self, index: int, parent: int) -> None:
+        """Re-connect the vertex to a new parent. The cost-to-come of the vertex and all its descendants is updated,
+        the caller has to make sure parent is not part of the subtree of the vertex."""
+        self._unlink(index)
+        self._link(index, parent)
+        parent_x, parent_y = self._positions[parent]
+        x, y = self._positions[index]
+        delta = self._costs[parent] + math.sqrt((x - parent_x) ** 2 + (y - parent_y) ** 2) - self._costs[index]
+        self._costs[self.subtree(index)] += delta
+
+    def children_of(self, index: int) -> np.ndarray:
+        children = []
+        child = self._first_child[index]
+        while child != -1:
+            children.append(child)
+            child = self._next_sibling[child]
+        return np.sort(np.array(children, dtype=np.int64))
+
+    def subtree(self, index: int) -> np.ndarray:
+        """Indices of the vertex and all its descendants, the vertex itself comes first. For the root this is simply
+        every vertex in insertion order."""
+        if index == 0:
+            return np.arange(self._size)
+        first_child, next_sibling = self._first_child, self._next_sibling
+        indices = [index]
+        stack = [first_child[index]]
+        while stack:
+            idx = stack.pop()
+            if idx == -1:
+                continue
+            indices.append(idx)
+            stack.append(next_sibling[idx])
+            stack.append(first_child[idx])
+        return np.array(indices, dtype=np.int64)
+
+    def path_to_root(self, index: int) -> np.ndarray:
+        """Indices of all vertices from the vertex with the given index back to the root."""
+        path = []
+        while index != -1:
+            path.append(index)
+            index = self._parents[index]
+        return np.array(path, dtype=np.int64)
+
+    def remove_subtrees(self, indices) -> np.ndarray:
+        """Remove the vertices with the given indices together with all their descendants and compact the storage.
+        Remaining vertices keep their order, parents and costs but may get new indices, TreeNode views taken before
+        are invalid afterwards. Return the map from old to new indices, -1 for removed vertices."""
+        removed = np.zeros(self._size, dtype=bool)
+        for index in np.unique(np.asarray(indices, dtype=np.int64)):
+            if index == 0:
+                raise ValueError('The root of a tree can not be removed.')
+            if not removed[index]:
+                removed[self.subtree(index)] = True
+        keep = ~removed
+        new_index = np.where(keep, np.cumsum(keep) - 1, -1)
+        n_kept = int(keep.sum())
+        parents = self._parents[:self._size][keep]
+        self._positions[:n_kept] = self._positions[:self._size][keep]
+        self._costs[:n_kept] = self._costs[:self._size][keep]
+        # Ancestors of kept vertices are kept as well, so only the root maps to -1
+        self._parents[:n_kept] = np.where(parents >= 0, new_index[parents], -1)
+        self._size = n_kept
+        self._rebuild_links()
+        return new_index
+
+    def _rebuild_links(self) -> None:
+        """Recreate the child lists and the edge list from the parent indices, vectorized."""
+        n = self._size
+        parents = self._parents[:n]
+        self._first_child[:n] = -1
+        self._next_sibling[:n] = -1
+        self._prev_sibling[:n] = -1
+        children = np.flatnonzero(parents >= 0)
+        children = children[np.argsort(parents[children], kind='stable')]
+        child_parents = parents[children]
+        same_parent = child_parents[1:] == child_parents[:-1]
+        self._next_sibling[children[:-1]] = np.where(same_parent, children[1:], -1)
+        self._prev_sibling[children[1:]] = np.where(same_parent, children[:-1], -1)
+        first = np.concatenate([[True], ~same_parent])[:len(children)]
+        self._first_child[child_parents[first]] = children[first]
+        self._edges[:max(n - 1, 0), 0] = parents[1:]
+        self._edges[:max(n - 1, 0), 1] = np.arange(1, n)
+
+    def extract_path(self, index: int) -> np.ndarray:
+        """Waypoints of shape (n, 2) from the root to the vertex with the given index."""
+        return self._positions[self.path_to_root(index)[::-1]]
+
+    def _append(self, x: float, y: float, parent: int, cost: float) -> int:
+        if self._size == self.capacity:
+            self._grow(2 * self.capacity)
+        idx = self._size
+        self._positions[idx] = x, y
+        self._costs[idx] = cost
+        self._first_child[idx] = -1
+        self._link(idx, parent)
+        self._size += 1
+        return idx
+
+    def _link(self, index: int, parent: int) -> None:
+        """Prepend the vertex to the child list of parent."""
+        self._parents[index] = parent
+        self._prev_sibling[index] = -1
+        if index > 0:
+            self._edges[index - 1] = parent, index
+        if parent == -1:
+            self._next_sibling[index] = -1
+            return
+        first = self._first_child[parent]
+        self._next_sibling[index] = first
+        if first != -1:
+            self._prev_sibling[first] = index
+        self._first_child[parent] = index
+
+    def _unlink(self, index: int) -> None:
+        """Remove the vertex from the child list of its parent."""
+        prev, next_ = self._prev_sibling[index], self._next_sibling[index]
+        if prev != -1:
+            self._next_sibling[prev] = next_
+        elif self._parents[index] != -1:
+            self._first_child[self._parents[index]] = next_
+        if next_ != -1:
+            self._prev_sibling[next_] = prev
+
+    def _grow(self, capacity: int) -> None:
+        for name in self._ARRAYS:
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+
+class TreeNode:
+    """Lightweight Node compatible view on a single vertex of a Tree. Views are created on demand and only hold the
+    tree and the vertex index, two views on the same vertex compare equal."""
+    __slots__ = ('tree', 'index')
+
+    def __init__(self, tree: Tree, index: int) -> None:
+        self.tree = tree
+        self.index = index
+
+    @property
+    def pose(self) -> Pose:
+        x, y = self.tree.positions[self.index]
+        return Pose(float(x), float(y))
+
+    @property
+    def cost(self) -> float:
+        return float(self.tree.costs[self.index])
+
+    @property
+    def parent(self) -> Optional['TreeNode']:
+        parent = self.tree.parents[self.index]
+        return None if parent < 0 else TreeNode(self.tree, int(parent))
+
+    @property
+    def children(self) -> list['TreeNode']:
+        return [TreeNode(self.tree, int(idx)) for idx in self.tree.children_of(self.index)]
+
+    def traverse(self) -> Generator['TreeNode', None, None]:
+        for idx in self.tree.subtree(self.index):
+            yield TreeNode(self.tree, int(idx))
+
+    def distance_to(self, other) -> float:
+        return self.pose.distance_to(other.pose)
+
+    def num_elements(self) -> int:
+        return len(self.tree.subtree(self.index))
+
+    def to_array(self) -> np.ndarray:
+        if self.index == 0:
+            return self.tree.positions
+        return self.tree.positions[self.tree.subtree(self.index)]
+
+    def adjacency_nodes(self) -> np.ndarray:
+        if self.index == 0:
+            return self.tree.edges
+        subtree = self.tree.subtree(self.index)
+        # Map tree indices to positions in the traversal order of this subtree
+        order = np.full(len(self.tree), -1, dtype=np.int64)
+        order[subtree] = np.arange(len(subtree))
+        children = subtree[1:]
+        return np.column_stack((order[self.tree.parents[children]], order[children]))
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, TreeNode) and self.tree is other.tree and self.index == other.index
+
+    def __hash__(self) -> int:
+        return hash((id(self.tree), self.index))
+
+    def __str__(self) -> str:
+        kids_str = ', '.join([f'Node({kid.pose})' for kid in self.children])
+        parent = self.parent
+        parent_str = 'None' if parent is None else f'Node({parent.pose})'
+        return f'Node({self.pose}), children: [{kids_str}], parent: {parent_str})'
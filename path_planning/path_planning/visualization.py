@@ -1,10 +1,13 @@
 import time
 
 from matplotlib import pyplot as plt, patches as patches
+from matplotlib.collections import LineCollection
+import numpy as np
 
 from path_planning.config import RrtConfig
-from path_planning.tree import Node
+from path_planning.tree import Node, Tree, TreeNode
 from path_planning.obstacle import Obstacle
+from path_planning.planner import PlannerObserver, PlanningResult, RrtPlanner
 
 
 def init_plot(cfg: RrtConfig) -> plt.Axes:
@@ -33,25 +36,21 @@ def plot_tree(ax, rr_tree: Node, grid_size: int, start: Node, end: Node,
     ax.set_aspect('equal')
     ax.grid()
 
-    nodes = []
-    connections = []
-    for node in rr_tree.traverse():
-        nodes.append(node)
-        for child in node.children:
-            x1, y1 = node.pose.x, node.pose.y
-            x2, y2 = child.pose.x, child.pose.y
-            connections.append([[x1, x2], [y1, y2]])
+    positions = rr_tree.to_array()
+    adjacency = rr_tree.adjacency_nodes()
 
     # Draw connections to children
-    for connection in connections:
-        ax.plot(connection[0], connection[1], 'k--', linewidth=0.5, zorder=8)
+    for parent_idx, child_idx in adjacency:
+        x1, y1 = positions[parent_idx]
+        x2, y2 = positions[child_idx]
+        ax.plot([x1, x2], [y1, y2], 'k--', linewidth=0.5, zorder=8)
     # Draw the nodes themselves
-    x_nodes = [node.pose.x for node in nodes]
-    y_nodes = [node.pose.y for node in nodes]
+    x_nodes = positions[:, 0]
+    y_nodes = positions[:, 1]
     if fast_plot:  # use plt.plot instead of plt.scatter which is super slow
         ax.plot(x_nodes, y_nodes, 'b.', zorder=10)
     else:
-        colors = [end.distance_to(node) for node in nodes]
+        colors = np.hypot(x_nodes - end.pose.x, y_nodes - end.pose.y)
         ax.scatter(x_nodes, y_nodes, c=colors, s=15, vmin=0, vmax=90, zorder=10)
     ax.scatter([start.pose.x], [start.pose.y], c='red', s=60, zorder=11)
     ax.scatter([end.pose.x], [end.pose.y], c='green', s=100, zorder=11)
@@ -67,3 +66,219 @@ def plot_tree(ax, rr_tree: Node, grid_size: int, start: Node, end: Node,
     plt.draw()
     plt.pause(1e-17)
     ax.clear()
+
+
+class _TreeChunks:
+    """Artists of one tree drawn by a TreeRenderer. Full chunks are frozen, the open chunk shows the newest nodes."""
+
+    def __init__(self, edges: LineCollection, nodes: plt.Artist) -> None:
+        self.frozen: list[tuple[LineCollection, plt.Artist]] = []
+        self.frozen_segments: list[np.ndarray] = []  # segments shown by each frozen chunk
+        self.start = 0  # first node of the open chunk
+        self.edges, self.nodes = edges, nodes
+
+    def artists(self) -> list[plt.Artist]:
+        return [artist for chunk in self.frozen for artist in chunk] + [self.edges, self.nodes]
+
+
+class TreeRenderer:
+    """Incremental matplotlib renderer for a growing Tree, or the two trees of RRT-Connect. Obstacles, start and end
+    are drawn once. Nodes and edges are drawn in chunks of chunk_size nodes, each chunk being one scatter plus one
+    LineCollection. Only the newest chunk of a tree is updated per frame, full chunks are frozen, so the work per
+    frame does not grow with the tree.
+
+    With blit=True frozen chunks are baked into the cached background and a frame only redraws the newest chunks and
+    the path. Frames requested faster than max_fps are skipped."""
+
+    def __init__(self, ax: plt.Axes, cfg: RrtConfig, obstacles: list[Obstacle] = None, blit: bool = False,
+                 max_fps: float = None, chunk_size: int = 1024) -> None:
+        self.ax = ax
+        self.cfg = cfg
+        self.blit = blit
+        self.chunk_size = chunk_size
+        self.min_frame_interval = 1.0 / max_fps if max_fps else 0.0
+        self._last_frame_time = -np.inf
+        self._clean_background = None  # everything except the trees
+        self._background = None  # clean background plus all frozen chunks
+        self._obstacle_patches: list[patches.Rectangle] = []
+
+        self._add_obstacles(obstacles if obstacles is not None else [])
+        ax.scatter([cfg.start_node.pose.x], [cfg.start_node.pose.y], c='red', s=60, zorder=11)
+        ax.scatter([cfg.end_node.pose.x], [cfg.end_node.pose.y], c='green', s=100, zorder=11)
+        self.path, = ax.plot([], [], 'r-', zorder=12, animated=blit)
+        self._trees = [_TreeChunks(*self._new_chunk())]
+        ax.figure.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _add_obstacles(self, obstacles: list[Obstacle]) -> None:
+        for obs in obstacles:
+            self._obstacle_patches.append(self.ax.add_patch(patches.Rectangle(
+                (obs.x, obs.y), obs.width, obs.height, linewidth=1, edgecolor='none', facecolor='gray')))
+
+    def set_obstacles(self, obstacles: list[Obstacle]) -> None:
+        """Replace the drawn obstacles, which needs one full redraw of the figure."""
+        for patch in self._obstacle_patches:
+            patch.remove()
+        self._obstacle_patches = []
+        self._add_obstacles(obstacles)
+        self.ax.figure.canvas.draw()
+
+    def _new_chunk(self) -> tuple[LineCollection, plt.Artist]:
+        edges = LineCollection([], colors='k', linestyles='--', linewidths=0.5, zorder=8, animated=self.blit)
+        self.ax.add_collection(edges)
+        if self.cfg.fast_plot:
+            nodes = self.ax.scatter([], [], c='b', s=4, zorder=10, animated=self.blit)
+        else:
+            nodes = self.ax.scatter([], [], c=[], s=15, vmin=0, vmax=90, zorder=10, animated=self.blit)
+        return edges, nodes
+
+    @staticmethod
+    def _chunk_segments(positions: np.ndarray, edges: np.ndarray, start: int, stop: int) -> np.ndarray:
+        """Edges connecting the nodes start to stop to their parents as (n, 2, 2) array of segments."""
+        # Node i is the child of edge row i - 1
+        chunk_edges = edges[max(start - 1, 0):stop - 1]
+        return np.stack([positions[chunk_edges[:, 0]], positions[chunk_edges[:, 1]]], axis=1)
+
+    def _fill_chunk(self, chunk: tuple[LineCollection, plt.Artist], positions: np.ndarray, edges: np.ndarray,
+                    start: int, stop: int, segments: np.ndarray = None) -> np.ndarray:
+        """Show the nodes start to stop and the edges connecting them to their parents in the given chunk. Return
+        the segments shown."""
+        edge_artist, node_artist = chunk
+        if segments is None:
+            segments = self._chunk_segments(positions, edges, start, stop)
+        edge_artist.set_segments(segments)
+        node_artist.set_offsets(positions[start:stop])
+        if not self.cfg.fast_plot:
+            node_artist.set_array(np.hypot(positions[start:stop, 0] - self.cfg.end_node.pose.x,
+                                           positions[start:stop, 1] - self.cfg.end_node.pose.y))
+        return segments
+
+    def _bake_frozen(self, chunks: list[tuple[LineCollection, plt.Artist]], background) -> None:
+        """Draw frozen chunks on top of the given background and cache the result as new background."""
+        canvas = self.ax.figure.canvas
+        canvas.restore_region(background)
+        for edge_artist, node_artist in chunks:
+            self.ax.draw_artist(edge_artist)
+            self.ax.draw_artist(node_artist)
+        self._background = canvas.copy_from_bbox(self.ax.bbox)
+
+    def _frozen(self) -> list[tuple[LineCollection, plt.Artist]]:
+        return [chunk for chunks in self._trees for chunk in chunks.frozen]
+
+    def _open_artists(self) -> list[plt.Artist]:
+        return [artist for chunks in self._trees for artist in (chunks.edges, chunks.nodes)] + [self.path]
+
+    def _on_draw(self, event) -> None:
+        # The figure was fully redrawn (first frame, resize, zoom) without the animated artists, recache backgrounds
+        if self.blit:
+            self._clean_background = self.ax.figure.canvas.copy_from_bbox(self.ax.bbox)
+            self._bake_frozen(self._frozen(), self._clean_background)
+            for artist in self._open_artists():
+                self.ax.draw_artist(artist)
+
+    def update(self, tree: Tree, rebuild: bool = False, force: bool = False, end_tree: Tree = None) -> bool:
+        """Bring the artists up to date with the tree, and the end tree of RRT-Connect if given, and draw a frame
+        unless it is skipped. Frozen chunks are only touched with rebuild=True, which is needed after vertices were
+        re-parented (RRT*) or removed. Then the segments of every frozen chunk are recomputed and compared, which is
+        cheap array work, but only chunks whose segments changed are refilled. With blit all frozen chunks are baked
+        again if any of them changed. Return whether a frame was drawn."""
+        now = time.perf_counter()
+        if not force and now - self._last_frame_time < self.min_frame_interval:
+            return False
+        self._last_frame_time = now
+
+        trees = [tree] if end_tree is None else [tree, end_tree]
+        while len(self._trees) < len(trees):
+            self._trees.append(_TreeChunks(*self._new_chunk()))
+        changed = False
+        for tree_idx, drawn_tree in enumerate(trees):
+            changed |= self._update_chunks(tree_idx, drawn_tree, rebuild)
+        if changed and self.blit and self._clean_background is not None:
+            self._bake_frozen(self._frozen(), self._clean_background)
+        self.draw()
+        return True
+
+    def _update_chunks(self, tree_idx: int, tree: Tree, rebuild: bool) -> bool:
+        """Update the chunks of one tree, return whether frozen chunks were refilled or dropped."""
+        chunks = self._trees[tree_idx]
+        positions, edges = tree.export()
+        changed = False
+        if rebuild and len(positions) < chunks.start:
+            # The tree lost vertices, start over with a single chunk which is frozen again below as needed
+            for artist in chunks.artists():
+                artist.remove()
+            chunks = self._trees[tree_idx] = _TreeChunks(*self._new_chunk())
+            changed = True
+        if rebuild:
+            for chunk_idx, chunk in enumerate(chunks.frozen):
+                start, stop = chunk_idx * self.chunk_size, (chunk_idx + 1) * self.chunk_size
+                segments = self._chunk_segments(positions, edges, start, stop)
+                if not np.array_equal(segments, chunks.frozen_segments[chunk_idx]):
+                    chunks.frozen_segments[chunk_idx] = self._fill_chunk(chunk, positions, edges, start, stop,
+                                                                         segments)
+                    changed = True
+        while len(positions) - chunks.start >= self.chunk_size:
+            chunk_stop = chunks.start + self.chunk_size
+            chunks.frozen_segments.append(self._fill_chunk((chunks.edges, chunks.nodes), positions, edges,
+                                                           chunks.start, chunk_stop))
+            chunks.frozen.append((chunks.edges, chunks.nodes))
+            if self.blit and self._background is not None and not changed:
+                self._bake_frozen(chunks.frozen[-1:], self._background)
+            chunks.edges, chunks.nodes = self._new_chunk()
+            chunks.start = chunk_stop
+        self._fill_chunk((chunks.edges, chunks.nodes), positions, edges, chunks.start, len(positions))
+        return changed
+
+    def draw_path(self, path: np.ndarray) -> None:
+        """Show a path given as (k, 2) array of waypoints."""
+        self.path.set_data(path[:, 0], path[:, 1])
+        self.draw()
+
+    def draw(self) -> None:
+        canvas = self.ax.figure.canvas
+        if self.blit and self._background is not None:
+            canvas.restore_region(self._background)
+            for artist in self._open_artists():
+                self.ax.draw_artist(artist)
+            canvas.blit(self.ax.bbox)
+        else:
+            canvas.draw_idle()
+        canvas.flush_events()
+
+
+class PlotObserver(PlannerObserver):
+    """Render the tree of a running RrtPlanner, both trees for RRT-Connect, every every_n_steps inserted nodes and the
+    final path when it finishes. The figure is only created on first use, the remaining arguments are passed to the
+    TreeRenderer."""
+
+    def __init__(self, cfg: RrtConfig, every_n_steps: int = 1, blit: bool = False, max_fps: float = None) -> None:
+        self.cfg = cfg
+        self.every_n_steps = every_n_steps
+        self.blit = blit
+        self.max_fps = max_fps
+        self.renderer = None
+
+    def _renderer(self, planner: RrtPlanner) -> TreeRenderer:
+        if self.renderer is None:
+            self.renderer = TreeRenderer(init_plot(self.cfg), self.cfg, planner.obstacle_map.obstacles,
+                                         blit=self.blit, max_fps=self.max_fps)
+            plt.show(block=False)
+        return self.renderer
+
+    def on_step(self, planner: RrtPlanner, new_node: TreeNode) -> None:
+        if planner.steps % self.every_n_steps == 0:
+            start = planner.profiler.start()
+            self._renderer(planner).update(planner.tree, rebuild=self.cfg.algorithm == 'rrt_star',
+                                           end_tree=getattr(planner, 'end_tree', None))
+            planner.profiler.stop('render', start)
+
+    def on_obstacles_changed(self, planner: RrtPlanner, removed_nodes: int) -> None:
+        renderer = self._renderer(planner)
+        renderer.set_obstacles(planner.obstacle_map.obstacles)
+        renderer.update(planner.tree, rebuild=True, force=True, end_tree=getattr(planner, 'end_tree', None))
+
+    def on_finish(self, planner: RrtPlanner, result: PlanningResult) -> None:
+        renderer = self._renderer(planner)
+        renderer.update(planner.tree, rebuild=self.cfg.algorithm == 'rrt_star', force=True,
+                        end_tree=getattr(planner, 'end_tree', None))
+        if result.success:
+            renderer.draw_path(result.path)
@@ -0,0 +1,152 @@
+import numpy as np
+
+from pid_controller.controller import Controller, ErrorSignal, Gain, System
+
+from typing import Generator, Sequence, Tuple
+
+
+def _channels(*values, n_channels: int = None) -> list:
+    """Broadcast scalars and per-channel sequences to float arrays of one common shape (n_channels,), n_channels
+    is needed if all values are scalars."""
+    arrays = [np.atleast_1d(np.asarray(value, dtype=float)) for value in values]
+    if n_channels is not None:
+        arrays.append(np.empty(n_channels))
+    arrays = np.broadcast_arrays(*arrays)[:len(values)]
+    if arrays[0].ndim != 1:
+        raise ValueError(f'Channel parameters have to be one dimensional, got shape {arrays[0].shape}.')
+    # Copies, broadcast views are read only and share memory between channels
+    return [array.copy() for array in arrays]
+
+
+class PidControllerBank(Controller):
+    """n independent PID controllers, one per channel, with gains, integrals and limits held as arrays of shape
+    (n,). apply takes an ErrorSignal of arrays and updates all channels with a few in-place array operations, the
+    result of PidController.apply per channel. Each channel has its own integral_limit against windup and
+    output_limit."""
+
+    def __init__(self, proportional: Sequence[float] = 0.0, differential: Sequence[float] = 0.0,
+                 integral: Sequence[float] = 0.0, integral_limit: Sequence[float] = 50.0,
+                 output_limit: Sequence[float] = 50.0, n_channels: int = None) -> None:
+        super().__init__(Gain())
+        self.proportional, self.differential, self.integral_gain, self.integral_limit, self.output_limit = \
+            _channels(proportional, differential, integral, integral_limit, output_limit, n_channels=n_channels)
+        if (self.integral_limit < 0).any() or (self.output_limit < 0).any():
+            raise ValueError('Integral and output limits have to be non-negative.')
+        self.integral = np.zeros(len(self.proportional))
+        self._output = np.empty(len(self.proportional))
+        self._buffer = np.empty(len(self.proportional))
+
+    @classmethod
+    def from_gains(cls, gains: Sequence[Gain], **kwargs) -> 'PidControllerBank':
+        """One channel per Gain, limits are given as keyword arguments."""
+        return cls([gain.proportional for gain in gains], [gain.differential for gain in gains],
+                   [gain.integral for gain in gains], **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.proportional)
+
+    def apply(self, error_signal: ErrorSignal) -> np.ndarray:
+        """Control commands of all channels. The returned array is reused by the next call, copy it to keep it."""
+        integral, output, buffer = self.integral, self._output, self._buffer
+        np.multiply(self.integral_gain, error_signal.integral, out=buffer)
+        integral += buffer
+        np.clip(integral, -self.integral_limit, self.integral_limit, out=integral)
+        np.multiply(self.proportional, error_signal.proportional, out=output)
+        np.multiply(self.differential, error_signal.differential, out=buffer)
+        output += buffer
+        output += integral
+        return np.clip(output, -self.output_limit, self.output_limit, out=output)
+
+    def reset(self) -> None:
+        self.integral[:] = 0.0
+
+    def gain(self, channel: int) -> Gain:
+        return Gain(float(self.proportional[channel]), float(self.differential[channel]),
+                    float(self.integral_gain[channel]))
+
+    def set_gains(self, gains: Gain) -> None:
+        """Overwrite the gains of all channels with a Gain of scalars or per-channel arrays."""
+        self.proportional[:] = gains.proportional
+        self.differential[:] = gains.differential
+        self.integral_gain[:] = gains.integral
+
+    def set_gain(self, gain_type: str, value) -> None:
+        """Set a single gain of all channels by key, value is a scalar or per-channel array."""
+        attributes = {'proportional': self.proportional, 'differential': self.differential,
+                      'integral': self.integral_gain}
+        if gain_type not in attributes:
+            print(f'WARNING: Provided key for gain value {gain_type} invalid. Ignoring.')
+        else:
+            attributes[gain_type][:] = value
+
+
+class MassSystemBank(System):
+    """n independent MassSystems with positions, velocities and parameters held as arrays of shape (n,), update
+    advances all of them with the same rule as MassSystem.update. Noise is drawn from a numpy Generator seeded with
+    seed."""
+
+    def __init__(self, init_position: Sequence[float], init_velocity: Sequence[float],
+                 system_noise_std: Sequence[float], mass: Sequence[float], delta_time: Sequence[float],
+                 gravity: Sequence[float] = 0.1, seed: int = None, n_channels: int = None) -> None:
+        position, velocity, noise_std, mass, delta_time, gravity = \
+            _channels(init_position, init_velocity, system_noise_std, mass, delta_time, gravity, n_channels=n_channels)
+        if (mass <= 0).any() or (delta_time <= 0).any():
+            raise ValueError('Masses and time steps have to be positive.')
+        super().__init__(position, noise_std, velocity, delta_time=delta_time)
+        self._mass = mass
+        self._gravity = gravity
+        self._rng = np.random.default_rng(seed)
+        self._buffer = np.empty(len(position))
+
+    def __len__(self) -> int:
+        return len(self.position)
+
+    def update(self, control: np.ndarray) -> None:
+        """Control is the force per channel, position and velocity are updated in place."""
+        buffer = self._buffer
+        np.multiply(self.velocity, self._delta_time, out=buffer)
+        self.position += buffer
+        np.divide(control, self._mass, out=buffer)
+        buffer -= self._gravity
+        buffer *= self._delta_time
+        self.velocity += buffer
+        if self._system_noise_std.any():
+            self.velocity += self._rng.standard_normal(len(buffer)) * self._system_noise_std
+
+
+class SensorBank:
+    """Measures the states of n channels with per-channel Gaussian noise drawn from a numpy Generator."""
+
+    def __init__(self, noise_std: Sequence[float] = 0.1, seed: int = None) -> None:
+        self._noise_std = np.asarray(noise_std, dtype=float)
+        self._rng = np.random.default_rng(seed)
+
+    def measure(self, state: np.ndarray) -> np.ndarray:
+        if not self._noise_std.any():
+            return np.array(state, dtype=float)
+        return state + self._rng.standard_normal(np.shape(state)) * self._noise_std
+
+
+def closed_loop_bank(system: MassSystemBank, controller: PidControllerBank, sensor: SensorBank,
+                     desired_state: Sequence[float], delta_time: float = 0.1, max_steps: int = None,
+                     max_time: float = None) -> Generator[Tuple, None, None]:
+    """closed_loop for all channels of a bank at once: yield (time, position, velocity, error_signal, integral,
+    controller_output) per step with arrays of shape (n,) in place of scalars. The channels run in lockstep without
+    early stopping, the arrays are copies and may be kept."""
+    if max_steps is None and max_time is None:
+        raise ValueError('A bank loop needs max_steps or max_time, or it would never return.')
+    desired_state = np.asarray(desired_state, dtype=float)
+    previous_error = None
+    time, step_count = 0.0, 0
+    while (max_steps is None or step_count <= max_steps) and (max_time is None or time <= max_time):
+        proportional_error = desired_state - sensor.measure(system.position)
+        differential_error = (proportional_error - previous_error) / delta_time if previous_error is not None \
+            else np.zeros_like(proportional_error)
+        error_signal = ErrorSignal(proportional_error, differential_error, proportional_error * delta_time)
+        controller_output = controller.apply(error_signal).copy()
+        previous_error = proportional_error
+        yield time, system.position.copy(), system.velocity.copy(), error_signal, controller.integral.copy(), \
+            controller_output
+        system.update(controller_output)
+        time += delta_time
+        step_count += 1
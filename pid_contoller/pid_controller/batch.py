@@ -0,0 +1,193 @@
+import dataclasses
+from dataclasses import dataclass
+
+import numpy as np
+
+from pid_controller.controller import Gain
+
+from typing import Dict, List, Sequence
+
+TRACE_FIELDS = ('position', 'velocity', 'proportional_error', 'differential_error', 'integral_error', 'integral',
+                'controller_output')
+
+
+@dataclass
+class BatchParameters:
+    """Parameters of N independent closed loops, a PidController driving a MassSystem measured by a Sensor. Every
+    field is an array of shape (N,), scalars are broadcast to the common number of loops."""
+    proportional: np.ndarray = 0.0
+    differential: np.ndarray = 0.0
+    integral: np.ndarray = 0.0
+    mass: np.ndarray = 1.0
+    gravity: np.ndarray = 0.1
+    system_noise_std: np.ndarray = 0.0
+    sensor_noise_std: np.ndarray = 0.0
+    delta_time: np.ndarray = 0.1
+    init_position: np.ndarray = 0.0
+    init_velocity: np.ndarray = 0.0
+    desired_state: np.ndarray = 0.0
+    integral_limit: np.ndarray = 50.0
+    output_limit: np.ndarray = 50.0
+
+    def __post_init__(self) -> None:
+        names = [field.name for field in dataclasses.fields(self)]
+        arrays = np.broadcast_arrays(*[np.atleast_1d(np.asarray(getattr(self, name), dtype=float))
+                                       for name in names])
+        if arrays[0].ndim != 1:
+            raise ValueError(f'Batch parameters have to be one dimensional, got shape {arrays[0].shape}.')
+        for name, array in zip(names, arrays):
+            # Copies, broadcast views are read only and share memory between loops
+            setattr(self, name, array.copy())
+        if (self.mass <= 0).any() or (self.delta_time <= 0).any():
+            raise ValueError('Masses and time steps have to be positive.')
+
+    def __len__(self) -> int:
+        return len(self.proportional)
+
+    @classmethod
+    def from_gains(cls, gains: Sequence[Gain], **kwargs) -> 'BatchParameters':
+        """One loop per Gain, all other parameters are given as keyword arguments."""
+        return cls(proportional=[gain.proportional for gain in gains],
+                   differential=[gain.differential for gain in gains],
+                   integral=[gain.integral for gain in gains], **kwargs)
+
+    @classmethod
+    def grid(cls, proportional: Sequence[float], differential: Sequence[float], integral: Sequence[float],
+             **kwargs) -> 'BatchParameters':
+        """One loop per combination of the given gain values, the proportional gain varies slowest."""
+        p_gains, d_gains, i_gains = np.meshgrid(proportional, differential, integral, indexing='ij')
+        return cls(proportional=p_gains.ravel(), differential=d_gains.ravel(), integral=i_gains.ravel(), **kwargs)
+
+    def gain(self, index: int) -> Gain:
+        return Gain(float(self.proportional[index]), float(self.differential[index]), float(self.integral[index]))
+
+
+@dataclass
+class BatchTrace:
+    """Output of simulate_batch. Each recorded signal is an (N, T) array whose row i holds the signals of loop i at
+    the times delta_time[i] * arange(T), the same values closed_loop yields per step. Entries after the last step
+    of a loop are NaN, recorded[i, k] tells whether step k of loop i happened and steps[i] counts them. settled[i]
+    is True if loop i stopped early within eps of its desired state."""
+    parameters: BatchParameters
+    signals: Dict[str, np.ndarray]
+    recorded: np.ndarray
+    steps: np.ndarray
+    settled: np.ndarray
+
+    @property
+    def time(self) -> np.ndarray:
+        n_steps = self.recorded.shape[1]
+        time = self.parameters.delta_time[:, None] * np.arange(n_steps)
+        return np.where(self.recorded, time, np.nan)
+
+    def final(self, name: str) -> np.ndarray:
+        """Value of a recorded signal at the last step of each loop."""
+        return self.signals[name][np.arange(len(self.steps)), np.maximum(self.steps - 1, 0)]
+
+
+def simulate_batch(parameters: BatchParameters, max_steps: int = None, max_time: float = None, eps: float = 0.01,
+                   no_early_stop: bool = True, seed: int = None, record: Sequence[str] = TRACE_FIELDS,
+                   dtype=np.float64, shared_noise: bool = False) -> BatchTrace:
+    """Advance all loops of parameters in lockstep, each step is a handful of array operations over the active
+    loops instead of one closed_loop generator step per loop. The update rule and the stopping criteria are those of
+    closed_loop: a loop stops once it exceeded max_steps or max_time, or, without no_early_stop, once its position
+    is within eps of the desired state. Loops which stopped are dropped from the arrays, so a batch gets cheaper as
+    loops settle.
+
+    Only the fields in record are kept, with dtype, which bounds the memory of large sweeps: N * T values per field.
+    Noise is drawn from a numpy Generator seeded with seed. By default each loop gets its own draws, which depend on
+    its position in the batch and on which loops are still active. With shared_noise all loops get the same
+    standard normal draws per step, scaled by their own noise stds, so the noise of a loop depends on seed only and
+    loops are compared on the same noise, whatever the batch looks like."""
+    if max_steps is None and max_time is None:
+        raise ValueError('A batch needs max_steps or max_time to bound the trace length.')
+    unknown = set(record) - set(TRACE_FIELDS)
+    if unknown:
+        raise ValueError(f'Unknown trace fields {sorted(unknown)}, choose from {TRACE_FIELDS}.')
+    n_loops = len(parameters)
+    n_steps = max_steps + 1 if max_steps is not None else 0
+    if max_time is not None:
+        # closed_loop accumulates the time, which may allow one step more than max_time / delta_time
+        time_steps = int(np.floor(max_time / parameters.delta_time).max()) + 2
+        n_steps = min(n_steps, time_steps) if max_steps is not None else time_steps
+
+    signals = {name: np.full((n_loops, n_steps), np.nan, dtype=dtype) for name in record}
+    recorded = np.zeros((n_loops, n_steps), dtype=bool)
+    steps = np.zeros(n_loops, dtype=np.int64)
+    settled = np.zeros(n_loops, dtype=bool)
+    rng = np.random.default_rng(seed)
+
+    # State of the active loops, indexed like active
+    active = np.arange(n_loops)
+    p_gain, d_gain, i_gain = parameters.proportional, parameters.differential, parameters.integral
+    mass, gravity, delta_time = parameters.mass, parameters.gravity, parameters.delta_time
+    system_noise, sensor_noise = parameters.system_noise_std, parameters.sensor_noise_std
+    desired, integral_limit, output_limit = parameters.desired_state, parameters.integral_limit, \
+        parameters.output_limit
+    position, velocity = parameters.init_position.copy(), parameters.init_velocity.copy()
+    integral = np.zeros(n_loops)
+    previous_error = np.zeros(n_loops)
+    time = np.zeros(n_loops)
+
+    def noise(n_active: int):
+        return rng.standard_normal() if shared_noise else rng.standard_normal(n_active)
+
+    for step in range(n_steps):
+        measurement = position + noise(len(active)) * sensor_noise
+        proportional_error = desired - measurement
+        differential_error = (proportional_error - previous_error) / delta_time if step > 0 \
+            else np.zeros(len(active))
+        integral_error = proportional_error * delta_time
+        integral = np.clip(integral + i_gain * integral_error, -integral_limit, integral_limit)
+        controller_output = np.clip(p_gain * proportional_error + d_gain * differential_error + integral,
+                                    -output_limit, output_limit)
+        previous_error = proportional_error
+
+        values = {'position': position, 'velocity': velocity, 'proportional_error': proportional_error,
+                  'differential_error': differential_error, 'integral_error': integral_error, 'integral': integral,
+                  'controller_output': controller_output}
+        for name, trace in signals.items():
+            trace[active, step] = values[name]
+        recorded[active, step] = True
+
+        position = position + velocity * delta_time
+        velocity = velocity + (controller_output / mass - gravity) * delta_time \
+            + noise(len(active)) * system_noise
+
+        time = time + delta_time
+        keep = np.full(len(active), step + 1 < n_steps)
+        if max_time is not None:
+            keep &= time <= max_time
+        if not no_early_stop:
+            converged = np.abs(position - desired) < eps
+            settled[active[converged]] = True
+            keep &= ~converged
+        steps[active] = step + 1
+        if not keep.all():
+            active = active[keep]
+            if len(active) == 0:
+                break
+            p_gain, d_gain, i_gain, mass, gravity, delta_time, system_noise, sensor_noise, desired, \
+                integral_limit, output_limit, position, velocity, integral, previous_error, time = \
+                [array[keep] for array in (p_gain, d_gain, i_gain, mass, gravity, delta_time, system_noise,
+                                           sensor_noise, desired, integral_limit, output_limit, position, velocity,
+                                           integral, previous_error, time)]
+    used = int(steps.max()) if n_loops else 0
+    return BatchTrace(parameters=parameters, signals={name: trace[:, :used] for name, trace in signals.items()},
+                      recorded=recorded[:, :used], steps=steps, settled=settled)
+
+
+def gain_sweep(proportional: Sequence[float], differential: Sequence[float], integral: Sequence[float],
+               max_steps: int, chunk_size: int = 10000, **kwargs) -> List[BatchTrace]:
+    """Simulate all gain combinations in chunks of chunk_size loops, which bounds the memory of the traces. Further
+    keyword arguments are split between BatchParameters and simulate_batch."""
+    parameter_names = {field.name for field in dataclasses.fields(BatchParameters)}
+    parameter_kwargs = {key: value for key, value in kwargs.items() if key in parameter_names}
+    simulation_kwargs = {key: value for key, value in kwargs.items() if key not in parameter_names}
+    parameters = BatchParameters.grid(proportional, differential, integral, **parameter_kwargs)
+    traces = []
+    for start in range(0, len(parameters), chunk_size):
+        chunk = BatchParameters(**{name: getattr(parameters, name)[start:start + chunk_size]
+                                   for name in parameter_names})
+        traces.append(simulate_batch(chunk, max_steps=max_steps, **simulation_kwargs))
+    return traces
@@ -63,17 +63,20 @@ class ProportionalDifferentialController(Controller):
 
 
 class PidController(Controller):
-    def __init__(self, gains: Gain = Gain()) -> None:
+    def __init__(self, gains: Gain = Gain(), integral_limit: float = 50.0, output_limit: float = 50.0) -> None:
+        """The integral is clamped to +-integral_limit against windup and the output to +-output_limit."""
         super().__init__(gains)
         self.integral = 0.0
+        self.integral_limit = integral_limit
+        self.output_limit = output_limit
 
     def apply(self, error_signal: ErrorSignal) -> float:
         self.integral += self._gains.integral * error_signal.integral
-        self.integral = clamp(self.integral, -50, 50)
+        self.integral = clamp(self.integral, -self.integral_limit, self.integral_limit)
         p_part = self._gains.proportional * error_signal.proportional
         d_part = self._gains.differential * error_signal.differential
         i_part = self.integral
-        return clamp(p_part + d_part + i_part, -50, 50)
+        return clamp(p_part + d_part + i_part, -self.output_limit, self.output_limit)
 
 
 class System(AbstractBaseClass):
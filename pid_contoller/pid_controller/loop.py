@@ -1,7 +1,14 @@
+import numpy as np
+
 from pid_controller.controller import PidController, System, Sensor, ErrorSignal, MassSystem
 
 from typing import Generator, Tuple
 
+# Fields of one closed loop step, the columns of closed_loop_array
+OUTPUT_FIELDS = ('time', 'position', 'velocity', 'proportional_error', 'differential_error', 'integral_error',
+                 'integral', 'controller_output')
+STEP_DTYPE = np.dtype([(name, np.float64) for name in OUTPUT_FIELDS])
+
 
 def closed_loop(system: System, controller: PidController, sensor: Sensor,
                 desired_state: float, eps: float = 0.01, delta_time: float = 0.1,
@@ -40,6 +47,86 @@ def closed_loop(system: System, controller: PidController, sensor: Sensor,
             continue_running = not (should_stop_by_eps or should_stop_by_steps)
 
 
+def closed_loop_chunks(system: System, controller: PidController, sensor: Sensor,
+                       desired_state: float, eps: float = 0.01, delta_time: float = 0.1,
+                       max_time: float = None, max_steps: int = None,
+                       no_early_stop: bool = True, chunk_size: int = 4096) -> Generator[np.ndarray, None, None]:
+    """Run the closed loop and yield its steps as structured arrays of STEP_DTYPE with up to chunk_size rows, so
+    unbounded runs need constant memory. Each step writes its values straight into a preallocated chunk through one
+    memoryview per field and reuses a single ErrorSignal. The system runs ahead of the consumer by up to one chunk,
+    use closed_loop to interact with the loop between steps."""
+    if chunk_size <= 0:
+        raise ValueError(f'Chunk size has to be positive, got {chunk_size}.')
+    previous_error = 0.0
+    error_signal = ErrorSignal()
+    # Bound methods and limits looked up once, the loop body runs millions of times
+    measure, apply, update = sensor.measure, controller.apply, system.update
+    has_integral = hasattr(controller, 'integral')
+    step_limit = max_steps if max_steps is not None else float('inf')
+    time_limit = max_time if max_time is not None else float('inf')
+
+    step_count = 0
+    time = 0.0
+
+    chunk = np.empty(chunk_size, dtype=STEP_DTYPE)
+    # Item assignment to a memoryview of a field is far cheaper than assigning numpy rows
+    times, positions, velocities, proportionals, differentials, integral_errors, integrals, outputs = \
+        [memoryview(chunk[name]) for name in OUTPUT_FIELDS]
+    row = 0
+    continue_running = True
+    while continue_running:
+        position = system.position
+        measurement = measure(position)
+
+        proportional_error = desired_state - measurement
+        differential_error = (proportional_error - previous_error) / delta_time if step_count > 0 else 0.0
+        integral_error = proportional_error * delta_time
+
+        error_signal.proportional = proportional_error
+        error_signal.differential = differential_error
+        error_signal.integral = integral_error
+        controller_output = apply(error_signal)
+
+        previous_error = proportional_error
+
+        times[row] = time
+        positions[row] = position
+        velocities[row] = system.velocity
+        proportionals[row] = proportional_error
+        differentials[row] = differential_error
+        integral_errors[row] = integral_error
+        integrals[row] = controller.integral if has_integral else 0.0
+        outputs[row] = controller_output
+        row += 1
+        update(controller_output)
+
+        time += delta_time
+        step_count += 1
+
+        # Same stopping criteria as stop_due_to_max_steps_reached and stop_due_to_eps, inlined
+        continue_running = step_count <= step_limit and time <= time_limit
+        if continue_running and not no_early_stop:
+            continue_running = abs(system.position - desired_state) >= eps
+
+        if row == chunk_size or not continue_running:
+            # A new chunk per yield, consumers may keep the previous ones
+            yield chunk[:row]
+            chunk = np.empty(chunk_size, dtype=STEP_DTYPE)
+            times, positions, velocities, proportionals, differentials, integral_errors, integrals, outputs = \
+                [memoryview(chunk[name]) for name in OUTPUT_FIELDS]
+            row = 0
+
+
+def closed_loop_array(system: System, controller: PidController, sensor: Sensor,
+                      desired_state: float, eps: float = 0.01, delta_time: float = 0.1,
+                      max_time: float = None, max_steps: int = None,
+                      no_early_stop: bool = True, chunk_size: int = 4096) -> np.ndarray:
+    """All steps of a closed loop run as one structured array of STEP_DTYPE, e.g. for pandas.DataFrame(array)."""
+    chunks = list(closed_loop_chunks(system, controller, sensor, desired_state, eps, delta_time, max_time, max_steps,
+                                     no_early_stop, chunk_size))
+    return np.concatenate(chunks) if chunks else np.empty(0, dtype=STEP_DTYPE)
+
+
 def stop_due_to_max_steps_reached(time_step: float, steps: int, max_time: float = None, max_steps: int = None) -> bool:
     if max_steps is not None and steps > max_steps:
         # print(f'Max time steps {max_steps} reached. Stop.')
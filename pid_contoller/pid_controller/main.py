@@ -1,7 +1,11 @@
+import asyncio
+
 import matplotlib.pyplot as plt
 
 from pid_controller.controller import Sensor, MassSystem, PidController, Gain
 from pid_controller.loop import closed_loop
+from pid_controller.realtime import RealTimeLoop, SimulatedPlant, run_loops
+from pid_controller.tuning import Plant, tune
 from pid_controller.visualization import plot_control_loop_output
 
 
@@ -19,3 +23,30 @@ def run_pid_control(init_state, init_velocity, desired_position, system_noise_st
 
     plot_control_loop_output(output_generator)
     plt.show()
+
+
+def tune_pid_control(init_state, init_velocity, desired_position, system_noise_std, sensor_noise_std, delta_time,
+                     mass, eps, max_steps, max_time, gravity, cost='itae', method='cma_es', budget=500):
+    """Auto-tune the gains for the given setup, print them and plot the closed loop with them."""
+    plant = Plant(mass=mass, gravity=gravity, system_noise_std=system_noise_std, sensor_noise_std=sensor_noise_std,
+                  delta_time=delta_time, init_position=init_state, init_velocity=init_velocity,
+                  desired_state=desired_position, max_steps=int(max_steps))
+    result = tune(plant, cost=cost, method=method, budget=budget)
+    print(f'Best {cost} {result.cost:.4f} after {result.evaluations} evaluations with {result.gain}')
+    gain = result.gain
+    run_pid_control(init_state, init_velocity, desired_position, system_noise_std, sensor_noise_std, delta_time,
+                    gain.proportional, gain.differential, gain.integral, mass, eps, max_steps, max_time, gravity)
+
+
+def run_real_time_pid_control(init_state, init_velocity, desired_position, system_noise_std, sensor_noise_std,
+                              p_gain, d_gain, i_gain, mass, gravity, rate_hz=1000.0, duration=1.0, n_loops=1):
+    """Run n_loops simulated plants at rate_hz in real time concurrently and print the timing of each loop."""
+    loops = []
+    for _ in range(n_loops):
+        plant = SimulatedPlant(MassSystem(init_state, init_velocity, system_noise_std, mass=mass,
+                                          delta_time=1.0 / rate_hz, gravity=gravity),
+                               Sensor(noise_std=sensor_noise_std))
+        loops.append(RealTimeLoop(plant.sensor, plant.actuator, PidController(Gain(p_gain, d_gain, i_gain)),
+                                  desired_position, rate_hz=rate_hz))
+    for index, telemetry in enumerate(asyncio.run(run_loops(loops, duration=duration))):
+        print(f'Loop {index}: {telemetry.summary()}')
@@ -0,0 +1,214 @@
+import math
+
+import numpy as np
+
+from pid_controller.loop import OUTPUT_FIELDS
+
+from typing import Generator, Iterable, Optional, Tuple
+
+
+def flatten_output(output: tuple) -> Tuple[float, ...]:
+    """One closed_loop output (time, position, velocity, error_signal, integral, controller_output) as a flat tuple
+    ordered like OUTPUT_FIELDS."""
+    time, position, velocity, error_signal, integral, controller_output = output
+    return (time, position, velocity, error_signal.proportional, error_signal.differential, error_signal.integral,
+            integral, controller_output)
+
+
+class RingBuffer:
+    """Keeps the last capacity rows of a stream in a preallocated (capacity, n_fields) array."""
+
+    def __init__(self, capacity: int, n_fields: int = len(OUTPUT_FIELDS)) -> None:
+        if capacity <= 0:
+            raise ValueError(f'Ring buffer capacity has to be positive, got {capacity}.')
+        self._data = np.full((capacity, n_fields), np.nan)
+        self._next = 0
+        self.count = 0
+
+    def append(self, row: Iterable[float]) -> None:
+        self._data[self._next] = row
+        self._next = (self._next + 1) % len(self._data)
+        self.count += 1
+
+    def __len__(self) -> int:
+        return min(self.count, len(self._data))
+
+    @property
+    def capacity(self) -> int:
+        return len(self._data)
+
+    def values(self) -> np.ndarray:
+        """The kept rows, oldest first."""
+        if self.count < len(self._data):
+            return self._data[:self.count].copy()
+        return np.roll(self._data, -self._next, axis=0)
+
+
+class Downsampler:
+    """Keeps at most max_points rows spread evenly over the whole stream: every stride-th row is kept and when the
+    buffer is full every other kept row is dropped and the stride doubles."""
+
+    def __init__(self, max_points: int, n_fields: int = len(OUTPUT_FIELDS)) -> None:
+        if max_points < 2:
+            raise ValueError(f'A downsampler needs at least two points, got {max_points}.')
+        self._data = np.full((max_points, n_fields), np.nan)
+        self._size = 0
+        self.stride = 1
+        self.count = 0
+
+    def append(self, row: Iterable[float]) -> None:
+        if self.count % self.stride == 0:
+            if self._size == len(self._data):
+                kept = self._data[::2]
+                self._size = len(kept)
+                self._data[:self._size] = kept
+                self.stride *= 2
+            if self.count % self.stride == 0:
+                self._data[self._size] = row
+                self._size += 1
+        self.count += 1
+
+    def __len__(self) -> int:
+        return self._size
+
+    def values(self) -> np.ndarray:
+        return self._data[:self._size].copy()
+
+
+class StepResponseMetrics:
+    """Online step response metrics of a closed loop run in constant memory, fed one step at a time with update or
+    with a whole closed_loop generator by consume. Errors are desired_state - position of the system, not of the
+    noisy measurement.
+
+    - rise_time: time from the first crossing of rise_band[0] to the first crossing of rise_band[1] of the step
+    - overshoot: largest move past the desired state relative to the size of the step
+    - settling_time: time from which on the error stayed within settling_band times the step size, None if it is
+      outside at the end
+    - steady_state_error: mean error over the last steady_state_window steps
+    - iae, ise: integrals of |e| and e^2 over time
+    - saturated_steps, saturated_integral_steps: steps with the controller output or integral at its limit"""
+
+    def __init__(self, init_position: float, desired_state: float, settling_band: float = 0.02,
+                 rise_band: Tuple[float, float] = (0.1, 0.9), steady_state_window: int = 100,
+                 output_limit: float = 50.0, integral_limit: float = 50.0) -> None:
+        self.init_position = init_position
+        self.desired_state = desired_state
+        self._step = desired_state - init_position
+        self._direction = -1.0 if self._step < 0 else 1.0
+        self.settling_band = settling_band * abs(self._step)
+        self.rise_band = rise_band
+        self.output_limit = output_limit
+        self.integral_limit = integral_limit
+        self._recent_errors = RingBuffer(steady_state_window, n_fields=1)
+
+        self.steps = 0
+        self.iae = 0.0
+        self.ise = 0.0
+        self.saturated_steps = 0
+        self.saturated_integral_steps = 0
+        self._max_progress = -math.inf
+        self._rise_start: Optional[float] = None
+        self._rise_end: Optional[float] = None
+        self._settled_since: Optional[float] = None
+        self._previous: Optional[Tuple[float, float]] = None  # (time, error) of the previous step
+
+    def update(self, time: float, position: float, controller_output: float = 0.0, integral: float = 0.0) -> None:
+        error = self.desired_state - position
+        if self._previous is not None:
+            previous_time, previous_error = self._previous
+            self.iae += abs(previous_error) * (time - previous_time)
+            self.ise += previous_error ** 2 * (time - previous_time)
+        self._previous = (time, error)
+        self.steps += 1
+        self._recent_errors.append((error,))
+
+        # Fraction of the step covered so far, 1 at the desired state
+        progress = 1.0 - error * self._direction / abs(self._step) if self._step != 0 else 1.0
+        self._max_progress = max(self._max_progress, progress)
+        if self._rise_start is None and progress >= self.rise_band[0]:
+            self._rise_start = time
+        if self._rise_end is None and progress >= self.rise_band[1]:
+            self._rise_end = time
+        if abs(error) > self.settling_band:
+            self._settled_since = None
+        elif self._settled_since is None:
+            self._settled_since = time
+        if abs(controller_output) >= self.output_limit:
+            self.saturated_steps += 1
+        if abs(integral) >= self.integral_limit:
+            self.saturated_integral_steps += 1
+
+    def update_chunk(self, chunk: np.ndarray) -> None:
+        """Vectorized update with a structured array of steps as yielded by closed_loop_chunks."""
+        if len(chunk) == 0:
+            return
+        times, errors = chunk['time'], self.desired_state - chunk['position']
+        if self._previous is not None:
+            all_times, all_errors = np.append(self._previous[0], times), np.append(self._previous[1], errors)
+        else:
+            all_times, all_errors = times, errors
+        durations = np.diff(all_times)
+        self.iae += float((np.abs(all_errors[:-1]) * durations).sum())
+        self.ise += float((all_errors[:-1] ** 2 * durations).sum())
+        self._previous = (float(times[-1]), float(errors[-1]))
+        self.steps += len(chunk)
+        for error in errors[-self._recent_errors.capacity:].tolist():
+            self._recent_errors.append((error,))
+
+        progress = 1.0 - errors * self._direction / abs(self._step) if self._step != 0 else np.ones(len(chunk))
+        self._max_progress = max(self._max_progress, float(progress.max()))
+        if self._rise_start is None and (progress >= self.rise_band[0]).any():
+            self._rise_start = float(times[np.argmax(progress >= self.rise_band[0])])
+        if self._rise_end is None and (progress >= self.rise_band[1]).any():
+            self._rise_end = float(times[np.argmax(progress >= self.rise_band[1])])
+        outside = np.flatnonzero(np.abs(errors) > self.settling_band)
+        if len(outside):
+            last = outside[-1]
+            self._settled_since = float(times[last + 1]) if last + 1 < len(chunk) else None
+        elif self._settled_since is None:
+            self._settled_since = float(times[0])
+        self.saturated_steps += int((np.abs(chunk['controller_output']) >= self.output_limit).sum())
+        self.saturated_integral_steps += int((np.abs(chunk['integral']) >= self.integral_limit).sum())
+
+    def consume(self, output_generator: Generator, recorder=None) -> 'StepResponseMetrics':
+        """Feed all outputs of a closed_loop generator, flattened outputs are also appended to recorder, e.g. a
+        RingBuffer or Downsampler, if given. For closed_loop_chunks use update_chunk."""
+        for output in output_generator:
+            time, position, _, _, integral, controller_output = output
+            self.update(time, position, controller_output, integral)
+            if recorder is not None:
+                recorder.append(flatten_output(output))
+        return self
+
+    @property
+    def rise_time(self) -> Optional[float]:
+        if self._rise_start is None or self._rise_end is None:
+            return None
+        return self._rise_end - self._rise_start
+
+    @property
+    def overshoot(self) -> float:
+        return max(self._max_progress - 1.0, 0.0) if self.steps else 0.0
+
+    @property
+    def settling_time(self) -> Optional[float]:
+        return self._settled_since
+
+    @property
+    def steady_state_error(self) -> Optional[float]:
+        if self.steps == 0:
+            return None
+        return float(self._recent_errors.values().mean())
+
+    def summary(self) -> dict:
+        return {
+            'steps': self.steps,
+            'rise_time': self.rise_time,
+            'overshoot': self.overshoot,
+            'settling_time': self.settling_time,
+            'steady_state_error': self.steady_state_error,
+            'iae': self.iae,
+            'ise': self.ise,
+            'saturated_steps': self.saturated_steps,
+            'saturated_integral_steps': self.saturated_integral_steps,
+        }
@@ -0,0 +1,193 @@
+import asyncio
+import math
+import time
+from abc import ABC as AbstractBaseClass
+from abc import abstractmethod
+
+import numpy as np
+
+from pid_controller.controller import Controller, ErrorSignal, Sensor, System
+from pid_controller.metrics import RingBuffer
+
+from typing import List, Optional, Sequence
+
+
+class AsyncSensor(AbstractBaseClass):
+    """Source of measurements of a real-time loop, e.g. a wrapper around a hardware driver."""
+
+    @abstractmethod
+    async def read(self) -> float:
+        raise NotImplementedError
+
+
+class AsyncActuator(AbstractBaseClass):
+    """Sink of the control commands of a real-time loop."""
+
+    @abstractmethod
+    async def write(self, control: float) -> None:
+        raise NotImplementedError
+
+
+class SimulatedPlant:
+    """A System measured by a Sensor standing in for hardware: reading measures the system and writing a command
+    advances it by one step of its delta_time. io_latency simulates the time a bus transfer takes."""
+
+    def __init__(self, system: System, sensor: Sensor, io_latency: float = 0.0) -> None:
+        self.system = system
+        self.sensor = _SimulatedSensor(self, sensor)
+        self.actuator = _SimulatedActuator(self)
+        self.io_latency = io_latency
+
+    async def _transfer(self) -> None:
+        if self.io_latency > 0:
+            await asyncio.sleep(self.io_latency)
+
+
+class _SimulatedSensor(AsyncSensor):
+    def __init__(self, plant: SimulatedPlant, sensor: Sensor) -> None:
+        self._plant = plant
+        self._sensor = sensor
+
+    async def read(self) -> float:
+        await self._plant._transfer()
+        return self._sensor.measure(self._plant.system.position)
+
+
+class _SimulatedActuator(AsyncActuator):
+    def __init__(self, plant: SimulatedPlant) -> None:
+        self._plant = plant
+
+    async def write(self, control: float) -> None:
+        await self._plant._transfer()
+        self._plant.system.update(control=control)
+
+
+class TimingStats:
+    """Count, mean and maximum of a timing signal in seconds over the whole run, percentiles over the last window
+    values."""
+
+    def __init__(self, window: int = 10000) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent = RingBuffer(window, n_fields=1)
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self._recent.append((value,))
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else math.nan
+
+    def percentile(self, q: float) -> float:
+        return float(np.percentile(self._recent.values(), q)) if self.count else math.nan
+
+    def summary(self) -> dict:
+        return {'mean': self.mean, 'p50': self.percentile(50), 'p99': self.percentile(99), 'max': self.max}
+
+
+class LoopTelemetry:
+    """Timing of a real-time loop. jitter is how late a tick started after its scheduled time, latency the time from
+    the start of a tick to the command being written. A tick misses its deadline if the command is written after the
+    next tick was due, ticks which were due while the loop was late are skipped rather than run in a burst."""
+
+    def __init__(self, window: int = 10000) -> None:
+        self.ticks = 0
+        self.deadline_misses = 0
+        self.skipped_ticks = 0
+        self.jitter = TimingStats(window)
+        self.latency = TimingStats(window)
+
+    def summary(self) -> dict:
+        return {
+            'ticks': self.ticks,
+            'deadline_misses': self.deadline_misses,
+            'skipped_ticks': self.skipped_ticks,
+            'jitter': self.jitter.summary(),
+            'latency': self.latency.summary(),
+        }
+
+
+class RealTimeLoop:
+    """Drives a controller at a fixed rate on asyncio: each tick reads the sensor, computes the errors as closed_loop
+    does with the nominal period as delta_time and writes the command to the actuator. Ticks are scheduled at
+    start + k * period, so delays never accumulate into drift.
+
+    asyncio.sleep wakes up with millisecond granularity, so the last spin_threshold seconds before a tick are spent
+    yielding to the event loop with asyncio.sleep(0) until the tick is due. Other loops and tasks keep running
+    meanwhile, at the cost of keeping a core busy."""
+
+    def __init__(self, sensor: AsyncSensor, actuator: AsyncActuator, controller: Controller, desired_state: float,
+                 rate_hz: float = 1000.0, spin_threshold: float = 0.002, telemetry_window: int = 10000) -> None:
+        if rate_hz <= 0:
+            raise ValueError(f'Loop rate has to be positive, got {rate_hz}.')
+        self.sensor = sensor
+        self.actuator = actuator
+        self.controller = controller
+        self.desired_state = desired_state
+        self.period = 1.0 / rate_hz
+        self.spin_threshold = spin_threshold
+        self.telemetry = LoopTelemetry(telemetry_window)
+        self.last_output: Optional[float] = None
+        self._stop_requested = False
+
+    def stop(self) -> None:
+        """Let a running loop return after the current tick."""
+        self._stop_requested = True
+
+    async def _wait_until(self, deadline: float) -> None:
+        remaining = deadline - time.perf_counter()
+        if remaining > self.spin_threshold:
+            await asyncio.sleep(remaining - self.spin_threshold)
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(0)
+
+    async def run(self, duration: float = None, max_ticks: int = None) -> LoopTelemetry:
+        """Run until duration seconds passed, max_ticks ticks ran or stop() was called."""
+        if duration is None and max_ticks is None:
+            raise ValueError('A real-time loop needs a duration or max_ticks, or it would never return.')
+        self._stop_requested = False
+        telemetry = self.telemetry
+        error_signal = ErrorSignal()
+        previous_error = None
+        start = time.perf_counter()
+        end = start + duration if duration is not None else math.inf
+        tick = 0
+        while not self._stop_requested and (max_ticks is None or telemetry.ticks < max_ticks):
+            scheduled = start + tick * self.period
+            if scheduled >= end:
+                break
+            await self._wait_until(scheduled)
+            tick_start = time.perf_counter()
+            telemetry.jitter.add(tick_start - scheduled)
+
+            measurement = await self.sensor.read()
+            proportional_error = self.desired_state - measurement
+            error_signal.proportional = proportional_error
+            error_signal.differential = (proportional_error - previous_error) / self.period \
+                if previous_error is not None else 0.0
+            error_signal.integral = proportional_error * self.period
+            previous_error = proportional_error
+            self.last_output = self.controller.apply(error_signal)
+            await self.actuator.write(self.last_output)
+
+            done = time.perf_counter()
+            telemetry.latency.add(done - tick_start)
+            telemetry.ticks += 1
+            next_tick = tick + 1
+            if done > start + next_tick * self.period:
+                telemetry.deadline_misses += 1
+                # Resume with the first tick which is still ahead instead of catching up in a burst
+                next_tick = int((done - start) / self.period) + 1
+                telemetry.skipped_ticks += next_tick - tick - 1
+            tick = next_tick
+        return telemetry
+
+
+async def run_loops(loops: Sequence[RealTimeLoop], duration: float = None,
+                    max_ticks: int = None) -> List[LoopTelemetry]:
+    """Run several loops concurrently on the current event loop."""
+    return list(await asyncio.gather(*(loop.run(duration, max_ticks) for loop in loops)))
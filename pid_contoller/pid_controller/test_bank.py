@@ -0,0 +1,43 @@
+import numpy as np
+
+from pid_controller.bank import MassSystemBank, PidControllerBank, SensorBank, closed_loop_bank
+from pid_controller.controller import ErrorSignal, Gain, MassSystem, PidController, Sensor
+from pid_controller.loop import closed_loop
+from pid_controller.metrics import flatten_output
+
+
+def test_closed_loop_bank_matches_closed_loop():
+    gains = [Gain(3, 1, 0.5), Gain(10, 4, 2), Gain(1, 0.2, 0.1), Gain(20, 0, 5)]
+    masses, desired = [1.0, 2.0, 0.5, 1.0], [1.0, 2.0, -1.0, 3.0]
+    integral_limits, output_limits = [50.0, 5.0, 50.0, 0.5], [50.0, 20.0, 50.0, 2.0]
+    system = MassSystemBank(0.0, 0.0, 0.0, masses, 0.1, 0.1)
+    controller = PidControllerBank.from_gains(gains, integral_limit=integral_limits, output_limit=output_limits)
+    outputs = list(closed_loop_bank(system, controller, SensorBank(0.0), desired, 0.1, max_steps=200))
+    # (steps, fields, channels), the scalar time broadcast to all channels
+    bank = np.array([np.broadcast_arrays(*flatten_output(output)) for output in outputs])
+    for channel in range(len(gains)):
+        expected = np.array([flatten_output(output) for output in closed_loop(
+            MassSystem(0.0, 0.0, 0.0, masses[channel], 0.1, 0.1),
+            PidController(gains[channel], integral_limits[channel], output_limits[channel]), Sensor(0.0),
+            desired[channel], delta_time=0.1, max_steps=200)])
+        assert len(expected) == len(bank)
+        assert np.array_equal(bank[:, 1:, channel], expected[:, 1:])
+    # The tight limits of the last channel are hit
+    assert np.abs(bank[:, 6, 3]).max() == 0.5 and np.abs(bank[:, 7, 3]).max() == 2.0
+
+
+def test_limits():
+    assert PidController().integral_limit == 50.0 and PidController().output_limit == 50.0
+    controller = PidController(Gain(100, 0, 100))
+    assert controller.apply(ErrorSignal(1.0, 0.0, 1.0)) == 50.0 and controller.integral == 50.0
+    assert controller.apply(ErrorSignal(-1.0, 0.0, -2.0)) == -50.0 and controller.integral == -50.0
+
+    bank = PidControllerBank(100, 0, 100, integral_limit=[1, 50, 100], output_limit=[2, 50, 1000])
+    assert np.array_equal(bank.apply(ErrorSignal(np.ones(3), np.zeros(3), np.ones(3))), [2, 50, 200])
+    assert np.array_equal(bank.integral, [1, 50, 100])
+    assert len(PidControllerBank(1.0, n_channels=5)) == 5
+
+
+if __name__ == '__main__':
+    test_closed_loop_bank_matches_closed_loop()
+    test_limits()
@@ -0,0 +1,64 @@
+import numpy as np
+
+from pid_controller.batch import BatchParameters, simulate_batch
+from pid_controller.controller import MassSystem, PidController, Sensor
+from pid_controller.loop import closed_loop
+from pid_controller.metrics import flatten_output
+
+PARAMETERS = BatchParameters(proportional=[3.0, 10.0, 1.0, 0.5], differential=[1.0, 4.0, 0.2, 0.0],
+                             integral=[0.5, 2.0, 0.1, 0.0], mass=[1.0, 2.0, 0.5, 1.0], gravity=[0.1, 0.0, 0.2, 0.1],
+                             delta_time=[0.1, 0.05, 0.2, 0.1], init_position=[0.0, 1.0, -1.0, 0.0],
+                             init_velocity=[0.0, 0.5, 0.0, 0.0], desired_state=[1.0, -2.0, 0.5, 1.0])
+
+
+def closed_loop_outputs(index, **kwargs) -> np.ndarray:
+    """Flattened closed_loop outputs of loop index of PARAMETERS without noise."""
+    p = PARAMETERS
+    system = MassSystem(p.init_position[index], p.init_velocity[index], 0.0, mass=p.mass[index],
+                        delta_time=p.delta_time[index], gravity=p.gravity[index])
+    controller = PidController(p.gain(index))
+    outputs = closed_loop(system, controller, Sensor(noise_std=0.0), p.desired_state[index],
+                          delta_time=p.delta_time[index], **kwargs)
+    return np.array([flatten_output(output) for output in outputs])
+
+
+def assert_matches_closed_loop(trace, **kwargs):
+    for index in range(len(PARAMETERS)):
+        expected = closed_loop_outputs(index, **kwargs)
+        steps = trace.steps[index]
+        assert steps == len(expected)
+        # closed_loop accumulates its time, the trace multiplies, which differs in the last bits
+        assert np.allclose(trace.time[index, :steps], expected[:, 0])
+        assert np.array_equal(trace.signals['position'][index, :steps], expected[:, 1])
+        assert np.array_equal(trace.signals['velocity'][index, :steps], expected[:, 2])
+        assert np.array_equal(trace.signals['integral'][index, :steps], expected[:, 6])
+        assert np.array_equal(trace.signals['controller_output'][index, :steps], expected[:, 7])
+        assert trace.final('position')[index] == expected[-1, 1]
+
+
+def test_simulate_batch_matches_closed_loop():
+    assert_matches_closed_loop(simulate_batch(PARAMETERS, max_steps=150), max_steps=150)
+    assert_matches_closed_loop(simulate_batch(PARAMETERS, max_time=7.5), max_time=7.5)
+    early_stop = dict(max_steps=400, eps=0.002, no_early_stop=False)
+    assert_matches_closed_loop(simulate_batch(PARAMETERS, **early_stop), **early_stop)
+
+
+def test_simulate_batch_masks():
+    trace = simulate_batch(PARAMETERS, max_steps=400, eps=0.002, no_early_stop=False)
+    limit = 401
+    assert trace.recorded.shape == (len(PARAMETERS), trace.steps.max())
+    assert np.array_equal(trace.recorded, np.arange(trace.recorded.shape[1]) < trace.steps[:, None])
+    assert np.isnan(trace.signals['position'][~trace.recorded]).all()
+    assert not np.isnan(trace.signals['position'][trace.recorded]).any()
+    # Loops which stopped before the step limit did so within eps of their desired state
+    assert np.array_equal(trace.settled, trace.steps < limit)
+    assert trace.settled.any() and not trace.settled.all()
+
+    trace = simulate_batch(PARAMETERS, max_steps=20, record=('position',))
+    assert list(trace.signals) == ['position'] and trace.recorded.all()
+    assert (trace.steps == 21).all() and not trace.settled.any()
+
+
+if __name__ == '__main__':
+    test_simulate_batch_matches_closed_loop()
+    test_simulate_batch_masks()
@@ -0,0 +1,59 @@
+import random
+
+import numpy as np
+
+from pid_controller.controller import Gain, MassSystem, PidController, Sensor
+from pid_controller.loop import closed_loop_array
+from pid_controller.metrics import Downsampler, RingBuffer, StepResponseMetrics
+
+
+def test_update_chunk_matches_update():
+    random.seed(0)
+    # A noisy, oscillating response leaves and re-enters the settling band several times
+    steps = closed_loop_array(MassSystem(0.0, 0.0, 0.001, 1.0, 0.1, 0.1), PidController(Gain(20, 6, 2)),
+                              Sensor(0.002), 1.0, max_steps=400)
+    kwargs = dict(settling_band=0.02, steady_state_window=30, output_limit=10.0, integral_limit=0.09)
+    per_step = StepResponseMetrics(0.0, 1.0, **kwargs)
+    for step in steps:
+        per_step.update(step['time'], step['position'], step['controller_output'], step['integral'])
+    expected = per_step.summary()
+    assert expected['rise_time'] is not None and expected['settling_time'] is not None
+    assert expected['overshoot'] > 0 and expected['saturated_steps'] > 0 and expected['saturated_integral_steps'] > 0
+
+    for chunk_size in (1, 7, 64, len(steps)):
+        chunked = StepResponseMetrics(0.0, 1.0, **kwargs)
+        for start in range(0, len(steps), chunk_size):
+            chunked.update_chunk(steps[start:start + chunk_size])
+        summary = chunked.summary()
+        for name, value in expected.items():
+            assert np.isclose(summary[name], value), (chunk_size, name)
+
+
+def test_ring_buffer_order():
+    buffer = RingBuffer(3, n_fields=1)
+    for value in range(2):
+        buffer.append((value,))
+    assert len(buffer) == 2 and buffer.values().ravel().tolist() == [0, 1]
+    for value in range(2, 5):
+        buffer.append((value,))
+    assert len(buffer) == 3 and buffer.count == 5 and buffer.values().ravel().tolist() == [2, 3, 4]
+
+
+def test_downsampler_stride_doubling():
+    downsampler = Downsampler(4, n_fields=1)
+    for value in range(4):
+        downsampler.append((value,))
+    assert downsampler.stride == 1 and downsampler.values().ravel().tolist() == [0, 1, 2, 3]
+    for value in range(4, 10):
+        downsampler.append((value,))
+    assert downsampler.stride == 4 and downsampler.values().ravel().tolist() == [0, 4, 8]
+    for value in range(10, 100):
+        downsampler.append((value,))
+    values = downsampler.values().ravel()
+    assert len(values) <= 4 and values[0] == 0 and (np.diff(values) == downsampler.stride).all()
+
+
+if __name__ == '__main__':
+    test_update_chunk_matches_update()
+    test_ring_buffer_order()
+    test_downsampler_stride_doubling()
@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+from pid_controller.controller import Gain, MassSystem, PidController, Sensor
+from pid_controller.realtime import AsyncActuator, RealTimeLoop, SimulatedPlant, run_loops
+
+
+class SlowActuator(AsyncActuator):
+    """Takes longer to write a command than the loop period."""
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.commands = []
+
+    async def write(self, control: float) -> None:
+        await asyncio.sleep(self.delay)
+        self.commands.append(control)
+
+
+def make_loop(rate_hz: float) -> tuple:
+    plant = SimulatedPlant(MassSystem(0.0, 0.0, 0.0, mass=1.0, delta_time=1.0 / rate_hz, gravity=0.1),
+                           Sensor(noise_std=0.0))
+    return plant, RealTimeLoop(plant.sensor, plant.actuator, PidController(Gain(5, 2, 1)), desired_state=1.0,
+                               rate_hz=rate_hz)
+
+
+def test_loop_runs_max_ticks():
+    plant, loop = make_loop(rate_hz=200)
+    telemetry = asyncio.run(loop.run(max_ticks=20))
+    assert telemetry.ticks == 20 and telemetry.jitter.count == 20 and telemetry.latency.count == 20
+    assert plant.system.position > 0 and loop.last_output is not None
+    summary = telemetry.summary()
+    assert 0 <= summary['jitter']['p50'] <= summary['jitter']['max']
+
+
+def test_slow_actuator_misses_deadlines_and_skips_ticks():
+    plant = SimulatedPlant(MassSystem(0.0, 0.0, 0.0, mass=1.0, delta_time=0.01), Sensor(noise_std=0.0))
+    actuator = SlowActuator(delay=0.025)
+    loop = RealTimeLoop(plant.sensor, actuator, PidController(Gain(5, 2, 1)), desired_state=1.0, rate_hz=100)
+    telemetry = asyncio.run(loop.run(max_ticks=5))
+    assert telemetry.ticks == 5 and len(actuator.commands) == 5
+    # Every write takes more than two periods, so each tick misses its deadline and skips at least two ticks
+    assert telemetry.deadline_misses == 5 and telemetry.skipped_ticks >= 10
+    assert telemetry.latency.mean >= 0.025
+
+
+def test_run_loops_runs_concurrently():
+    start = time.perf_counter()
+    asyncio.run(make_loop(rate_hz=50)[1].run(max_ticks=10))
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    telemetries = asyncio.run(run_loops([make_loop(rate_hz=50)[1] for _ in range(2)], max_ticks=10))
+    both = time.perf_counter() - start
+    assert [telemetry.ticks for telemetry in telemetries] == [10, 10]
+    assert both < 1.5 * single
+
+
+if __name__ == '__main__':
+    test_loop_runs_max_ticks()
+    test_slow_actuator_misses_deadlines_and_skips_ticks()
+    test_run_loops_runs_concurrently()
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from pid_controller.batch import BatchParameters, BatchTrace
+from pid_controller.tuning import COSTS, Plant, evaluate, tune
+
+
+def make_trace() -> BatchTrace:
+    """Two loops stepping from 0 to 1 with delta_time 0.5, the second diverges after two steps."""
+    parameters = BatchParameters(delta_time=0.5, init_position=0.0, desired_state=1.0, proportional=[0.0, 0.0])
+    positions = np.array([[0.0, 0.5, 1.2, 1.0, 1.0],
+                          [0.0, np.inf, np.nan, np.nan, np.nan]])
+    recorded = np.array([[True] * 5, [True, True, False, False, False]])
+    return BatchTrace(parameters=parameters, signals={'position': positions}, recorded=recorded,
+                      steps=recorded.sum(axis=1), settled=np.zeros(2, dtype=bool))
+
+
+def test_costs():
+    trace = make_trace()
+    # Errors of the first loop are 1, 0.5, -0.2, 0, 0 at the times 0, 0.5, 1, 1.5, 2
+    expected = {'ise': 0.645, 'iae': 0.85, 'itae': 0.225, 'overshoot': 0.2, 'settling_time': 1.5}
+    for name, value in expected.items():
+        costs = COSTS[name](trace)
+        assert np.isclose(costs[0], value), name
+        if name != 'settling_time':
+            assert costs[1] == np.inf, name
+
+
+def test_evaluate_is_independent_of_the_batch():
+    plant = Plant(system_noise_std=0.01, sensor_noise_std=0.01, max_steps=200)
+    gains = np.random.default_rng(0).uniform(0, 5, size=(10, 3))
+    costs = evaluate(gains, plant, seeds=(0, 1))
+    assert np.array_equal(costs, np.concatenate([evaluate(gains[:3], plant, seeds=(0, 1)),
+                                                 evaluate(gains[3:], plant, seeds=(0, 1))]))
+    assert np.array_equal(costs[::-1], evaluate(gains[::-1], plant, seeds=(0, 1)))
+    assert not np.array_equal(costs, evaluate(gains, plant, seeds=(2, 3)))
+
+
+def test_tune():
+    plant = Plant(max_steps=200)
+    for method in ('grid', 'random', 'nelder_mead', 'cma_es'):
+        for budget in (27, 40):
+            result = tune(plant, method=method, budget=budget, seed=0)
+            assert 0 < result.evaluations <= budget, (method, budget)
+            assert result.cost == result.costs.min()
+            assert np.isclose(evaluate([[result.gain.proportional, result.gain.differential,
+                                         result.gain.integral]], plant)[0], result.cost)
+    # A search beats a poor guess
+    assert tune(plant, method='cma_es', budget=120, seed=0).cost < evaluate([[1.0, 0.0, 0.0]], plant)[0]
+
+
+def test_tune_small_budgets():
+    plant = Plant(max_steps=50)
+    for method in ('grid', 'random', 'nelder_mead', 'cma_es'):
+        for budget in (1, 3, 5, 6, 8):
+            result = tune(plant, method=method, budget=budget, seed=0)
+            assert 1 <= result.evaluations <= budget, (method, budget)
+            assert result.cost == result.costs.min()
+        with pytest.raises(ValueError):
+            tune(plant, method=method, budget=0)
+
+
+if __name__ == '__main__':
+    test_costs()
+    test_evaluate_is_independent_of_the_batch()
+    test_tune()
+    test_tune_small_budgets()
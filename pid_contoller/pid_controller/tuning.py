@@ -0,0 +1,324 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from pid_controller.batch import BatchParameters, BatchTrace, simulate_batch
+from pid_controller.controller import Gain
+
+from typing import Callable, Dict, List, Sequence, Tuple
+
+DEFAULT_BOUNDS = ((0.0, 10.0), (0.0, 10.0), (0.0, 5.0))  # proportional, differential, integral, as the sliders
+
+
+@dataclass
+class Plant:
+    """A MassSystem and Sensor configuration together with the step response to tune for: from init_position and
+    init_velocity to desired_state within max_steps steps of delta_time."""
+    mass: float = 1.0
+    gravity: float = 9.81
+    system_noise_std: float = 0.0
+    sensor_noise_std: float = 0.0
+    delta_time: float = 0.01
+    init_position: float = 1.0
+    init_velocity: float = 0.0
+    desired_state: float = 5.0
+    max_steps: int = 2000
+
+    @property
+    def noisy(self) -> bool:
+        return self.system_noise_std > 0 or self.sensor_noise_std > 0
+
+    def parameters(self, gains: np.ndarray) -> BatchParameters:
+        """Batch of this plant with one loop per row (proportional, differential, integral) of gains."""
+        gains = np.asarray(gains, dtype=float).reshape(-1, 3)
+        return BatchParameters(proportional=gains[:, 0], differential=gains[:, 1], integral=gains[:, 2],
+                               mass=self.mass, gravity=self.gravity, system_noise_std=self.system_noise_std,
+                               sensor_noise_std=self.sensor_noise_std, delta_time=self.delta_time,
+                               init_position=self.init_position, init_velocity=self.init_velocity,
+                               desired_state=self.desired_state)
+
+
+def _errors(trace: BatchTrace) -> Tuple[np.ndarray, np.ndarray]:
+    """Position errors (N, T) and the times of the steps. Diverged loops get infinite errors."""
+    errors = trace.parameters.desired_state[:, None] - trace.signals['position']
+    errors[trace.recorded & ~np.isfinite(errors)] = np.inf
+    return np.where(trace.recorded, errors, 0.0), np.nan_to_num(trace.time)
+
+
+def integral_squared_error(trace: BatchTrace) -> np.ndarray:
+    """ISE, the sum of e(t)^2 * dt."""
+    errors, _ = _errors(trace)
+    return (errors ** 2).sum(axis=1) * trace.parameters.delta_time
+
+
+def integral_absolute_error(trace: BatchTrace) -> np.ndarray:
+    """IAE, the sum of |e(t)| * dt."""
+    errors, _ = _errors(trace)
+    return np.abs(errors).sum(axis=1) * trace.parameters.delta_time
+
+
+def integral_time_absolute_error(trace: BatchTrace) -> np.ndarray:
+    """ITAE, the sum of t * |e(t)| * dt, which punishes errors late in the response."""
+    errors, time = _errors(trace)
+    return (time * np.abs(errors)).sum(axis=1) * trace.parameters.delta_time
+
+
+def overshoot(trace: BatchTrace) -> np.ndarray:
+    """Largest move past the desired state relative to the size of the step, 0 if it is never passed."""
+    errors, _ = _errors(trace)
+    step = trace.parameters.desired_state - trace.parameters.init_position
+    direction = np.where(step < 0, -1.0, 1.0)
+    passed = (-errors * direction[:, None]).max(axis=1)
+    result = np.maximum(passed, 0.0) / np.maximum(np.abs(step), 1e-12)
+    result[~np.isfinite(errors).all(axis=1)] = np.inf
+    return result
+
+
+def settling_time(trace: BatchTrace, band: float = 0.02) -> np.ndarray:
+    """Time after which the error stays within band times the step size, the full duration if it never does."""
+    errors, _ = _errors(trace)
+    step = np.abs(trace.parameters.desired_state - trace.parameters.init_position)
+    outside = np.abs(errors) > np.maximum(band * step, 1e-12)[:, None]
+    n_steps = outside.shape[1]
+    # Index of the last step outside of the band, -1 if there is none
+    last_outside = n_steps - 1 - np.argmax(outside[:, ::-1], axis=1)
+    last_outside[~outside.any(axis=1)] = -1
+    return (last_outside + 1) * trace.parameters.delta_time
+
+
+COSTS: Dict[str, Callable[[BatchTrace], np.ndarray]] = {
+    'ise': integral_squared_error,
+    'iae': integral_absolute_error,
+    'itae': integral_time_absolute_error,
+    'overshoot': overshoot,
+    'settling_time': settling_time,
+}
+
+
+def evaluate(gains: np.ndarray, plant: Plant, cost: str = 'itae', seeds: Sequence[int] = (0, 1, 2)) -> np.ndarray:
+    """Cost of every row of gains averaged over the noise seeds, a single simulation suffices for a noise free plant.
+    All gains of a seed are simulated as one batch and share its noise sequence, so a candidate's cost does not
+    depend on the other candidates or on how a batch is split over workers."""
+    if cost not in COSTS:
+        raise ValueError(f'Unknown cost {cost}, choose one of {tuple(COSTS)}.')
+    parameters = plant.parameters(gains)
+    seeds = seeds if plant.noisy else seeds[:1]
+    costs = [COSTS[cost](simulate_batch(parameters, max_steps=plant.max_steps, seed=seed, record=('position',),
+                                        shared_noise=True)) for seed in seeds]
+    return np.mean(costs, axis=0)
+
+
+# Per worker process state, filled once by _init_worker
+_worker_setup: tuple = None
+
+
+def _init_worker(plant: Plant, cost: str, seeds: Sequence[int]) -> None:
+    global _worker_setup
+    _worker_setup = (plant, cost, seeds)
+
+
+def _evaluate_chunk(gains: np.ndarray) -> np.ndarray:
+    return evaluate(gains, *_worker_setup)
+
+
+class _Evaluator:
+    """Evaluates candidate batches, in this process or split into one chunk per worker of a process pool, and keeps
+    the history of all evaluations."""
+
+    def __init__(self, plant: Plant, cost: str, seeds: Sequence[int], max_workers: int,
+                 min_chunk_size: int = 64) -> None:
+        self.plant, self.cost, self.seeds = plant, cost, seeds
+        self.max_workers = max_workers if max_workers is not None else os.cpu_count()
+        self.min_chunk_size = min_chunk_size
+        self._executor = None
+        if self.max_workers != 1:
+            self._executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                                 initargs=(plant, cost, seeds))
+        self.candidates: List[np.ndarray] = []
+        self.costs: List[np.ndarray] = []
+
+    def __call__(self, gains: np.ndarray) -> np.ndarray:
+        gains = np.asarray(gains, dtype=float).reshape(-1, 3)
+        n_chunks = min(self.max_workers, len(gains) // self.min_chunk_size)
+        if n_chunks > 1:
+            costs = np.concatenate(list(self._executor.map(_evaluate_chunk, np.array_split(gains, n_chunks))))
+        else:
+            costs = evaluate(gains, self.plant, self.cost, self.seeds)
+        # Diverged or NaN responses are worst
+        costs = np.where(np.isnan(costs), np.inf, costs)
+        self.candidates.append(gains)
+        self.costs.append(costs)
+        return costs
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+
+
+@dataclass
+class TuningResult:
+    """Best gains found and every evaluated candidate, rows (proportional, differential, integral) of candidates
+    with their costs."""
+    gain: Gain
+    cost: float
+    candidates: np.ndarray
+    costs: np.ndarray
+
+    @property
+    def evaluations(self) -> int:
+        return len(self.costs)
+
+
+def _grid_search(evaluator: _Evaluator, lower: np.ndarray, upper: np.ndarray, budget: int,
+                 rng: np.random.Generator) -> None:
+    n_per_axis = int(budget ** (1 / 3) + 1e-9)
+    # With fewer than 8 candidates the single grid point is the centre of the box
+    axes = [np.linspace(low, high, n_per_axis) if n_per_axis > 1 else np.array([(low + high) / 2])
+            for low, high in zip(lower, upper)]
+    evaluator(np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, 3))
+
+
+def _random_search(evaluator: _Evaluator, lower: np.ndarray, upper: np.ndarray, budget: int,
+                   rng: np.random.Generator) -> None:
+    evaluator(rng.uniform(lower, upper, size=(budget, 3)))
+
+
+def _nelder_mead(evaluator: _Evaluator, lower: np.ndarray, upper: np.ndarray, budget: int,
+                 rng: np.random.Generator) -> None:
+    """Nelder-Mead on the box, candidates are clipped to it. Reflection, expansion and both contractions of an
+    iteration are evaluated speculatively as one batch, shrinks as another one."""
+    scale = upper - lower
+    start = rng.uniform(lower + 0.25 * scale, upper - 0.25 * scale)
+    simplex = np.vstack([start, start + np.diag(0.2 * scale)])
+    simplex = np.clip(simplex, lower, upper)
+    if budget < len(simplex):
+        # Not even the initial simplex fits, evaluate what the budget allows
+        evaluator(simplex[:budget])
+        return
+    values = evaluator(simplex)
+    n_evaluations = len(values)
+    while n_evaluations + 4 <= budget:
+        order = np.argsort(values)
+        simplex, values = simplex[order], values[order]
+        if np.ptp(values) < 1e-12 and np.ptp(simplex, axis=0).max() < 1e-9:
+            break
+        centroid = simplex[:-1].mean(axis=0)
+        worst = simplex[-1]
+        # Reflection, expansion, outside and inside contraction
+        candidates = np.clip(centroid + np.array([[1.0], [2.0], [0.5], [-0.5]]) * (centroid - worst), lower, upper)
+        reflected, expanded, outside, inside = evaluator(candidates)
+        n_evaluations += 4
+        if reflected < values[0]:
+            simplex[-1], values[-1] = (candidates[1], expanded) if expanded < reflected else (candidates[0], reflected)
+        elif reflected < values[-2]:
+            simplex[-1], values[-1] = candidates[0], reflected
+        elif reflected < values[-1] and outside <= reflected:
+            simplex[-1], values[-1] = candidates[2], outside
+        elif inside < values[-1]:
+            simplex[-1], values[-1] = candidates[3], inside
+        else:
+            if n_evaluations + len(simplex) - 1 > budget:
+                break
+            simplex[1:] = simplex[0] + 0.5 * (simplex[1:] - simplex[0])
+            values[1:] = evaluator(simplex[1:])
+            n_evaluations += len(simplex) - 1
+
+
+def _cma_es(evaluator: _Evaluator, lower: np.ndarray, upper: np.ndarray, budget: int,
+            rng: np.random.Generator) -> None:
+    """(mu/mu_w, lambda)-CMA-ES (Hansen's tutorial) in coordinates normalized to the unit cube, one batch per
+    generation. Samples outside of the box are clipped for the evaluation."""
+    n = 3
+    population = 4 + int(3 * math.log(n))
+    parents = population // 2
+    weights = math.log(parents + 0.5) - np.log(np.arange(1, parents + 1))
+    weights /= weights.sum()
+    mu_eff = 1 / (weights ** 2).sum()
+    c_sigma = (mu_eff + 2) / (n + mu_eff + 5)
+    d_sigma = 1 + 2 * max(0.0, math.sqrt((mu_eff - 1) / (n + 1)) - 1) + c_sigma
+    c_c = (4 + mu_eff / n) / (n + 4 + 2 * mu_eff / n)
+    c_1 = 2 / ((n + 1.3) ** 2 + mu_eff)
+    c_mu = min(1 - c_1, 2 * (mu_eff - 2 + 1 / mu_eff) / ((n + 2) ** 2 + mu_eff))
+    expected_norm = math.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n ** 2))
+
+    mean, sigma = rng.uniform(0.25, 0.75, n), 0.3
+    covariance, path_sigma, path_c = np.eye(n), np.zeros(n), np.zeros(n)
+    # A budget below the population size runs one generation cut down to the budget
+    for generation in range(max(1, budget // population)):
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        axes = eigenvectors * np.sqrt(np.maximum(eigenvalues, 1e-20))
+        inverse_sqrt = eigenvectors @ np.diag(1 / np.sqrt(np.maximum(eigenvalues, 1e-20))) @ eigenvectors.T
+        steps = rng.standard_normal((population, n)) @ axes.T
+        samples = mean + sigma * steps
+        if budget < population:
+            evaluator(lower + np.clip(samples[:budget], 0, 1) * (upper - lower))
+            return
+        costs = evaluator(lower + np.clip(samples, 0, 1) * (upper - lower))
+        # Out of box samples are ranked behind in box samples of equal cost
+        order = np.lexsort((np.abs(samples - np.clip(samples, 0, 1)).sum(axis=1), costs))[:parents]
+        step = weights @ steps[order]
+        mean = mean + sigma * step
+        path_sigma = (1 - c_sigma) * path_sigma + math.sqrt(c_sigma * (2 - c_sigma) * mu_eff) * inverse_sqrt @ step
+        # Hansen's h_sigma, False while the step size path is long, which stalls the update of path_c
+        h_sigma = np.linalg.norm(path_sigma) / math.sqrt(1 - (1 - c_sigma) ** (2 * (generation + 1))) \
+            < (1.4 + 2 / (n + 1)) * expected_norm
+        path_c = (1 - c_c) * path_c + h_sigma * math.sqrt(c_c * (2 - c_c) * mu_eff) * step
+        rank_mu = (weights[:, None, None] * np.einsum('ki,kj->kij', steps[order], steps[order])).sum(axis=0)
+        covariance = (1 - c_1 - c_mu) * covariance + c_1 * (np.outer(path_c, path_c)
+                                                            + (not h_sigma) * c_c * (2 - c_c) * covariance) \
+            + c_mu * rank_mu
+        sigma *= math.exp(c_sigma / d_sigma * (np.linalg.norm(path_sigma) / expected_norm - 1))
+        if sigma < 1e-8:
+            break
+
+
+TUNING_METHODS = {
+    'grid': _grid_search,
+    'random': _random_search,
+    'nelder_mead': _nelder_mead,
+    'cma_es': _cma_es,
+}
+
+
+def tune(plant: Plant, cost: str = 'itae', method: str = 'cma_es',
+         bounds: Sequence[Tuple[float, float]] = DEFAULT_BOUNDS, budget: int = 500, seeds: Sequence[int] = (0, 1, 2),
+         max_workers: int = 1, seed: int = None) -> TuningResult:
+    """Search gains within bounds (per gain (low, high), ordered proportional, differential, integral) minimizing
+    the cost of the plant's step response, averaged over the noise seeds. budget bounds the number of evaluated
+    candidates and has to be at least 1, smaller budgets than a method needs cut its first batch short. Candidates
+    are simulated in batches, with max_workers != 1 large batches are split over a process pool (None uses all
+    cores). seed makes the search itself reproducible."""
+    if method not in TUNING_METHODS:
+        raise ValueError(f'Unknown tuning method {method}, choose one of {tuple(TUNING_METHODS)}.')
+    if cost not in COSTS:
+        raise ValueError(f'Unknown cost {cost}, choose one of {tuple(COSTS)}.')
+    if budget < 1:
+        raise ValueError(f'The budget has to allow at least one evaluation, got {budget}.')
+    lower, upper = np.array(bounds, dtype=float).T
+    if lower.shape != (3,) or (lower > upper).any():
+        raise ValueError(f'Bounds need a (low, high) pair for each of the three gains, got {bounds}.')
+    evaluator = _Evaluator(plant, cost, seeds, max_workers)
+    try:
+        TUNING_METHODS[method](evaluator, lower, upper, budget, np.random.default_rng(seed))
+    finally:
+        evaluator.close()
+    candidates, costs = np.concatenate(evaluator.candidates), np.concatenate(evaluator.costs)
+    best = int(np.argmin(costs))
+    return TuningResult(gain=Gain(*candidates[best].tolist()), cost=float(costs[best]), candidates=candidates,
+                        costs=costs)
+
+
+def _tune_plant(args: tuple) -> TuningResult:
+    plant, kwargs = args
+    return tune(plant, **kwargs)
+
+
+def tune_plants(plants: Sequence[Plant], max_workers: int = None, **kwargs) -> List[TuningResult]:
+    """Tune many plants, one plant per task of a process pool. Keyword arguments are passed to tune, whose own
+    evaluations then run in the worker."""
+    kwargs['max_workers'] = 1
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_tune_plant, [(plant, kwargs) for plant in plants]))
@@ -1,9 +1,10 @@
-from collections import defaultdict
-
 import matplotlib
 import matplotlib.pyplot as plt
 import ipywidgets as widgets
 from ipywidgets import Layout
+import numpy as np
+
+from pid_controller.metrics import OUTPUT_FIELDS, Downsampler, flatten_output
 
 from typing import Generator, List
 
@@ -53,40 +54,36 @@ def setup_control_widgets() -> dict:
 
 
 def plot_control_loop_output(output_generator: Generator, x_lim: List[int] = None,
-                             plot_errors: bool = True) -> plt.Figure:
-    """Plot the output of a closed control loop run."""
+                             plot_errors: bool = True, max_points: int = None) -> plt.Figure:
+    """Plot the output of a closed control loop run. With max_points the run is downsampled to at most that many
+    points while it is consumed, which keeps the memory constant for long runs."""
 
     # TODO: Make this an actual animation! :-)
 
-    system_states = []
-    velocities = []
-    error_signals = defaultdict(list)
-    controller_outputs = []
-    time_step = []
-
-    for output in output_generator:
-        step, system_state, velocity, error_signal, integral_error, controller_output = output
-        time_step.append(step)
-        system_states.append(system_state)
-        velocities.append(velocity)
-        for key, value in error_signal.__dict__.items():
-            if value is not None and key != 'integral':
-                error_signals[key].append(value)
-        error_signals['integral'].append(integral_error)
-        controller_outputs.append(controller_output)
+    if max_points is not None:
+        samples = Downsampler(max_points)
+        for output in output_generator:
+            samples.append(flatten_output(output))
+        columns = samples.values().T
+    else:
+        outputs = [flatten_output(output) for output in output_generator]
+        columns = np.array(outputs, dtype=float).reshape(-1, len(OUTPUT_FIELDS)).T
+    signals = dict(zip(OUTPUT_FIELDS, columns))
+    time_step = signals['time']
 
     fig, ax = setup_plt_figure(figsize=(25, 6), xlabel='Time [s]', ylabel='State and Controls')
     linewidth = 1.5
 
-    ax.plot(time_step, system_states, color='green', linewidth=linewidth, alpha=0.8, label='Position')
-    ax.plot(time_step, velocities, color='cyan', linewidth=linewidth, alpha=0.8, label='Velocity')
-    ax.plot(time_step, controller_outputs, color='purple', linewidth=linewidth, alpha=0.8, label='Controller Output')
+    ax.plot(time_step, signals['position'], color='green', linewidth=linewidth, alpha=0.8, label='Position')
+    ax.plot(time_step, signals['velocity'], color='cyan', linewidth=linewidth, alpha=0.8, label='Velocity')
+    ax.plot(time_step, signals['controller_output'], color='purple', linewidth=linewidth, alpha=0.8,
+            label='Controller Output')
     if plot_errors:
-        ax.plot(time_step, error_signals['proportional'], color='red', linewidth=linewidth, alpha=0.8,
+        ax.plot(time_step, signals['proportional_error'], color='red', linewidth=linewidth, alpha=0.8,
                 label='Proportional Error')
-        ax.plot(time_step, error_signals['differential'], color='orange', linewidth=linewidth, alpha=0.8,
+        ax.plot(time_step, signals['differential_error'], color='orange', linewidth=linewidth, alpha=0.8,
                 label='Differential Error')
-        ax.plot(time_step, error_signals['integral'], color='magenta', linewidth=linewidth, alpha=0.8,
+        ax.plot(time_step, signals['integral'], color='magenta', linewidth=linewidth, alpha=0.8,
                 label='Integral Error')
 
     if x_lim is not None: